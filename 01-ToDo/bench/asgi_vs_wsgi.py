@@ -0,0 +1,208 @@
+"""
+Compare the WSGI (sync views) and ASGI (async views) request paths.
+
+Both handlers are driven in-process, without a network server, so the
+numbers isolate Django itself:
+
+* WSGI: ``concurrency`` threads call the WSGI application, like a threaded
+  server (gunicorn ``--threads``) would.
+* ASGI: one event loop runs ``concurrency`` in-flight requests against the
+  ASGI application, like a single uvicorn worker would.
+
+Each mode runs in its own subprocess (the URLconf differs) against the same
+seeded benchmark database.  Usage, from the ``01-ToDo`` directory::
+
+    python bench/asgi_vs_wsgi.py --tasks 10000 --requests 3000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_DIR))
+
+PATHS = ['/', '/tasks/', '/api/tasks/']
+
+MODES = {
+    'wsgi': 'myproject.urls',
+    'asgi': 'myproject.asgi_urls',
+}
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], elapsed: float, errors: int) -> Dict[str, float]:
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mean_ms': statistics.fmean(latencies) * 1000,
+    }
+
+
+def run_wsgi(requests: int, concurrency: int) -> Dict[str, float]:
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+
+    def one(path: str) -> float:
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': path,
+            'QUERY_STRING': '',
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'localhost',
+            'wsgi.input': io.BytesIO(),
+            'wsgi.errors': sys.stderr,
+            'wsgi.url_scheme': 'http',
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        status = []
+        started = time.perf_counter()
+        body = application(environ, lambda s, h, exc_info=None: status.append(s))
+        try:
+            b''.join(body)
+        finally:
+            body.close()
+        latency = time.perf_counter() - started
+        return latency if status[0].startswith('200') else -latency
+
+    paths = [PATHS[i % len(PATHS)] for i in range(requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, paths))
+    elapsed = time.perf_counter() - started
+    return summarize([abs(r) for r in results], elapsed, sum(r < 0 for r in results))
+
+
+def run_asgi(requests: int, concurrency: int) -> Dict[str, float]:
+    from django.core.asgi import get_asgi_application
+
+    application = get_asgi_application()
+
+    async def one(path: str, limit: asyncio.Semaphore) -> float:
+        async with limit:
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'GET',
+                'scheme': 'http',
+                'path': path,
+                'raw_path': path.encode(),
+                'query_string': b'',
+                'headers': [(b'host', b'localhost')],
+                'client': ('127.0.0.1', 50000),
+                'server': ('localhost', 80),
+            }
+            done = asyncio.Event()
+            sent_request = False
+            status = []
+
+            async def receive():
+                nonlocal sent_request
+                if not sent_request:
+                    sent_request = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await done.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+                elif not message.get('more_body'):
+                    done.set()
+
+            started = time.perf_counter()
+            await application(scope, receive, send)
+            latency = time.perf_counter() - started
+            return latency if status[0] == 200 else -latency
+
+    async def main() -> List[float]:
+        limit = asyncio.Semaphore(concurrency)
+        paths = [PATHS[i % len(PATHS)] for i in range(requests)]
+        return await asyncio.gather(*(one(path, limit) for path in paths))
+
+    started = time.perf_counter()
+    results = asyncio.run(main())
+    elapsed = time.perf_counter() - started
+    return summarize([abs(r) for r in results], elapsed, sum(r < 0 for r in results))
+
+
+def setup_django(urlconf: str) -> None:
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'bench.settings'
+    os.environ['BENCH_ROOT_URLCONF'] = urlconf
+    import django
+    django.setup()
+
+
+def prepare_database(tasks: int) -> None:
+    """Migrate the benchmark database, top it up to ``tasks`` rows, collect static files."""
+    from django.core.management import call_command
+    from myapp.models import Task
+
+    call_command('migrate', verbosity=0)
+    call_command('collectstatic', interactive=False, verbosity=0)
+    missing = tasks - Task.objects.count()
+    if missing > 0:
+        call_command('seed_tasks', missing, seed=0, stdout=io.StringIO())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--tasks', type=int, default=10000, help='Rows in the benchmark database.')
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        setup_django(MODES[args.child])
+        runner = run_wsgi if args.child == 'wsgi' else run_asgi
+        # Warm up imports, templates and caches before measuring
+        runner(min(100, args.requests), min(8, args.concurrency))
+        print(json.dumps(runner(args.requests, args.concurrency)))
+        return
+
+    setup_django(MODES['wsgi'])
+    prepare_database(args.tasks)
+
+    results = {}
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', mode,
+             '--requests', str(args.requests), '--concurrency', str(args.concurrency)],
+            check=True, capture_output=True, text=True, cwd=PROJECT_DIR,
+        ).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f'{args.requests} requests over {PATHS}, concurrency {args.concurrency}, '
+          f'{args.tasks} tasks')
+    print(f"{'mode':<6}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for mode, result in results.items():
+        print(f"{mode:<6}{result['rps']:>10.1f}{result['p50_ms']:>10.2f}"
+              f"{result['p99_ms']:>10.2f}{result['errors']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Mixed read/write load against each database profile.
+
+``writers`` threads create a task and toggle it inside one transaction while
+``readers`` threads page through the list and read the dashboard counts.
+Every operation is bracketed by ``close_old_connections()``, exactly like a
+request, so ``CONN_MAX_AGE`` and pooling behave as they would in a server.
+
+Profiles:
+
+* ``sqlite-default``: Django's stock SQLite connection (rollback journal,
+  deferred transactions, a new connection per request).
+* ``sqlite``: the tuned ``DATABASE_PROFILE=sqlite`` settings (WAL,
+  ``synchronous=NORMAL``, ``busy_timeout``, immediate transactions,
+  persistent connections).
+* ``postgres``: ``DATABASE_PROFILE=postgres``; needs a reachable server
+  configured through the ``POSTGRES_*`` variables.
+
+Each profile runs in its own subprocess.  Usage, from ``01-ToDo``::
+
+    python bench/concurrent_writers.py --writers 8 --readers 8 --seconds 10
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_DIR))
+
+from bench.asgi_vs_wsgi import percentile, prepare_database  # noqa: E402
+
+PROFILES: Dict[str, Dict[str, str]] = {
+    'sqlite-default': {'DATABASE_PROFILE': 'sqlite', 'BENCH_DB_BASELINE': '1'},
+    'sqlite': {'DATABASE_PROFILE': 'sqlite'},
+    'postgres': {'DATABASE_PROFILE': 'postgres'},
+}
+
+
+def run_load(writers: int, readers: int, seconds: float) -> Dict[str, float]:
+    from django.db import OperationalError, close_old_connections, connection, transaction
+
+    from myapp import stats
+    from myapp.models import Task
+    from myapp.pagination import paginate
+
+    def write() -> None:
+        with transaction.atomic():
+            task = Task.objects.create(title='Concurrent write')
+            task.completed = True
+            task.save()
+
+    def read() -> None:
+        page = paginate(Task.objects.all(), None, 50)
+        list(page.items)
+        stats.get_task_stats()
+
+    results: Dict[str, List[float]] = {'write': [], 'read': []}
+    errors = {'write': 0, 'read': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(kind: str) -> None:
+        operation = write if kind == 'write' else read
+        latencies, failed = [], 0
+        while time.perf_counter() < deadline:
+            close_old_connections()
+            started = time.perf_counter()
+            try:
+                operation()
+            except OperationalError:
+                # "database is locked" on SQLite, pool timeouts on Postgres
+                failed += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+            close_old_connections()
+        connection.close()
+        with lock:
+            results[kind].extend(latencies)
+            errors[kind] += failed
+
+    threads = [threading.Thread(target=worker, args=('write',)) for _ in range(writers)]
+    threads += [threading.Thread(target=worker, args=('read',)) for _ in range(readers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    summary = {}
+    for kind in ('write', 'read'):
+        latencies = results[kind] or [0.0]
+        summary[f'{kind}s_per_s'] = len(results[kind]) / elapsed
+        summary[f'{kind}_p99_ms'] = percentile(latencies, 99) * 1000
+        summary[f'{kind}_errors'] = errors[kind]
+    return summary
+
+
+def run_child(profile: str, args: argparse.Namespace) -> Dict[str, float]:
+    env = dict(os.environ, **PROFILES[profile])
+    env['DJANGO_SETTINGS_MODULE'] = 'bench.settings'
+    database = PROJECT_DIR / 'bench' / f'concurrent-{profile}.sqlite3'
+    env['BENCH_DB'] = str(database)
+    # Journal mode is stored in the file, so every SQLite run starts fresh
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        Path(f'{database}{suffix}').unlink(missing_ok=True)
+
+    output = subprocess.run(
+        [sys.executable, __file__, '--child',
+         '--tasks', str(args.tasks), '--writers', str(args.writers),
+         '--readers', str(args.readers), '--seconds', str(args.seconds)],
+        check=True, capture_output=True, text=True, cwd=PROJECT_DIR, env=env,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--profiles', nargs='+', choices=PROFILES,
+                        default=['sqlite-default', 'sqlite'])
+    parser.add_argument('--tasks', type=int, default=10000, help='Rows seeded before the run.')
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        import django
+        django.setup()
+        prepare_database(args.tasks)
+        print(json.dumps(run_load(args.writers, args.readers, args.seconds)))
+        return
+
+    print(f'{args.writers} writers, {args.readers} readers, {args.seconds:g}s, '
+          f'{args.tasks} tasks')
+    print(f"{'profile':<16}{'writes/s':>10}{'w p99 ms':>10}{'w errors':>10}"
+          f"{'reads/s':>10}{'r p99 ms':>10}{'r errors':>10}")
+    for profile in args.profiles:
+        try:
+            result = run_child(profile, args)
+        except subprocess.CalledProcessError as exc:
+            last_line = (exc.stderr or '').strip().splitlines()[-1:] or ['']
+            print(f'{profile:<16}failed: {last_line[0]}')
+            continue
+        print(f"{profile:<16}{result['writes_per_s']:>10.1f}{result['write_p99_ms']:>10.1f}"
+              f"{result['write_errors']:>10}{result['reads_per_s']:>10.1f}"
+              f"{result['read_p99_ms']:>10.1f}{result['read_errors']:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Reminder scheduler throughput.
+
+Creates ``--due`` open tasks whose due dates fall within the next reminder
+lead window, runs one scheduler tick through a backend that does nothing
+but simulate ``--latency`` ms of I/O per batch, and reports reminders per
+minute.  The target is 100k per minute on one node.  Usage, from
+``01-ToDo``::
+
+    python bench/reminders.py --due 100000 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_DIR))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--due', type=int, default=100000, help='Tasks due within the lead window.')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=20,
+                        help='Simulated backend latency per batch, in ms.')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bench.settings')
+    os.environ.setdefault('BENCH_DB', str(PROJECT_DIR / 'bench' / 'reminders.sqlite3'))
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    from django.utils import timezone
+
+    from myapp.models import Task, TaskReminder
+    from myapp.reminders import BaseReminderBackend, ReminderScheduler, get_lead
+
+    class SleepBackend(BaseReminderBackend):
+        def send(self, reminders):
+            time.sleep(args.latency / 1000)
+            return len(reminders)
+
+    call_command('migrate', verbosity=0)
+    Task.objects.all().delete()
+    TaskReminder.objects.all().delete()
+    now = timezone.now()
+    # Strictly inside the window despite microsecond rounding
+    step = (get_lead() - timedelta(seconds=1)) / args.due
+    Task.objects.bulk_create(
+        (Task(title=f'Due {i}', due_date=now + step * i) for i in range(args.due)),
+        batch_size=5000,
+    )
+
+    scheduler = ReminderScheduler(SleepBackend(), batch_size=args.batch_size, workers=args.workers)
+    started = time.perf_counter()
+    result = scheduler.tick(now)
+    elapsed = time.perf_counter() - started
+    scheduler.close()
+
+    print(f'{result.sent} reminders in {elapsed:.2f}s: {result.sent / elapsed * 60:,.0f}/min '
+          f'({args.workers} workers, batches of {args.batch_size}, {args.latency:g} ms per batch)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,386 @@
+"""
+Latency, throughput and query-count benchmark for the task views.
+
+Exercises ``home``, ``task_list``, ``task_create``, ``task_update``,
+``task_toggle_complete`` and ``task_delete`` against a database seeded with
+``manage.py seed_tasks``, through two targets:
+
+* ``client``: Django's test ``Client`` in-process, which isolates view,
+  ORM and template cost.
+* ``server``: a threaded ``wsgiref`` server (the one ``runserver`` uses) on
+  a local port, adding HTTP parsing, middleware and socket overhead.
+
+Requests are sent one at a time, so latencies are not inflated by queueing.
+Per view it records requests/s, p50/p95/p99 latency and SQL queries per
+request, plus the transfer size of a ``SIZE_PAGE_TASKS``-task list page
+uncompressed, gzipped and (with ``brotli`` installed) Brotli-compressed,
+next to the same page rendered with the old inline-styled templates kept
+in ``bench/inline_templates``.
+Results are compared to a JSON baseline; the run fails when a
+latency or throughput number moves by more than ``--threshold`` or a view
+issues more queries than before.  Usage, from ``01-ToDo``::
+
+    python bench/run_views.py --tasks 100000 --save      # record bench/baseline.json
+    python bench/run_views.py --tasks 100000             # compare against it
+
+Baselines are machine-specific; record one on the machine that compares.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from http.cookies import SimpleCookie
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_DIR))
+
+from bench.asgi_vs_wsgi import percentile, prepare_database  # noqa: E402
+
+DEFAULT_BASELINE = PROJECT_DIR / 'bench' / 'baseline.json'
+
+TARGETS = ('client', 'server')
+
+# (view, method) in run order; creates run before deletes so the data set
+# ends the run at the size it started with
+VIEWS: List[Tuple[str, str]] = [
+    ('home', 'GET'),
+    ('task_list', 'GET'),
+    ('task_create', 'POST'),
+    ('task_update', 'POST'),
+    ('task_toggle_complete', 'GET'),
+    ('task_delete', 'POST'),
+]
+
+# Metric name -> direction that counts as a regression
+METRICS = {'rps': 'lower', 'p50_ms': 'higher', 'p95_ms': 'higher', 'p99_ms': 'higher'}
+
+# p99 of a few hundred requests is mostly scheduler noise; report it, but
+# only gate on it when asked
+DEFAULT_GATED = ('rps', 'p50_ms', 'p95_ms')
+
+# Tasks on the page whose transfer size is reported
+SIZE_PAGE_TASKS = 1000
+
+# base.html and task_list.html as they were with inline styles, rendered
+# for the "before" page size
+INLINE_TEMPLATES = PROJECT_DIR / 'bench' / 'inline_templates'
+
+# Sends one request; returns (HTTP status, queries issued)
+Send = Callable[[str, str, Optional[Dict[str, str]]], Tuple[int, int]]
+
+
+def client_sender() -> Tuple[Send, Callable[[], None]]:
+    """Send requests through the test client, counting queries in-process."""
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    client = Client()
+
+    def send(method: str, path: str, data: Optional[Dict[str, str]]) -> Tuple[int, int]:
+        with CaptureQueriesContext(connection) as queries:
+            response = client.generic(
+                method, path, urlencode(data or {}),
+                content_type='application/x-www-form-urlencoded',
+            )
+        return response.status_code, len(queries)
+
+    return send, lambda: None
+
+
+def server_sender() -> Tuple[Send, Callable[[], None]]:
+    """Start a threaded WSGI server on a free port and send requests over HTTP."""
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    application = get_wsgi_application()
+
+    def counting_application(environ, start_response):
+        # Runs on the server's request thread, so it sees that thread's
+        # connection; the count travels back in a response header
+        started = {}
+        with CaptureQueriesContext(connection) as queries:
+            body = application(environ, lambda status, headers, exc_info=None: started.update(
+                status=status, headers=headers))
+            try:
+                chunks = list(body)
+            finally:
+                body.close()
+        start_response(started['status'], started['headers'] + [('X-Bench-Queries', str(len(queries)))])
+        return chunks
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=False)
+    server.set_app(counting_application)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+
+    def request(method: str, path: str, body: str = '', headers: Optional[Dict[str, str]] = None):
+        conn = http.client.HTTPConnection(host, port)
+        try:
+            conn.request(method, path, body, headers or {})
+            response = conn.getresponse()
+            response.read()
+            return response
+        finally:
+            conn.close()
+
+    # The real server enforces CSRF; fetch a token from a form page
+    cookie = SimpleCookie(request('GET', '/tasks/create/').getheader('Set-Cookie'))
+    token = cookie['csrftoken'].value
+
+    def send(method: str, path: str, data: Optional[Dict[str, str]]) -> Tuple[int, int]:
+        headers = {}
+        if method == 'POST':
+            headers = {
+                'Content-Type': 'application/x-www-form-urlencoded',
+                'Cookie': f'csrftoken={token}',
+                'X-CSRFToken': token,
+            }
+        response = request(method, path, urlencode(data or {}), headers)
+        return response.status, int(response.getheader('X-Bench-Queries', 0))
+
+    def stop() -> None:
+        server.shutdown()
+        server.server_close()
+
+    return send, stop
+
+
+def plan_requests(view: str, iterations: int, rng: random.Random,
+                  pool: List[int], created: List[int]) -> List[Tuple[str, Optional[Dict[str, str]]]]:
+    """Build ``(path, form data)`` for each request to ``view``."""
+    from django.urls import reverse
+
+    def form(i: int) -> Dict[str, str]:
+        return {'title': f'Bench {view} {i}', 'description': 'Benchmark task',
+                'priority': rng.choice(['low', 'medium', 'high'])}
+
+    if view in ('home', 'task_list'):
+        return [(reverse(view), None)] * iterations
+    if view == 'task_create':
+        return [(reverse(view), form(i)) for i in range(iterations)]
+    if view == 'task_delete':
+        return [(reverse(view, args=[pk]), None) for pk in created[:iterations]]
+    pks = [rng.choice(pool) for _ in range(iterations)]
+    if view == 'task_update':
+        return [(reverse(view, args=[pk]), form(i)) for i, pk in enumerate(pks)]
+    return [(reverse(view, args=[pk]), None) for pk in pks]
+
+
+def run_target(target: str, iterations: int, warmup: int, seed: int) -> Dict[str, Dict[str, float]]:
+    from myapp.models import Task
+
+    send, stop = client_sender() if target == 'client' else server_sender()
+    rng = random.Random(seed)
+    # Edits go to the oldest tasks, deletes to the ones this run created
+    pool = list(Task.objects.order_by('id').values_list('pk', flat=True)[:1000])
+    created: List[int] = []
+    results = {}
+
+    try:
+        for view, method in VIEWS:
+            if view == 'task_delete':
+                created = list(Task.objects.order_by('-id').values_list('pk', flat=True)[:warmup + iterations])
+            requests = plan_requests(view, warmup + iterations, rng, pool, created)
+
+            latencies, queries, errors = [], [], 0
+            started = None
+            for index, (path, data) in enumerate(requests):
+                if index == warmup:
+                    started = time.perf_counter()
+                began = time.perf_counter()
+                status, count = send(method, path, data)
+                if index >= warmup:
+                    latencies.append(time.perf_counter() - began)
+                    queries.append(count)
+                    errors += status >= 400
+            elapsed = time.perf_counter() - started
+
+            results[view] = {
+                'rps': len(latencies) / elapsed,
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'p99_ms': percentile(latencies, 99) * 1000,
+                'queries': max(queries),
+                'errors': errors,
+            }
+    finally:
+        stop()
+    return results
+
+
+def measure_page_sizes(template_dir: Optional[Path] = None) -> Dict[str, Optional[int]]:
+    """
+    Bytes on the wire for one large task list page, per Accept-Encoding.
+
+    ``template_dir`` is searched before the project's templates, e.g.
+    :data:`INLINE_TEMPLATES` for the page as it was before its styles moved
+    to a stylesheet.  Sizes that cannot be measured here (``br`` without
+    ``brotli``) are ``None``.
+    """
+    from django.conf import settings
+    from django.core.cache import caches
+    from django.test import Client, override_settings
+
+    from myapp.compression import brotli_available
+
+    encodings = {'identity': 'identity', 'gzip': 'gzip', 'br': 'br, gzip'}
+    templates = [{**settings.TEMPLATES[0], 'DIRS': [template_dir, *settings.TEMPLATES[0]['DIRS']]}]
+    sizes: Dict[str, Optional[int]] = {}
+    with override_settings(TASK_LIST_PAGE_SIZE=SIZE_PAGE_TASKS,
+                           TEMPLATES=templates if template_dir else settings.TEMPLATES):
+        # Row fragments are cached by task, not by template
+        for cache in caches.all():
+            cache.clear()
+        client = Client()
+        for name, accept in encodings.items():
+            if name == 'br' and not brotli_available():
+                sizes[name] = None
+                continue
+            response = client.get('/tasks/', HTTP_ACCEPT_ENCODING=accept)
+            sizes[name] = len(response.content)
+        for cache in caches.all():
+            cache.clear()
+    return sizes
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float,
+            gated: Tuple[str, ...] = DEFAULT_GATED, min_delta_ms: float = 0.0) -> List[str]:
+    """
+    Return a description of every regression beyond ``threshold``.
+
+    Latency changes smaller than ``min_delta_ms`` are ignored, so sub-millisecond
+    views do not fail on timer jitter.
+    """
+    failures = []
+    for target, views in current['results'].items():
+        for view, metrics in views.items():
+            before = baseline.get('results', {}).get(target, {}).get(view)
+            if before is None:
+                continue
+            label = f'{target} {view}'
+            if metrics['errors']:
+                failures.append(f"{label}: {metrics['errors']} error responses")
+            if metrics['queries'] > before['queries']:
+                failures.append(f"{label}: queries {before['queries']} -> {metrics['queries']}")
+            for name in gated:
+                old, new = before[name], metrics[name]
+                if not old or (name.endswith('_ms') and new - old < min_delta_ms):
+                    continue
+                worse = METRICS[name]
+                change = (new - old) / old
+                if (worse == 'higher' and change > threshold) or (worse == 'lower' and -change > threshold):
+                    failures.append(f'{label}: {name} {old:.2f} -> {new:.2f} ({change:+.0%})')
+    return failures
+
+
+def print_results(current: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    print(f"{'target':<8}{'view':<22}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'queries':>9}{'vs base p95':>13}")
+    for target, views in current['results'].items():
+        for view, m in views.items():
+            delta = ''
+            before = (baseline or {}).get('results', {}).get(target, {}).get(view)
+            if before and before['p95_ms']:
+                delta = f"{(m['p95_ms'] - before['p95_ms']) / before['p95_ms']:+.0%}"
+            print(f"{target:<8}{view:<22}{m['rps']:>9.1f}{m['p50_ms']:>9.2f}{m['p95_ms']:>9.2f}"
+                  f"{m['p99_ms']:>9.2f}{m['queries']:>9}{delta:>13}")
+    sizes = current.get('page_bytes')
+    if sizes:
+        inline = current.get('page_bytes_inline', {})
+        saved = (baseline or {}).get('page_bytes', {})
+        print(f'\n{SIZE_PAGE_TASKS}-task list page{"":<10}{"inline styles":>15}{"stylesheet":>15}'
+              f'{"change":>9}{"baseline":>12}')
+        for name, size in sizes.items():
+            if size is None:
+                print(f'  {name:<24}{"n/a (install brotli to measure)":>30}')
+                continue
+            before = inline.get(name)
+            change = f'{(size - before) / before:+.0%}' if before else ''
+            was = f'{saved[name]:,}' if saved.get(name) else ''
+            print(f'  {name:<24}{before or 0:>15,}{size:>15,}{change:>9}{was:>12}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--tasks', type=int, default=10000, help='Rows in the benchmark database.')
+    parser.add_argument('--iterations', type=int, default=200, help='Measured requests per view.')
+    parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests per view.')
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=list(TARGETS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed relative change in latency/throughput (default 0.25 = 25%%).')
+    parser.add_argument('--gate', nargs='+', choices=METRICS, default=list(DEFAULT_GATED),
+                        help='Metrics that fail the run when they regress.')
+    parser.add_argument('--min-delta-ms', type=float, default=0.5,
+                        help='Ignore latency changes smaller than this many milliseconds.')
+    parser.add_argument('--save', action='store_true', help='Write the results as the new baseline.')
+    parser.add_argument('--output', type=Path, help='Also write the results to this file.')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bench.settings')
+    import django
+    django.setup()
+    from django.db import connection
+
+    prepare_database(args.tasks)
+    current = {
+        'meta': {
+            'tasks': args.tasks,
+            'iterations': args.iterations,
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'machine': platform.node(),
+        },
+        'results': {target: run_target(target, args.iterations, args.warmup, args.seed)
+                    for target in args.targets},
+        'page_bytes': measure_page_sizes(),
+        'page_bytes_inline': measure_page_sizes(INLINE_TEMPLATES),
+    }
+
+    baseline = None
+    if args.baseline.exists() and not args.save:
+        baseline = json.loads(args.baseline.read_text())
+    print_results(current, baseline)
+
+    if args.output:
+        args.output.write_text(json.dumps(current, indent=2) + '\n')
+    if args.save:
+        args.baseline.write_text(json.dumps(current, indent=2) + '\n')
+        print(f'Baseline written to {args.baseline}')
+        return
+    if baseline is None:
+        print(f'No baseline at {args.baseline}; run with --save to record one.')
+        return
+    if baseline['meta'].get('tasks') != args.tasks:
+        print(f"Warning: baseline was recorded with {baseline['meta'].get('tasks')} tasks.")
+
+    failures = compare(current, baseline, args.threshold, tuple(args.gate), args.min_delta_ms)
+    if failures:
+        print('\nRegressions:')
+        for failure in failures:
+            print(f'  {failure}')
+        sys.exit(1)
+    print(f'\nNo regressions beyond {args.threshold:.0%}.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Django settings for the benchmark scripts in ``bench/``.
+
+Uses its own database file so benchmarks never touch ``db.sqlite3``.
+Override the location with ``BENCH_DB`` and the URLconf with
+``BENCH_ROOT_URLCONF`` (e.g. ``myproject.asgi_urls``).  Set
+``BENCH_DB_BASELINE=1`` to drop the tuned connection settings of the
+selected ``DATABASE_PROFILE`` and measure Django's defaults instead.
+Static files are collected into ``bench/static`` with hashed names, as in
+production.
+"""
+
+import os
+
+from myproject.settings import *  # noqa: F401,F403
+from myproject.settings import (
+    BASE_DIR, DATABASE_REPLICAS, DATABASES, ROOT_URLCONF, STORAGES, TASK_SHARDS,
+)
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['*']
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default']['NAME'] = os.environ.get(
+        'BENCH_DB', str(BASE_DIR / 'bench' / 'bench.sqlite3')
+    )
+    for alias in TASK_SHARDS[1:]:
+        DATABASES[alias]['NAME'] = DATABASES['default']['NAME'].replace('.sqlite3', f'.{alias}.sqlite3')
+    for alias, replicas in DATABASE_REPLICAS.items():
+        for replica in replicas:
+            DATABASES[replica]['NAME'] = f"file:{DATABASES[alias]['NAME']}?mode=ro"
+
+if os.environ.get('BENCH_DB_BASELINE') == '1':
+    for alias in TASK_SHARDS:
+        DATABASES[alias].pop('OPTIONS', None)
+        DATABASES[alias]['CONN_MAX_AGE'] = 0
+        DATABASES[alias]['CONN_HEALTH_CHECKS'] = False
+
+ROOT_URLCONF = os.environ.get('BENCH_ROOT_URLCONF', ROOT_URLCONF)
+
+STATIC_ROOT = BASE_DIR / 'bench' / 'static'
+
+STORAGES = {
+    **STORAGES,
+    'staticfiles': {'BACKEND': 'myapp.staticfiles.CompressedManifestStaticFilesStorage'},
+}
@@ -0,0 +1,11 @@
+"""
+Benchmark settings for the API-only profile (``myproject.settings_api``).
+
+Same database and overrides as ``bench.settings``, with the lean apps,
+middleware, URLconf and templates of the API workers.
+"""
+
+from bench.settings import *  # noqa: F401,F403
+from myproject.settings_api import (  # noqa: F401
+    CSRF_FAILURE_VIEW, INSTALLED_APPS, MIDDLEWARE, ROOT_URLCONF, TEMPLATES,
+)
@@ -0,0 +1,133 @@
+"""
+Cold-start benchmark for the full and the API-only settings profiles.
+
+Each run starts a fresh interpreter, as a new worker process or container
+would, and records:
+
+* ``setup``: importing Django, ``django.setup()`` and building the WSGI
+  application (apps, models, middleware);
+* ``first``: from the start of the run to the end of the first
+  ``GET /api/tasks/`` response, which adds the URLconf, the view modules,
+  the database connection and the query;
+* ``process``: wall time of the whole process, interpreter start-up and
+  shutdown included, as seen by whatever spawns the worker;
+* ``modules``: entries in ``sys.modules`` after the first response.
+
+The median (and minimum) over ``--runs`` runs is reported per profile.
+Usage, from ``01-ToDo``::
+
+    python bench/startup.py --runs 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+# Profile name -> benchmark settings module
+PROFILES = {
+    'full': 'bench.settings',
+    'api': 'bench.settings_api',
+}
+
+PATH = '/api/tasks/'
+
+
+def first_response() -> Dict[str, float]:
+    """Start Django, serve one request and report the timings (child process)."""
+    started = time.perf_counter()
+    import io
+
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+    setup = time.perf_counter() - started
+
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': PATH,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    status = []
+    body = application(environ, lambda s, h, exc_info=None: status.append(s))
+    try:
+        b''.join(body)
+    finally:
+        body.close()
+    first = time.perf_counter() - started
+    if not status[0].startswith('200'):
+        raise SystemExit(f'{PATH} answered {status[0]}')
+    return {'setup_ms': setup * 1000, 'first_ms': first * 1000, 'modules': len(sys.modules)}
+
+
+def run_profile(settings_module: str, runs: int) -> Dict[str, List[float]]:
+    """Start ``runs`` fresh workers with ``settings_module`` and collect their timings."""
+    samples: Dict[str, List[float]] = {'setup_ms': [], 'first_ms': [], 'process_ms': [], 'modules': []}
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module}
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, __file__, '--child'],
+            check=True, capture_output=True, text=True, cwd=PROJECT_DIR, env=env,
+        ).stdout
+        samples['process_ms'].append((time.perf_counter() - started) * 1000)
+        for name, value in json.loads(output.strip().splitlines()[-1]).items():
+            samples[name].append(value)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=10, help='Fresh processes per profile.')
+    parser.add_argument('--tasks', type=int, default=1000, help='Rows in the benchmark database.')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, str(PROJECT_DIR))
+        print(json.dumps(first_response()))
+        return
+
+    sys.path.insert(0, str(PROJECT_DIR))
+    os.environ['DJANGO_SETTINGS_MODULE'] = PROFILES['full']
+    import django
+
+    from bench.asgi_vs_wsgi import prepare_database
+
+    django.setup()
+    prepare_database(args.tasks)
+
+    results = {name: run_profile(module, args.runs) for name, module in PROFILES.items()}
+
+    print(f'Cold start over {args.runs} runs (median / min), first request GET {PATH}')
+    print(f'{"profile":<8} {"setup ms":>17} {"first ms":>17} {"process ms":>17} {"modules":>8}')
+    for name, samples in results.items():
+        cells = [
+            f'{statistics.median(samples[key]):8.1f} / {min(samples[key]):6.1f}'
+            for key in ('setup_ms', 'first_ms', 'process_ms')
+        ]
+        print(f'{name:<8} {cells[0]:>17} {cells[1]:>17} {cells[2]:>17} {int(statistics.median(samples["modules"])):>8}')
+
+    full, api = (statistics.median(results[name]['first_ms']) for name in ('full', 'api'))
+    print(f'API profile reaches its first response {full / api:.2f}x as fast ({full - api:.1f} ms saved)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+"""
+JSON API views for tasks.
+
+Every endpoint reads and writes only the requesting user's tasks (see
+``views.user_tasks``).  Clients authenticate with the session cookie, so
+writes are CSRF-protected: send the ``csrftoken`` cookie's value in the
+``X-CSRFToken`` header.  The task list sets that cookie.
+"""
+
+import json
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_GET, require_POST
+
+from .batch import BatchError, apply_batch, parse_version
+from .changes import CursorExpired, get_changes
+from .conditional import task_condition
+from .export import CONTENT_TYPES, filter_tasks, iter_export, parse_moment
+from .models import owner_id
+from .pagination import InvalidCursor, paginate
+from .recurrence import expand, get_agenda_limit, get_agenda_max_days
+from .replicas import replica_reads
+from .search import decode_search_cursor, search_tasks
+from .views import get_page_size, toggle_task, user_tasks
+
+
+@replica_reads
+@require_GET
+@ensure_csrf_cookie
+@task_condition
+def task_list_json(request: HttpRequest) -> JsonResponse:
+    """
+    Return one cursor-paginated page of tasks as JSON.
+    
+    Response body::
+    
+        {"results": [...], "next_cursor": "...", "prev_cursor": null}
+    
+    Also sets the ``csrftoken`` cookie that API writes must echo back.
+    """
+    try:
+        page = paginate(user_tasks(request), request.GET.get('cursor'), get_page_size())
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    
+    return JsonResponse({
+        'results': [task.to_dict() for task in page.items],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+    })
+
+
+@require_GET
+def task_detail_json(request: HttpRequest, pk: int) -> JsonResponse:
+    """
+    Return a single task as JSON.
+    """
+    task = get_object_or_404(user_tasks(request), pk=pk)
+    return JsonResponse(task.to_dict())
+
+
+def requested_version(request: HttpRequest) -> Optional[int]:
+    """
+    Return the ``version`` sent with a write, from a JSON or form body.
+    
+    Raises:
+        ValueError: If the body or the version is malformed
+    """
+    if request.content_type == 'application/json':
+        body = json.loads(request.body) if request.body else {}
+        if not isinstance(body, dict):
+            raise ValueError('Request body must be an object')
+        return parse_version(body.get('version'))
+    return parse_version(request.POST.get('version'))
+
+
+def version_conflict(current: Optional[int]) -> JsonResponse:
+    """409 response for a write based on an outdated version of a task."""
+    if current is None:
+        raise Http404('No Task matches the given query.')
+    return JsonResponse({'error': 'Version conflict', 'version': current}, status=409)
+
+
+@require_POST
+def task_toggle_json(request: HttpRequest, pk: int) -> JsonResponse:
+    """
+    Toggle the completion status of a task and return it as JSON.
+    
+    The flip happens in the database with one ``UPDATE``, so concurrent
+    toggles cannot lose each other's writes.  Send ``{"version": n}`` to
+    toggle only if the task is still at version ``n``; otherwise the
+    response is 409 with the current version.
+    """
+    try:
+        version = requested_version(request)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid version'}, status=400)
+    
+    if not toggle_task(pk, version, owner_id(request.user)):
+        if version is None:
+            raise Http404('No Task matches the given query.')
+        return version_conflict(
+            user_tasks(request).filter(pk=pk).values_list('version', flat=True).first()
+        )
+    task = get_object_or_404(user_tasks(request), pk=pk)
+    return JsonResponse(task.to_dict())
+
+
+@require_POST
+def task_batch(request: HttpRequest) -> JsonResponse:
+    """
+    Apply a batch of create/update/toggle/delete operations in one transaction.
+    
+    Request body is either a list of operations or::
+    
+        {"operations": [...], "atomic": false}
+    
+    See ``myapp.batch`` for the operation format.  Responds with one result
+    per operation, in request order, and the next occurrences created by
+    completing recurring tasks (``created_occurrences``).  An atomic batch
+    that is not applied responds with 400, or 409 if only version
+    conflicts stopped it.
+    """
+    try:
+        body = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Request body must be valid JSON'}, status=400)
+    
+    atomic = False
+    if isinstance(body, dict):
+        atomic = bool(body.get('atomic', False))
+        body = body.get('operations')
+    
+    max_operations = getattr(settings, 'TASK_BATCH_MAX_OPERATIONS', 1000)
+    if isinstance(body, list) and len(body) > max_operations:
+        return JsonResponse(
+            {'error': f'At most {max_operations} operations per batch'}, status=400
+        )
+    
+    try:
+        outcome = apply_batch(body, atomic=atomic, user_id=owner_id(request.user))
+    except BatchError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    
+    failed = {result['status'] for result in outcome.results} - {'ok', 'skipped'}
+    status = 200
+    if atomic and failed:
+        status = 409 if failed == {'conflict'} else 400
+    return JsonResponse({
+        'results': outcome.results,
+        'created_occurrences': outcome.created_occurrences,
+    }, status=status)
+
+
+@require_GET
+def task_export(request: HttpRequest) -> HttpResponse:
+    """
+    Stream every matching task as CSV or NDJSON.
+    
+    Query parameters: ``format`` (``csv`` or ``ndjson``, default ``csv``),
+    ``completed``, ``priority``, ``created_after`` and ``created_before``.
+    """
+    fmt = request.GET.get('format', 'csv')
+    try:
+        tasks = filter_tasks(request.GET, user_tasks(request))
+        rows = iter_export(tasks, fmt)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    
+    response = StreamingHttpResponse(rows, content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="tasks.{fmt}"'
+    return response
+
+
+@replica_reads
+@require_GET
+@task_condition
+def task_search_json(request: HttpRequest) -> JsonResponse:
+    """
+    Return one page of tasks matching ``q``, best match first.
+    
+    Response body::
+    
+        {"results": [{..., "rank": 1.23}], "next_cursor": "50", "prev_cursor": null,
+         "truncated": false}
+    
+    ``truncated`` is true when ``TASK_SEARCH_RANK_WINDOW`` left older matches out.
+    """
+    try:
+        offset = decode_search_cursor(request.GET.get('cursor'))
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    
+    page = search_tasks(
+        request.GET.get('q', ''), get_page_size(), offset, user_id=owner_id(request.user)
+    )
+    return JsonResponse({
+        'results': [{**task.to_dict(), 'rank': task.rank} for task in page.items],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+        'truncated': page.truncated,
+    })
+
+
+@replica_reads
+@require_GET
+@task_condition
+def task_agenda_json(request: HttpRequest) -> JsonResponse:
+    """
+    Return the tasks due between ``start`` and ``end``, soonest first.
+    
+    Both are ISO dates or datetimes; a bare ``end`` date includes that
+    whole day.  Recurring tasks are expanded on the fly: their future
+    occurrences are listed with ``"virtual": true``, the ``id`` of the
+    series' open task and the occurrence's ``due_date``, and are not
+    stored.  At most ``TASK_AGENDA_LIMIT`` occurrences are returned;
+    ``truncated`` says whether the range held more.  Response body::
+    
+        {"results": [{..., "virtual": false}], "truncated": false}
+    """
+    try:
+        start = parse_moment(request.GET.get('start', ''))
+        end = parse_moment(request.GET.get('end', ''), end_of_day=True)
+    except ValueError:
+        return JsonResponse({'error': 'start and end must be ISO dates or datetimes'}, status=400)
+    max_days = get_agenda_max_days()
+    if not start <= end <= start + timedelta(days=max_days):
+        return JsonResponse({'error': f'end must be after start, by at most {max_days} days'}, status=400)
+    
+    occurrences, truncated = expand(user_tasks(request), start, end, get_agenda_limit())
+    return JsonResponse({
+        'results': [occurrence.to_dict() for occurrence in occurrences],
+        'truncated': truncated,
+    })
+
+
+@require_GET
+def task_changes_json(request: HttpRequest) -> JsonResponse:
+    """
+    Return what changed since the ``since`` cursor, oldest change first.
+    
+    Omit ``since`` for the initial sync, which lists every task.  Keep
+    requesting with ``next_cursor`` while ``has_more`` is true, then poll
+    with it.  ``limit`` (up to ``TASK_CHANGES_MAX_PAGE_SIZE``) sets the
+    page size.  Response body::
+    
+        {"changed": [...], "deleted": [{"id": 7, "deleted_at": "..."}],
+         "next_cursor": "...", "has_more": false}
+    
+    A cursor older than the tombstone retention gets 410: the client must
+    discard its copy and resync.
+    """
+    max_limit = getattr(settings, 'TASK_CHANGES_MAX_PAGE_SIZE', 1000)
+    try:
+        limit = int(request.GET.get('limit', get_page_size()))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= max_limit:
+        return JsonResponse({'error': f'limit must be between 1 and {max_limit}'}, status=400)
+    
+    try:
+        page = get_changes(request.GET.get('since'), limit, owner_id(request.user))
+    except CursorExpired:
+        return JsonResponse({'error': 'Cursor expired; resync without "since"'}, status=410)
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    
+    return JsonResponse({
+        'changed': [task.to_dict() for task in page.changed],
+        'deleted': [
+            {'id': tombstone.task_id, 'deleted_at': tombstone.deleted_at.isoformat()}
+            for tombstone in page.deleted
+        ],
+        'next_cursor': page.next_cursor,
+        'has_more': page.has_more,
+    })
+
+
+def bad_request_json(request: HttpRequest, exception: Exception) -> JsonResponse:
+    """
+    ``handler400`` of the API-only URLconf (``myproject.api_urls``).
+    
+    The error handlers answer in JSON, so an API worker never builds the
+    template engine just to render an error page.
+    """
+    return JsonResponse({'error': 'Bad request'}, status=400)
+
+
+def permission_denied_json(request: HttpRequest, exception: Exception) -> JsonResponse:
+    """``handler403`` of the API-only URLconf."""
+    return JsonResponse({'error': 'Permission denied'}, status=403)
+
+
+def csrf_failure_json(request: HttpRequest, reason: str = '') -> JsonResponse:
+    """``CSRF_FAILURE_VIEW`` of the API-only settings."""
+    return JsonResponse({'error': f'CSRF verification failed: {reason}'}, status=403)
+
+
+def page_not_found_json(request: HttpRequest, exception: Exception) -> JsonResponse:
+    """``handler404`` of the API-only URLconf."""
+    return JsonResponse({'error': 'Not found'}, status=404)
+
+
+def server_error_json(request: HttpRequest) -> JsonResponse:
+    """``handler500`` of the API-only URLconf."""
+    return JsonResponse({'error': 'Server error'}, status=500)
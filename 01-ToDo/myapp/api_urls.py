@@ -0,0 +1,13 @@
+from django.urls import path
+from . import api
+
+urlpatterns = [
+    path('', api.task_list_json, name='api_task_list'),
+    path('<int:pk>', api.task_detail_json, name='api_task_detail'),
+    path('<int:pk>/toggle', api.task_toggle_json, name='api_task_toggle'),
+    path('batch', api.task_batch, name='api_task_batch'),
+    path('export', api.task_export, name='api_task_export'),
+    path('search', api.task_search_json, name='api_task_search'),
+    path('agenda', api.task_agenda_json, name='api_task_agenda'),
+    path('changes', api.task_changes_json, name='api_task_changes'),
+]
@@ -1,6 +1,29 @@
 from django.apps import AppConfig
+from django.core import checks
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete
 
 
 class MyappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'myapp'
+
+    def ready(self) -> None:
+        """Connect signal handlers that keep denormalized data in sync and register checks."""
+        from django.contrib.auth import get_user_model
+
+        from . import changes, search, sharding, stats
+        from .models import Task
+
+        post_save.connect(stats.task_saved, sender=Task, dispatch_uid='task_stats_saved')
+        post_delete.connect(stats.task_deleted, sender=Task, dispatch_uid='task_stats_deleted')
+        post_delete.connect(changes.task_deleted, sender=Task, dispatch_uid='task_tombstone')
+        post_migrate.connect(
+            search.sqlite_triggers_post_migrate, sender=self, dispatch_uid='task_search_triggers'
+        )
+        post_migrate.connect(
+            sharding.shards_post_migrate, sender=self, dispatch_uid='task_shard_id_ranges'
+        )
+        pre_delete.connect(
+            sharding.user_deleted, sender=get_user_model(), dispatch_uid='task_shard_user_deleted'
+        )
+        checks.register(search.check_search_backend)
@@ -0,0 +1,92 @@
+"""
+Hot/cold archival of completed tasks.
+
+Tasks completed more than ``TASK_ARCHIVE_AFTER_DAYS`` ago are moved from
+the task table to :class:`~myapp.models.ArchivedTask`, in batches of one
+transaction each.  A batch copies its rows with one ``INSERT ... SELECT``,
+then leaves change-feed tombstones and deletes them, so an interrupted
+run loses nothing and the next run carries on from where it stopped.
+
+There is no completion timestamp, so ``updated_at`` stands in for it: any
+later edit of a completed task postpones its archival.
+
+Archived tasks leave the counters and the change feed like deleted ones;
+the archive is browsed separately (``views.task_archive``).  Each shard
+is archived on its own; a task and its archived copy stay on the owner's
+shard.
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Count, DateTimeField, QuerySet, Value
+from django.utils import timezone
+
+from . import changes, stats
+from .models import ArchivedTask, Task
+
+
+# Task fields copied to the archive, in the archive's column order
+ARCHIVED_FIELDS = (
+    'id', 'title', 'description', 'completed', 'created_at', 'updated_at',
+    'due_date', 'priority', 'user', 'version',
+)
+
+# Oldest first, on the (updated_at, id) index
+ARCHIVE_ORDER = ('updated_at', 'pk')
+
+
+def get_archive_after() -> timedelta:
+    """How long completed tasks stay in the task table."""
+    return timedelta(days=getattr(settings, 'TASK_ARCHIVE_AFTER_DAYS', 90))
+
+
+def archivable(cutoff: Optional[datetime] = None, using: str = DEFAULT_DB_ALIAS) -> QuerySet:
+    """Completed tasks on shard ``using`` last changed before ``cutoff`` (default: per settings)."""
+    if cutoff is None:
+        cutoff = timezone.now() - get_archive_after()
+    return Task.objects.using(using).filter(completed=True, updated_at__lt=cutoff)
+
+
+def archive_batch(cutoff: datetime, batch_size: int, using: str = DEFAULT_DB_ALIAS) -> int:
+    """
+    Move up to ``batch_size`` of the oldest archivable tasks, atomically.
+
+    Rows are locked while they move (``SKIP LOCKED`` where supported, so
+    tasks being edited are left for the next run).  Returns the number of
+    tasks moved; 0 means nothing is left to archive.
+    """
+    with transaction.atomic(using=using):
+        ids = list(
+            archivable(cutoff, using).select_for_update(skip_locked=True)
+            .order_by(*ARCHIVE_ORDER).values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        batch = Task.objects.using(using).filter(pk__in=ids)
+        per_owner = list(batch.order_by().values_list('user_id').annotate(count=Count('pk')))
+        _copy_to_archive(batch)
+        changes.record_deletions(batch)
+        moved = batch._raw_delete(batch.db)
+        for user_id, count in per_owner:
+            stats.adjust(total=-count, completed=-count, deleted=count, user_id=user_id, using=using)
+    return moved
+
+
+def _copy_to_archive(queryset: QuerySet) -> None:
+    connection = connections[queryset.db]
+    qn = connection.ops.quote_name
+    rows = queryset.order_by().annotate(
+        archive_moved_at=Value(timezone.now(), output_field=DateTimeField())
+    ).values_list(*ARCHIVED_FIELDS, 'archive_moved_at')
+    sql, params = rows.query.sql_with_params()
+    columns = [ArchivedTask._meta.get_field(name).column for name in ARCHIVED_FIELDS]
+    columns.append(ArchivedTask._meta.get_field('archived_at').column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {qn(ArchivedTask._meta.db_table)} '
+            f'({", ".join(qn(column) for column in columns)}) {sql}',
+            params,
+        )
@@ -0,0 +1,139 @@
+"""
+Async versions of the read-heavy views and JSON endpoints.
+
+Served by ``myproject.asgi_urls`` when the project runs under an ASGI
+server (``uvicorn myproject.asgi:application``); under WSGI the sync views
+in ``views``/``api`` are used.  These views use the async ORM (``aget``,
+``afirst``, ``aaggregate`` and ``async for``) so that no worker
+thread is held while a request waits, and resolve the user with
+``request.auser()``.
+
+Note that Django still executes the queries themselves on a thread via
+``sync_to_async``; the win is in how many in-flight requests one process
+can hold, not in raw query speed.  See ``bench/asgi_vs_wsgi.py``.
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpRequest, HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.shortcuts import render
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_GET, require_POST
+
+from .conditional import atask_stats, task_condition
+from .models import Task, owner_id
+from .pagination import InvalidCursor, apaginate
+from .replicas import replica_reads
+from .api import requested_version, version_conflict
+from .views import get_page_size, get_row_cache_timeout, task_list_query, toggle_task
+
+
+@replica_reads
+@task_condition
+async def home(request: HttpRequest) -> HttpResponse:
+    """
+    Home page view showing task statistics.
+    """
+    task_stats = await atask_stats(request)
+    context = {
+        'total_tasks': task_stats['total'],
+        'completed_tasks': task_stats['completed'],
+        'pending_tasks': task_stats['pending'],
+    }
+    return render(request, 'home.html', context)
+
+
+@replica_reads
+@task_condition
+async def task_list(request: HttpRequest) -> HttpResponse:
+    """
+    Display one page of tasks, newest first unless ``?sort=`` says otherwise.
+    """
+    user_id = owner_id(await request.auser())
+    try:
+        tasks, ordering, list_query = task_list_query(request.GET, Task.objects.owned_by(user_id))
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    try:
+        page = await apaginate(tasks.annotate_overdue(), request.GET.get('cursor'), get_page_size(), ordering)
+    except InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor')
+
+    task_stats = await atask_stats(request)
+    context = {
+        'tasks': page.items,
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+        'total_tasks': task_stats['total'],
+        'completed_tasks': task_stats['completed'],
+        'pending_tasks': task_stats['pending'],
+        'row_cache_timeout': get_row_cache_timeout(),
+        'list_query': list_query,
+        'sort': request.GET.get('sort', ''),
+        'priority': request.GET.get('priority', ''),
+        'completed': request.GET.get('completed', ''),
+    }
+    return render(request, 'myapp/task_list.html', context)
+
+
+@replica_reads
+@require_GET
+@ensure_csrf_cookie
+@task_condition
+async def task_list_json(request: HttpRequest) -> JsonResponse:
+    """
+    Return one cursor-paginated page of tasks as JSON.
+
+    Sets the ``csrftoken`` cookie, as ``api.task_list_json`` does.
+    """
+    try:
+        page = await apaginate(
+            Task.objects.for_user(await request.auser()), request.GET.get('cursor'), get_page_size()
+        )
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    return JsonResponse({
+        'results': [task.to_dict() for task in page.items],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+    })
+
+
+@require_GET
+async def task_detail_json(request: HttpRequest, pk: int) -> JsonResponse:
+    """
+    Return a single task as JSON.
+    """
+    try:
+        task = await Task.objects.for_user(await request.auser()).aget(pk=pk)
+    except Task.DoesNotExist:
+        raise Http404('No Task matches the given query.')
+    return JsonResponse(task.to_dict())
+
+
+@require_POST
+async def task_toggle_json(request: HttpRequest, pk: int) -> JsonResponse:
+    """
+    Toggle the completion status of a task and return it as JSON.
+
+    Same contract as ``api.task_toggle_json``, including the optional
+    ``version`` check and the ``X-CSRFToken`` header.
+    """
+    try:
+        version = requested_version(request)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid version'}, status=400)
+
+    user_id = owner_id(await request.auser())
+    tasks = Task.objects.owned_by(user_id)
+    if not await sync_to_async(toggle_task)(pk, version, user_id):
+        if version is None:
+            raise Http404('No Task matches the given query.')
+        return version_conflict(
+            await tasks.filter(pk=pk).values_list('version', flat=True).afirst()
+        )
+    try:
+        task = await tasks.aget(pk=pk)
+    except Task.DoesNotExist:
+        raise Http404('No Task matches the given query.')
+    return JsonResponse(task.to_dict())
@@ -0,0 +1,277 @@
+"""
+Apply many task mutations in one transaction.
+
+Used by the ``/api/tasks/batch`` endpoint so that sync clients can push
+hundreds of changes in a single request.  All referenced tasks are loaded
+and locked with one ``SELECT ... FOR UPDATE``, new tasks are inserted with
+one ``bulk_create``, tasks that are only toggled flip with one ``UPDATE``
+(``TaskQuerySet.toggle_completed``), edited tasks are written with one
+``bulk_update`` per set of changed fields, so a task's other columns are
+never rewritten, and deletions run as a single ``DELETE ... WHERE id IN
+(...)``.  Every written task gets a new ``version``, returned in its result.
+
+Like the single-task endpoints, an operation on an existing task may carry
+the ``version`` the client last saw.  If the task is no longer at that
+version the item is not applied and its result is ``{"status":
+"conflict", "version": <current>}``.  All operations of a batch on one task
+refer to the version it had before the batch.
+
+A batch acts on one owner's tasks (``user_id``) on that owner's shard;
+ids of other owners' tasks are reported as not found.
+
+Operation format::
+
+    {"op": "create", "data": {"title": "...", "priority": "high"}}
+    {"op": "update", "id": 7, "version": 3, "data": {"completed": true}}
+    {"op": "toggle", "id": 7, "version": 3}
+    {"op": "delete", "id": 7}
+
+Completing a recurring task creates its next occurrence (see
+``myapp.recurrence``).  Occurrences are not tied to an operation; they are
+returned together in ``BatchResult.created_occurrences``.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import recurrence, stats
+from .models import Task
+
+
+OPERATIONS = ('create', 'update', 'toggle', 'delete')
+
+# Fields clients are allowed to set
+WRITABLE_FIELDS = ('title', 'description', 'completed', 'priority', 'due_date', 'recurrence')
+
+
+class BatchError(ValueError):
+    """Raised when the batch as a whole is malformed."""
+
+
+@dataclass
+class BatchResult:
+    """
+    Outcome of a batch.
+
+    Attributes:
+        results: One result per operation, in request order
+        created_occurrences: Tasks created by completing recurring tasks
+    """
+    results: List[Dict[str, Any]]
+    created_occurrences: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def _error(index: int, errors: Any) -> Dict[str, Any]:
+    if isinstance(errors, ValidationError):
+        errors = errors.message_dict if hasattr(errors, 'error_dict') else {'__all__': errors.messages}
+    elif isinstance(errors, str):
+        errors = {'__all__': [errors]}
+    return {'index': index, 'status': 'error', 'errors': errors}
+
+
+def _conflict(index: int, task: Task) -> Dict[str, Any]:
+    return {'index': index, 'status': 'conflict', 'id': task.pk, 'version': task._loaded_version}
+
+
+def parse_version(value: Any) -> Optional[int]:
+    """
+    Return a client-supplied task version, or ``None`` if none was sent.
+
+    Raises:
+        ValueError: If ``value`` is not a positive integer
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        raise ValueError(value)
+    version = int(value)
+    if version < 1:
+        raise ValueError(value)
+    return version
+
+
+def apply_field_data(task: Task, data: Any) -> List[str]:
+    """
+    Assign client-supplied values to ``task`` and validate them against the
+    model field constraints (max length, choices, datetime parsing).
+
+    Returns:
+        The names of the fields that were assigned
+
+    Raises:
+        ValidationError: If a field is unknown or a value is invalid
+    """
+    if not isinstance(data, dict):
+        raise ValidationError('"data" must be an object')
+
+    unknown = sorted(set(data) - set(WRITABLE_FIELDS))
+    if unknown:
+        raise ValidationError({name: ['Unknown or read-only field'] for name in unknown})
+
+    for name, value in data.items():
+        setattr(task, name, value)
+
+    exclude = [f.name for f in Task._meta.fields if f.name not in WRITABLE_FIELDS]
+    task.full_clean(exclude=exclude, validate_unique=False)
+    if task.due_date and timezone.is_naive(task.due_date):
+        task.due_date = timezone.make_aware(task.due_date)
+    return list(data)
+
+
+def apply_batch(operations: Any, atomic: bool = False,
+                user_id: Optional[int] = None) -> BatchResult:
+    """
+    Validate and apply ``operations``, returning one result per item.
+
+    Invalid items are reported and skipped; valid items are applied together
+    in one transaction.  With ``atomic=True`` any invalid or conflicting
+    item aborts the whole batch and nothing is written.
+
+    Raises:
+        BatchError: If ``operations`` is not a list of operation objects
+    """
+    if not isinstance(operations, list):
+        raise BatchError('"operations" must be a list')
+
+    ids = set()
+    for item in operations:
+        if not isinstance(item, dict):
+            raise BatchError('Each operation must be an object')
+        if item.get('op') != 'create' and isinstance(item.get('id'), int):
+            ids.add(item['id'])
+    tasks = Task.objects.owned_by(user_id)
+
+    with transaction.atomic(using=tasks.db):
+        # One query for every task the batch refers to.  The rows stay locked
+        # until commit, so concurrent writers wait instead of being overwritten
+        existing: Dict[int, Task] = tasks.select_for_update().in_bulk(ids) if ids else {}
+        stored = {
+            pk: {name: getattr(task, name) for name in WRITABLE_FIELDS}
+            for pk, task in existing.items()
+        }
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(operations)
+        to_create: List[tuple] = []
+        to_update: Dict[int, Task] = {}
+        edited = set()
+        to_delete: Dict[int, int] = {}
+
+        for index, item in enumerate(operations):
+            op = item.get('op')
+            if op not in OPERATIONS:
+                results[index] = _error(index, f'Unknown op {op!r}')
+                continue
+
+            if op == 'create':
+                task = Task(user_id=user_id)
+                try:
+                    apply_field_data(task, item.get('data', {}))
+                except ValidationError as exc:
+                    results[index] = _error(index, exc)
+                    continue
+                to_create.append((index, task))
+                continue
+
+            task = existing.get(item.get('id'))
+            if task is None or task.pk in to_delete:
+                results[index] = _error(index, 'Task not found')
+                continue
+
+            try:
+                version = parse_version(item.get('version'))
+            except (TypeError, ValueError):
+                results[index] = _error(index, {'version': ['Invalid version']})
+                continue
+            if version is not None and version != task._loaded_version:
+                results[index] = _conflict(index, task)
+                continue
+
+            if op == 'delete':
+                to_update.pop(task.pk, None)
+                to_delete[task.pk] = index
+                results[index] = {'index': index, 'status': 'ok', 'id': task.pk}
+                continue
+
+            if op == 'toggle':
+                task.completed = not task.completed
+            else:
+                snapshot = {name: getattr(task, name) for name in WRITABLE_FIELDS}
+                try:
+                    apply_field_data(task, item.get('data', {}))
+                except ValidationError as exc:
+                    # Undo this item only; earlier ops on the same task still apply
+                    for name, value in snapshot.items():
+                        setattr(task, name, value)
+                    results[index] = _error(index, exc)
+                    continue
+                edited.add(task.pk)
+            to_update[task.pk] = task
+            results[index] = {'index': index, 'status': 'ok', 'id': task.pk}
+
+        if atomic and any(result and result['status'] != 'ok' for result in results):
+            return BatchResult([
+                result if result and result['status'] != 'ok' else {'index': i, 'status': 'skipped'}
+                for i, result in enumerate(results)
+            ])
+
+        if to_create:
+            created = tasks.bulk_create([task for _, task in to_create])
+            stats.adjust(
+                total=len(created),
+                completed=sum(int(task.completed) for task in created),
+                user_id=user_id,
+            )
+
+        # Tasks that were only toggled flip in SQL; edited tasks write the
+        # fields that differ from the locked row, grouped by those fields
+        toggled: List[int] = []
+        groups: Dict[Tuple[str, ...], List[Task]] = {}
+        for pk, task in to_update.items():
+            changed = tuple(name for name in WRITABLE_FIELDS if getattr(task, name) != stored[pk][name])
+            if changed == ('completed',) and pk not in edited:
+                toggled.append(pk)
+            elif changed:
+                groups.setdefault(changed, []).append(task)
+
+        if toggled:
+            tasks.filter(pk__in=toggled).toggle_completed()
+            stats.adjust_toggled(toggled, user_id)
+        if groups:
+            now = timezone.now()
+            completed_delta = 0
+            for changed, group in groups.items():
+                for task in group:
+                    task.updated_at = now
+                    task.version = F('version') + 1
+                    completed_delta += int(task.completed) - int(task._loaded_completed)
+                tasks.bulk_update(group, [*changed, 'updated_at', 'version'])
+            stats.adjust(completed=completed_delta, user_id=user_id)
+
+        written = toggled + [task.pk for group in groups.values() for task in group]
+        occurrences: List[Task] = []
+        if written:
+            rows = tasks.filter(pk__in=written).values_list('pk', 'version', 'updated_at', 'completed')
+            for pk, version, updated_at, completed in rows:
+                task = to_update[pk]
+                task.version = task._loaded_version = version
+                task.updated_at = updated_at
+                task.completed = task._loaded_completed = completed
+            occurrences = recurrence.advance(tasks, [
+                to_update[pk] for pk in written
+                if to_update[pk].completed and not stored[pk]['completed']
+            ])
+        if to_delete:
+            # Goes through the collector, so post_delete keeps the counters right
+            tasks.filter(pk__in=list(to_delete)).delete()
+
+    for index, task in to_create:
+        results[index] = {'index': index, 'status': 'ok', 'id': task.pk, 'task': task.to_dict()}
+    for result in results:
+        if result['status'] == 'ok' and result['id'] in to_update:
+            result['task'] = to_update[result['id']].to_dict()
+    return BatchResult(results, [task.to_dict() for task in occurrences])
@@ -0,0 +1,49 @@
+"""
+Cache backends used by the app.
+"""
+
+import os
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+
+
+class LRUFileBasedCache(FileBasedCache):
+    """
+    File-based cache that evicts least-recently-used entries.
+
+    Django's ``FileBasedCache`` culls a random fraction of files when
+    ``MAX_ENTRIES`` is reached.  This variant bumps a file's mtime on every
+    hit and culls the oldest files first, so hot entries (e.g. rows on the
+    first page of the task list) survive eviction.  Locmem is already LRU.
+    """
+
+    _missing = object()
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._missing, version)
+        if value is self._missing:
+            return default
+        try:
+            os.utime(self._key_to_file(key, version))
+        except OSError:
+            pass
+        return value
+
+    def _cull(self):
+        filelist = self._list_cache_files()
+        num_entries = len(filelist)
+        if num_entries < self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            return self.clear()
+
+        def last_used(path):
+            try:
+                return os.path.getmtime(path)
+            except OSError:
+                return time.time()
+
+        filelist.sort(key=last_used)
+        for fname in filelist[:int(num_entries / self._cull_frequency)]:
+            self._delete(fname)
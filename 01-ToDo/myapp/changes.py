@@ -0,0 +1,206 @@
+"""
+Incremental change feed for sync clients.
+
+Clients keep a cursor and ask for what happened to their tasks since,
+instead of re-reading every task:
+
+* changed tasks come from a keyset scan of the ``(user, updated_at, id)``
+  index, so each request costs O(changes), not O(tasks);
+* deleted tasks come from :class:`~myapp.models.TaskTombstone`, written by
+  the ``post_delete`` handler below and scanned the same way on
+  ``(user_id, deleted_at, id)``.
+
+Both streams are merged in time order.  The cursor records how far each
+has been read.  Timestamps are assigned before commit, so the feed stays
+``TASK_CHANGES_SETTLE_SECONDS`` behind the clock: a transaction still in
+flight cannot commit a change behind a cursor that was already handed out.
+
+Tombstones are kept for ``TASK_TOMBSTONE_RETENTION_DAYS`` and then removed
+by ``manage.py purge_tombstones``.  A cursor whose deletions may have been
+purged is rejected with :class:`CursorExpired`; the client must resync.
+
+Code paths that bypass model signals (``QuerySet._raw_delete``) must call
+:func:`record_deletions` themselves.
+"""
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import DateTimeField, Model, Q, QuerySet, Value
+from django.utils import timezone
+
+from .models import Task, TaskTombstone
+from .pagination import InvalidCursor
+from .sharding import deleted_with_owner
+
+
+# Position in one stream: last (timestamp, id) read
+Position = Tuple[datetime, int]
+
+
+class CursorExpired(InvalidCursor):
+    """Raised for a cursor older than the tombstone retention period."""
+
+
+@dataclass
+class ChangePage:
+    """
+    One page of the change feed.
+
+    Attributes:
+        changed: Tasks created or updated since the cursor, oldest first
+        deleted: Tombstones of tasks deleted since the cursor, oldest first
+        next_cursor: Cursor to send as ``since`` on the next request
+        has_more: Whether more changes are available right away
+    """
+    changed: List[Task]
+    deleted: List[TaskTombstone]
+    next_cursor: str
+    has_more: bool
+
+
+def get_settle_seconds() -> float:
+    """How far the feed stays behind the clock."""
+    return getattr(settings, 'TASK_CHANGES_SETTLE_SECONDS', 2)
+
+
+def get_retention() -> timedelta:
+    """How long tombstones are kept."""
+    return timedelta(days=getattr(settings, 'TASK_TOMBSTONE_RETENTION_DAYS', 30))
+
+
+def encode_changes_cursor(changed: Position, deleted: Position) -> str:
+    """Build an opaque cursor from the two stream positions."""
+    payload = json.dumps(
+        {'c': [changed[0].isoformat(), changed[1]], 'd': [deleted[0].isoformat(), deleted[1]]},
+        separators=(',', ':'),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_changes_cursor(cursor: str) -> Tuple[Position, Position]:
+    """
+    Decode a cursor into the changed and deleted stream positions.
+
+    Raises:
+        InvalidCursor: If the cursor is malformed
+        CursorExpired: If deletions it has not seen may have been purged
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        positions = []
+        for key in ('c', 'd'):
+            moment, pk = payload[key]
+            moment = datetime.fromisoformat(moment)
+            if timezone.is_naive(moment) or not isinstance(pk, int):
+                raise ValueError(cursor)
+            positions.append((moment, pk))
+    except (ValueError, KeyError, TypeError, binascii.Error) as exc:
+        raise InvalidCursor(cursor) from exc
+
+    if positions[1][0] < timezone.now() - get_retention():
+        raise CursorExpired(cursor)
+    return positions[0], positions[1]
+
+
+def _after(queryset: QuerySet, field: str, position: Optional[Position]) -> QuerySet:
+    if position is None:
+        return queryset
+    moment, pk = position
+    # The redundant bound makes the OR an index range seek (see pagination)
+    return queryset.filter(
+        Q(**{f'{field}__gte': moment}),
+        Q(**{f'{field}__gt': moment}) | Q(**{field: moment, 'pk__gt': pk}),
+    )
+
+
+def get_changes(cursor: Optional[str], limit: int, user_id: Optional[int] = None) -> ChangePage:
+    """
+    Return up to ``limit`` changes to the tasks of ``user_id`` after ``cursor``.
+
+    Without a cursor every task is returned (the initial sync), but no
+    earlier deletions: the client has never seen those tasks.
+
+    Raises:
+        InvalidCursor: If the cursor is malformed
+        CursorExpired: If the cursor is too old to sync from
+    """
+    horizon = timezone.now() - timedelta(seconds=get_settle_seconds())
+    if cursor:
+        changed_position, deleted_position = decode_changes_cursor(cursor)
+    else:
+        changed_position, deleted_position = None, (horizon, 0)
+
+    # Both scans stop strictly before the horizon, so a position of
+    # (horizon, 0) picks up exactly where this page ended
+    tasks = list(
+        _after(Task.objects.owned_by(user_id).filter(updated_at__lt=horizon), 'updated_at', changed_position)
+        .order_by('updated_at', 'pk')[:limit + 1]
+    )
+    tombstones = list(
+        _after(
+            TaskTombstone.objects.owned_by(user_id).filter(deleted_at__lt=horizon),
+            'deleted_at', deleted_position,
+        ).order_by('deleted_at', 'pk')[:limit + 1]
+    )
+
+    merged: List[Tuple[datetime, int, Model]] = sorted(
+        [(task.updated_at, 0, task) for task in tasks]
+        + [(tombstone.deleted_at, 1, tombstone) for tombstone in tombstones],
+        key=lambda entry: entry[:2],
+    )[:limit]
+    changed = [item for _, kind, item in merged if kind == 0]
+    deleted = [item for _, kind, item in merged if kind == 1]
+
+    next_changed = _advance(changed_position, changed, tasks, 'updated_at', horizon)
+    next_deleted = _advance(deleted_position, deleted, tombstones, 'deleted_at', horizon)
+    return ChangePage(
+        changed=changed,
+        deleted=deleted,
+        next_cursor=encode_changes_cursor(next_changed, next_deleted),
+        has_more=len(changed) < len(tasks) or len(deleted) < len(tombstones),
+    )
+
+
+def _advance(position: Optional[Position], taken: List[Model], fetched: List[Model],
+             field: str, horizon: datetime) -> Position:
+    if len(taken) == len(fetched):
+        # Stream exhausted up to the horizon
+        return (horizon, 0)
+    if taken:
+        return (getattr(taken[-1], field), taken[-1].pk)
+    return position or (datetime.min.replace(tzinfo=timezone.utc), 0)
+
+
+def record_deletions(queryset: QuerySet) -> int:
+    """
+    Write tombstones for every task in ``queryset`` with one statement.
+
+    For deletes that bypass signals; call before the delete, in the same
+    transaction.  Returns the number of tombstones written.
+    """
+    connection = connections[queryset.db]
+    qn = connection.ops.quote_name
+    rows = queryset.order_by().annotate(
+        tombstone_deleted_at=Value(timezone.now(), output_field=DateTimeField())
+    ).values_list('pk', 'user_id', 'tombstone_deleted_at')
+    sql, params = rows.query.sql_with_params()
+    table = TaskTombstone._meta.db_table
+    columns = ', '.join(qn(column) for column in ('task_id', 'user_id', 'deleted_at'))
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {qn(table)} ({columns}) {sql}', params)
+        return cursor.rowcount
+
+
+def task_deleted(sender, instance: Task, using: str, **kwargs: Any) -> None:
+    """``post_delete`` handler: leave a tombstone for the change feed."""
+    if deleted_with_owner(kwargs.get('origin')):
+        return
+    TaskTombstone.objects.using(using).create(task_id=instance.pk, user_id=instance.user_id)
@@ -0,0 +1,143 @@
+"""
+HTTP validators (ETag / Last-Modified) for pages derived from the task table.
+
+A page only changes when one of the user's tasks is created, edited or
+deleted, or when an open one passes its due date (the overdue badge).
+Every write stamps ``updated_at`` on the user's ``TaskStats`` row, and
+deletions also advance its ``delete_seq`` (see ``myapp.stats``), so the
+validators come from that one row plus the latest due date already
+passed, read in the same query from the partial index of open tasks.
+Wrapping a view with :func:`task_condition` answers ``If-None-Match`` /
+``If-Modified-Since`` with 304 before the view runs its list query or
+renders a template.
+
+The row read for the validators also carries the counters: views get the
+dashboard numbers from :func:`task_stats` instead of reading them again.
+"""
+
+import hashlib
+from datetime import datetime
+from functools import wraps
+from typing import Any, Dict, Optional
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.db.models import Max, Subquery
+from django.http import HttpRequest
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import Task, owner_id
+from .stats import aget_task_stats, counter_row, counters_enabled, get_task_stats
+
+
+def task_state(request: HttpRequest) -> Dict[str, Any]:
+    """
+    Return the validator inputs, computed once per request.
+    """
+    state = getattr(request, '_task_state', None)
+    if state is not None:
+        return state
+
+    user_id = owner_id(request.user)
+    tasks = Task.objects.owned_by(user_id)
+    # The moment the most recent task became overdue (partial due_date index)
+    overdue_since = tasks.overdue().order_by('-due_date').values('due_date')[:1]
+    row = counter_row(user_id).annotate(overdue_since=Subquery(overdue_since)).values(
+        'total', 'completed', 'updated_at', 'delete_seq', 'deleted_at', 'overdue_since'
+    ).first()
+    if row is None:
+        # No write since the row was introduced: read the task table once
+        row = {
+            'total': None, 'completed': None, 'delete_seq': 0, 'deleted_at': None,
+            'updated_at': tasks.aggregate(latest=Max('updated_at'))['latest'],
+            'overdue_since': tasks.overdue().aggregate(latest=Max('due_date'))['latest'],
+        }
+
+    state = {
+        'user_id': user_id,
+        'last_updated': row['updated_at'],
+        'overdue_since': row['overdue_since'],
+        'delete_seq': row['delete_seq'],
+        'deleted_at': row['deleted_at'],
+        'stats': None,
+    }
+    if counters_enabled() and row['total'] is not None:
+        state['stats'] = {
+            'total': row['total'], 'completed': row['completed'],
+            'pending': row['total'] - row['completed'],
+        }
+    request._task_state = state
+    return state
+
+
+def task_stats(request: HttpRequest) -> Dict[str, int]:
+    """
+    The user's task counts, from the row :func:`task_state` read when possible.
+
+    Use in views wrapped with :func:`task_condition`.
+    """
+    state = task_state(request)
+    if state['stats'] is not None:
+        return dict(state['stats'])
+    return get_task_stats(state['user_id'])
+
+
+async def atask_stats(request: HttpRequest) -> Dict[str, int]:
+    """Async version of :func:`task_stats`."""
+    # Already computed by task_condition's async wrapper
+    state = getattr(request, '_task_state', None) or await sync_to_async(task_state)(request)
+    if state['stats'] is not None:
+        return dict(state['stats'])
+    return await aget_task_stats(state['user_id'])
+
+
+def task_etag(request: HttpRequest, *args, **kwargs) -> str:
+    """Strong validator: changes whenever any of the user's tasks changes or is deleted."""
+    state = task_state(request)
+    raw = '|'.join(str(part) for part in (
+        state['user_id'],
+        state['last_updated'].isoformat() if state['last_updated'] else '',
+        state['overdue_since'].isoformat() if state['overdue_since'] else '',
+        state['delete_seq'],
+        request.get_full_path(),
+    ))
+    return hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+
+def task_last_modified(request: HttpRequest, *args, **kwargs) -> Optional[datetime]:
+    """Latest of the newest edit, deletion and overdue transition."""
+    state = task_state(request)
+    moments = [
+        m for m in (state['last_updated'], state['deleted_at'], state['overdue_since']) if m
+    ]
+    return max(moments) if moments else None
+
+
+def task_condition(view):
+    """
+    Decorate a read-only view with task-table ETag/Last-Modified handling.
+
+    Responses are marked ``private, no-cache`` so browsers and proxies
+    revalidate on every poll, which the 304 path makes cheap.
+    """
+    conditional_view = condition(etag_func=task_etag, last_modified_func=task_last_modified)(view)
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request: HttpRequest, *args, **kwargs):
+            # condition() calls the validator functions synchronously, so
+            # compute their inputs off the event loop first
+            await sync_to_async(task_state)(request)
+            response = await conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request: HttpRequest, *args, **kwargs):
+        response = conditional_view(request, *args, **kwargs)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    return wrapper
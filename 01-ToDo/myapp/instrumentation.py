@@ -0,0 +1,254 @@
+"""
+Per-request timing and SQL instrumentation.
+
+:class:`RequestMetricsMiddleware` measures, for a sampled share of requests:
+
+* total time, and view time (from ``process_view`` to the response),
+* query count and database time, via ``connection.execute_wrapper`` on
+  every configured database,
+* template render time, via the :class:`TimedDjangoTemplates` backend,
+* duplicated SQL: the same statement issued repeatedly with different
+  parameters, which is what an N+1 loop looks like.
+
+The numbers go into a ``Server-Timing`` header (shown in the browser's
+network panel) and one structured log record per request on the
+``myapp.metrics`` logger.  Unsampled requests cost one ``random()`` call.
+
+Settings:
+
+* ``REQUEST_METRICS_SAMPLE_RATE`` (default ``1.0`` under ``DEBUG``, else
+  ``0.01``): share of requests measured.
+* ``REQUEST_METRICS_SERVER_TIMING`` (default ``DEBUG``): emit the header.
+  It exposes query counts and timings to every client, so it is off in
+  production unless enabled explicitly.
+* ``REQUEST_METRICS_DUPLICATE_THRESHOLD`` (default ``3``): executions of
+  the same SQL in one request that count as duplicates.
+
+Django only sends the ``template_rendered`` signal under the test runner,
+so template time comes from the backend subclass instead; set
+``'BACKEND': 'myapp.instrumentation.TimedDjangoTemplates'``.  Streaming
+responses are measured up to the point the view returns them.
+"""
+
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger('myapp.metrics')
+
+
+@dataclass
+class RequestMetrics:
+    """
+    Measurements for one request; times are in seconds.
+
+    Attributes:
+        queries: Number of SQL statements executed
+        db_time: Time spent executing them
+        template_time: Time spent rendering top-level templates
+        view_time: Time from ``process_view`` to the response
+        statements: Execution count per distinct SQL string
+    """
+    queries: int = 0
+    db_time: float = 0.0
+    template_time: float = 0.0
+    view_time: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+    started: float = field(default_factory=time.perf_counter)
+    view_started: Optional[float] = None
+    template_depth: int = 0
+
+    def finish(self) -> float:
+        """Close the measurement; return the total request time."""
+        ended = time.perf_counter()
+        if self.view_started is not None:
+            self.view_time = ended - self.view_started
+        return ended - self.started
+
+    def duplicates(self, threshold: int) -> List[Tuple[str, int]]:
+        """SQL executed at least ``threshold`` times, most repeated first."""
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar('request_metrics', default=None)
+
+
+def current_metrics() -> Optional[RequestMetrics]:
+    """The metrics of the request being handled, if it is sampled."""
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """``execute_wrapper`` that times every statement."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - started
+        metrics.queries += 1
+        metrics.statements[sql] += 1
+
+
+class TimedTemplate:
+    """Wrap a backend template so that ``render`` is timed."""
+
+    def __init__(self, template) -> None:
+        self.template = template
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None) -> str:
+        metrics = _current.get()
+        if metrics is None:
+            return self.template.render(context, request)
+        # Only the outermost render counts; nested renders are inside it
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Django template backend that reports render time to the metrics."""
+
+    def from_string(self, template_code: str) -> TimedTemplate:
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name: str) -> TimedTemplate:
+        return TimedTemplate(super().get_template(template_name))
+
+
+def get_sample_rate() -> float:
+    """Share of requests that are measured."""
+    return getattr(settings, 'REQUEST_METRICS_SAMPLE_RATE', 1.0 if settings.DEBUG else 0.01)
+
+
+def get_server_timing() -> bool:
+    """Whether measured responses carry a ``Server-Timing`` header."""
+    return getattr(settings, 'REQUEST_METRICS_SERVER_TIMING', settings.DEBUG)
+
+
+def get_duplicate_threshold() -> int:
+    """Executions of one SQL string in a request that count as duplicates."""
+    return getattr(settings, 'REQUEST_METRICS_DUPLICATE_THRESHOLD', 3)
+
+
+def server_timing(metrics: RequestMetrics, total: float, duplicated: int) -> str:
+    """Format a ``Server-Timing`` header value (durations in milliseconds)."""
+    db_desc = f'{metrics.queries} queries'
+    if duplicated:
+        db_desc += f', {duplicated} duplicated'
+    return ', '.join([
+        f'db;dur={metrics.db_time * 1000:.1f};desc="{db_desc}"',
+        f'tpl;dur={metrics.template_time * 1000:.1f};desc="Templates"',
+        f'view;dur={metrics.view_time * 1000:.1f};desc="View"',
+        f'total;dur={total * 1000:.1f};desc="Total"',
+    ])
+
+
+class RequestMetricsMiddleware:
+    """
+    Measure sampled requests and report them in ``Server-Timing`` and logs.
+
+    Place it first in ``MIDDLEWARE`` so that the total covers the whole
+    stack.  Works with both sync and async views.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= get_sample_rate():
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with self._wrap_connections():
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, metrics, metrics.finish())
+
+    async def __acall__(self, request: HttpRequest):
+        if random.random() >= get_sample_rate():
+            return await self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        # Connections are thread-local and the async ORM runs queries on the
+        # request's thread-sensitive worker, so wrap that thread's connections
+        wrappers = await sync_to_async(self._wrap_connections)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(wrappers.close)()
+            _current.reset(token)
+        return self._finish(request, response, metrics, metrics.finish())
+
+    def process_view(self, request: HttpRequest, view_func, view_args, view_kwargs) -> None:
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view_started = time.perf_counter()
+
+    def _wrap_connections(self) -> ExitStack:
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(record_query))
+        return stack
+
+    def _finish(self, request: HttpRequest, response: HttpResponse,
+                metrics: RequestMetrics, total: float) -> HttpResponse:
+        duplicates = metrics.duplicates(get_duplicate_threshold())
+
+        if get_server_timing():
+            response['Server-Timing'] = server_timing(metrics, total, len(duplicates))
+
+        record: Dict[str, Any] = {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(request.resolver_match, 'view_name', None),
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'view_ms': round(metrics.view_time * 1000, 2),
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'template_ms': round(metrics.template_time * 1000, 2),
+            'queries': metrics.queries,
+            'duplicate_queries': len(duplicates),
+        }
+        logger.info(
+            ' '.join(f'{key}={value}' for key, value in record.items()),
+            extra={'metrics': record},
+        )
+        for sql, count in duplicates:
+            logger.warning(
+                'duplicate query x%d in %s: %s', count, request.path, sql[:300],
+                extra={'metrics': {'path': request.path, 'sql': sql, 'count': count}},
+            )
+        return response
@@ -0,0 +1,67 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from myapp.archive import archivable, archive_batch, get_archive_after
+from myapp.sharding import get_shards
+
+
+class Command(BaseCommand):
+    """
+    Move completed tasks older than the archive threshold to ``ArchivedTask``.
+    
+    Each batch is its own short transaction, so the command can be stopped
+    at any point and simply run again; writers only ever wait for one
+    batch.  ``--pause`` spaces batches out further on a busy database.
+    Shards are archived one after the other.
+    """
+    
+    help = 'Archive tasks completed more than TASK_ARCHIVE_AFTER_DAYS ago.'
+    
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--days', type=int, default=None,
+                            help='Archive tasks completed more than this many days ago.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Tasks moved per transaction.')
+        parser.add_argument('--max', type=int, default=0,
+                            help='Stop after moving this many tasks (0: no limit).')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Seconds to sleep between batches.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the tasks that would be archived.')
+    
+    def handle(self, *args, **options) -> None:
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        if options['days'] is not None and options['days'] < 0:
+            raise CommandError('--days must not be negative.')
+        
+        after = get_archive_after() if options['days'] is None else timedelta(days=options['days'])
+        cutoff = timezone.now() - after
+        if options['dry_run']:
+            count = sum(archivable(cutoff, alias).count() for alias in get_shards())
+            self.stdout.write(f'{count} tasks completed before {cutoff.isoformat()}')
+            return
+        
+        started = time.perf_counter()
+        moved = 0
+        for alias in get_shards():
+            while not options['max'] or moved < options['max']:
+                size = options['batch_size']
+                if options['max']:
+                    size = min(size, options['max'] - moved)
+                count = archive_batch(cutoff, size, alias)
+                if not count:
+                    break
+                moved += count
+                if options['verbosity'] >= 2:
+                    self.stdout.write(f'{moved} tasks archived ({alias})')
+                if options['pause']:
+                    time.sleep(options['pause'])
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {moved} tasks completed before {cutoff.isoformat()} '
+            f'in {time.perf_counter() - started:.2f}s'
+        ))
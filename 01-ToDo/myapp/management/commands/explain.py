@@ -0,0 +1,112 @@
+from typing import Any, List, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import AnonymousUser
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from myapp.models import Task
+from myapp.pagination import DEFAULT_ORDERING, NEXT, encode_cursor
+from myapp.sharding import shard_for_user
+
+
+# (label, URL name, query string) for every read-only view worth checking
+VIEWS: List[Tuple[str, str, str]] = [
+    ('home', 'home', ''),
+    ('task_list', 'task_list', ''),
+    ('task_list (next page)', 'task_list', 'cursor={cursor}'),
+    ('task_overdue', 'task_overdue', ''),
+    ('task_search', 'task_search', 'q=report'),
+    ('task_archive', 'task_archive', ''),
+    ('api_task_list', 'api_task_list', ''),
+]
+
+
+class Command(BaseCommand):
+    """
+    Run each read-only view once, capture the SQL it issues and print the
+    database's query plan for every SELECT.
+
+    Works on any backend Django supports ``EXPLAIN`` for; the plan text is
+    whatever the database returns (``EXPLAIN QUERY PLAN`` on SQLite, plain
+    ``EXPLAIN`` on Postgres).  Full table scans of the task table are
+    flagged.  Postgres prefers sequential scans on tiny tables, so run this
+    against realistically sized data (see ``seed_tasks``) after ``ANALYZE``.
+    Views run anonymously, against the shard holding tasks without an owner.
+    """
+
+    help = "Print the query plan of every query issued by the task views."
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--fail-on-scan',
+            action='store_true',
+            help='Exit with an error if any query does a full scan of the task table.',
+        )
+
+    def handle(self, *args, **options) -> None:
+        self.connection = connection = connections[shard_for_user(None)]
+        table = Task._meta.db_table
+        factory = RequestFactory()
+        cursor = self._sample_cursor()
+        scans = []
+
+        self.stdout.write(f'Database vendor: {connection.vendor}\n')
+        for label, url_name, query in VIEWS:
+            if '{cursor}' in query:
+                if cursor is None:
+                    continue
+                query = query.format(cursor=cursor)
+
+            path = reverse(url_name)
+            request = factory.get(path, data=None, QUERY_STRING=query)
+            request.user = AnonymousUser()
+            match = resolve(path)
+
+            captured: List[Tuple[str, Any]] = []
+
+            def capture(execute, sql, params, many, context):
+                captured.append((sql, params))
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(capture):
+                match.func(request, *match.args, **match.kwargs)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'== {label} ({path}?{query})'))
+            for sql, params in captured:
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                plan = self._explain(sql, params)
+                self.stdout.write(f'  {sql}')
+                for line in plan:
+                    self.stdout.write(f'    {line}')
+                if self._is_full_scan(plan, table):
+                    scans.append(label)
+                    self.stdout.write(self.style.WARNING(f'    ^ full scan of {table}'))
+            self.stdout.write('')
+
+        if scans and options['fail_on_scan']:
+            raise CommandError(f"Full table scans in: {', '.join(sorted(set(scans)))}")
+
+    def _sample_cursor(self):
+        """A cursor pointing after the newest task, to exercise the keyset predicate."""
+        first = Task.objects.owned_by(None).order_by(*DEFAULT_ORDERING).first()
+        return encode_cursor(first, DEFAULT_ORDERING, NEXT) if first else None
+
+    def _explain(self, sql: str, params: Any) -> List[str]:
+        prefix = self.connection.ops.explain_query_prefix()
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            rows = cursor.fetchall()
+        # SQLite returns (id, parent, notused, detail); others one text column
+        return [str(row[-1] if self.connection.vendor == 'sqlite' else row[0]) for row in rows]
+
+    def _is_full_scan(self, plan: List[str], table: str) -> bool:
+        for line in plan:
+            if self.connection.vendor == 'sqlite':
+                if line.startswith(f'SCAN {table}') and 'INDEX' not in line:
+                    return True
+            elif 'Seq Scan on' in line and table in line:
+                return True
+        return False
@@ -0,0 +1,95 @@
+import json
+import sys
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.importer import DEFAULT_BATCH_SIZE, FORMATS, ImportResult, import_tasks
+
+
+class Command(BaseCommand):
+    """
+    Bulk-load tasks from a CSV or NDJSON file.
+    
+    Invalid records are skipped and written, with their validation errors,
+    to an NDJSON sidecar file (``<input>.rejected.ndjson`` by default).
+    Input read from stdin has no sidecar name, so its rejects go to stderr
+    unless ``--rejects`` names a file.
+    Tasks are imported without an owner unless ``--user`` names one.
+    """
+    
+    help = 'Import tasks from CSV or NDJSON in bulk_create batches.'
+    
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('path', help="Input file, or '-' for stdin.")
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Input format (default: from the file extension).')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Tasks per bulk_create and transaction.')
+        parser.add_argument('--rejects',
+                            help='Where to write rejected records (default: <path>.rejected.ndjson, '
+                                 'or stderr when reading stdin).')
+        parser.add_argument('--user', help='Username owning the imported tasks.')
+    
+    def handle(self, *args, **options) -> None:
+        path = options['path']
+        fmt = options['format']
+        if fmt is None:
+            suffix = Path(path).suffix.lstrip('.').lower()
+            fmt = {'csv': 'csv', 'ndjson': 'ndjson', 'jsonl': 'ndjson'}.get(suffix)
+            if fmt is None:
+                raise CommandError('Cannot infer the format; pass --format.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        
+        user_id = None
+        if options['user']:
+            User = get_user_model()
+            try:
+                user_id = User.objects.get(**{User.USERNAME_FIELD: options['user']}).pk
+            except User.DoesNotExist:
+                raise CommandError(f"No user {options['user']!r}.")
+        
+        rejects_path = options['rejects']
+        if rejects_path is None and path != '-':
+            rejects_path = f'{path}.rejected.ndjson'
+        rejects_file = None
+        
+        def on_reject(rejection) -> None:
+            nonlocal rejects_file
+            line = json.dumps(rejection, ensure_ascii=False, default=str)
+            if rejects_path is None:
+                self.stderr.write(line)
+                return
+            if rejects_file is None:
+                rejects_file = open(rejects_path, 'w', encoding='utf-8')
+            rejects_file.write(line + '\n')
+        
+        def on_batch(progress: ImportResult) -> None:
+            if options['verbosity'] >= 2:
+                self.stdout.write(
+                    f'{progress.imported} imported, {progress.rejected} rejected '
+                    f'({progress.rows_per_second:,.0f} rows/s)'
+                )
+        
+        try:
+            stream = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+        except OSError as exc:
+            raise CommandError(str(exc)) from exc
+        try:
+            result = import_tasks(stream, fmt, options['batch_size'], on_reject, on_batch, user_id)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if rejects_file is not None:
+                rejects_file.close()
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.imported} tasks in {result.seconds:.2f}s '
+            f'({result.rows_per_second:,.0f} rows/s)'
+        ))
+        if result.rejected:
+            self.stdout.write(self.style.WARNING(
+                f"Rejected {result.rejected} records; see {rejects_path or 'stderr'}"
+            ))
@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from myapp.changes import get_retention
+from myapp.models import TaskTombstone
+from myapp.sharding import get_shards
+
+
+class Command(BaseCommand):
+    """
+    Delete change-feed tombstones older than the retention period.
+    
+    Rows are removed in ``--batch-size`` chunks, oldest first, each in its
+    own short statement, so sync clients and writers are never blocked for
+    long.  Run it daily; clients whose cursor is older than the retention
+    period are told to resync.
+    """
+    
+    help = 'Delete task tombstones older than TASK_TOMBSTONE_RETENTION_DAYS.'
+    
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--days', type=int, default=None,
+                            help='Keep this many days instead of the configured retention.')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Tombstones deleted per statement.')
+    
+    def handle(self, *args, **options) -> None:
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        if options['days'] is not None and options['days'] < 0:
+            raise CommandError('--days must not be negative.')
+        
+        retention = get_retention() if options['days'] is None else timedelta(days=options['days'])
+        cutoff = timezone.now() - retention
+        
+        purged = 0
+        for alias in get_shards():
+            tombstones = TaskTombstone.objects.using(alias)
+            expired = tombstones.filter(deleted_at__lt=cutoff).order_by('deleted_at', 'pk')
+            while True:
+                ids = list(expired.values_list('pk', flat=True)[:options['batch_size']])
+                if not ids:
+                    break
+                purged += tombstones.filter(pk__in=ids).delete()[0]
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {purged} tombstones deleted before {cutoff.isoformat()}'
+        ))
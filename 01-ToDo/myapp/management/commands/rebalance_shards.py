@@ -0,0 +1,59 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.rebalance import DEFAULT_BATCH_SIZE, misplaced_owners, move_owner
+from myapp.sharding import get_shards
+
+
+class Command(BaseCommand):
+    """
+    Move task owners whose rows are not on the shard ``TASK_SHARDS`` and
+    ``TASK_SHARD_PINS`` now place them on.
+    
+    Run after appending a shard or changing a pin.  Moves are copied in
+    batches and can be interrupted and re-run at any point.
+    """
+    
+    help = 'Move task owners to the shard their user id now maps to.'
+    
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only list the owners that would move.')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Rows copied per transaction.')
+        parser.add_argument('--user', help='Only move this username.')
+    
+    def handle(self, *args, **options) -> None:
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+        only = None
+        if options['user']:
+            User = get_user_model()
+            try:
+                only = User.objects.get(**{User.USERNAME_FIELD: options['user']}).pk
+            except User.DoesNotExist:
+                raise CommandError(f"No user {options['user']!r}.")
+        
+        started = time.perf_counter()
+        moved = 0
+        for source in get_shards():
+            for user_id, target in misplaced_owners(source):
+                if options['user'] and user_id != only:
+                    continue
+                if options['dry_run']:
+                    self.stdout.write(f'owner={user_id}: {source} -> {target}')
+                    continue
+                result = move_owner(user_id, source, target, options['batch_size'])
+                moved += 1
+                self.stdout.write(
+                    f'owner={user_id}: {source} -> {target}: {result.tasks} tasks, '
+                    f'{result.archived} archived, {result.tombstones} tombstones, '
+                    f'{result.reminders} reminders'
+                )
+        
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Moved {moved} owners in {time.perf_counter() - started:.2f}s'
+            ))
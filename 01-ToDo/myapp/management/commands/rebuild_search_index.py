@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from myapp.search import install_sqlite_triggers, rebuild_index
+from myapp.sharding import get_shards
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the full-text search index from the task table.
+
+    On SQLite this repopulates and optimizes the FTS5 table and restores
+    its sync triggers; on PostgreSQL it reindexes the GIN index.  Only
+    needed after writes that bypassed the triggers, e.g. a restore from a
+    dump without the FTS table, or to compact the index.  Every shard is
+    rebuilt.
+    """
+
+    help = 'Rebuild the full-text search index over task titles and descriptions.'
+
+    def handle(self, *args, **options) -> None:
+        for alias in get_shards():
+            connection = connections[alias]
+            started = time.perf_counter()
+            try:
+                install_sqlite_triggers(connection)
+                rebuild_index(connection)
+            except NotImplementedError as exc:
+                raise CommandError(str(exc)) from exc
+            self.stdout.write(self.style.SUCCESS(
+                f'Rebuilt the {connection.vendor} search index on {alias} '
+                f'in {time.perf_counter() - started:.2f}s'
+            ))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.models import TaskStats
+from myapp.sharding import get_shards
+from myapp.stats import owner_counts, rebuild
+
+
+class Command(BaseCommand):
+    """
+    Verify the denormalized ``TaskStats`` counters against the task table
+    and rebuild them if they have drifted.
+    
+    Every owner's counter row is checked, shard by shard, with one grouped
+    aggregate per shard.
+    """
+    
+    help = 'Verify and rebuild the denormalized task counters.'
+    
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--verify-only',
+            action='store_true',
+            help='Only compare the counters; exit with an error on drift.',
+        )
+    
+    def handle(self, *args, **options) -> None:
+        drifted = []
+        checked = 0
+        for alias in get_shards():
+            actual = owner_counts(alias)
+            stored = {
+                None if row.owner == TaskStats.ANONYMOUS else row.owner: row
+                for row in TaskStats.objects.using(alias)
+            }
+            for user_id in sorted(set(actual) | set(stored), key=lambda owner: owner or 0):
+                checked += 1
+                expected = actual.get(user_id, {'total': 0, 'completed': 0})
+                row = stored.get(user_id)
+                for key in ('total', 'completed'):
+                    was = getattr(row, key) if row else None
+                    if was != expected[key]:
+                        self.stdout.write(
+                            f'{alias} owner={user_id}: {key}: stored={was} actual={expected[key]}'
+                        )
+                if row is None or (row.total, row.completed) != (expected['total'], expected['completed']):
+                    drifted.append((alias, user_id))
+        
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS(f'Counters OK for {checked} owners'))
+            return
+        
+        if options['verify_only']:
+            raise CommandError('Task counters have drifted; run without --verify-only to fix.')
+        
+        for alias, user_id in drifted:
+            rebuild(user_id, using=alias)
+        self.stdout.write(self.style.SUCCESS(f'Counters rebuilt for {len(drifted)} owners'))
@@ -0,0 +1,64 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from myapp.reminders import ReminderScheduler, get_backend
+
+
+class Command(BaseCommand):
+    """
+    Send due-date reminders until interrupted.
+    
+    Every ``--interval`` seconds the scheduler reads the task ranges that
+    became due since the previous tick and sends their reminders through
+    ``TASK_REMINDER_BACKEND`` on ``--workers`` threads.  See
+    ``myapp.reminders``.
+    """
+    
+    help = 'Scan for due and overdue tasks and send reminders.'
+    
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--interval', type=float, default=30,
+                            help='Seconds between scans.')
+        parser.add_argument('--once', action='store_true',
+                            help='Run a single scan and exit.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Tasks per claim and per backend call.')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Threads calling the backend.')
+        parser.add_argument('--lookback', type=float, default=24,
+                            help='Hours of overdue tasks picked up at startup.')
+        parser.add_argument('--backend', default=None,
+                            help='Dotted path of the backend class (default: TASK_REMINDER_BACKEND).')
+    
+    def handle(self, *args, **options) -> None:
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--batch-size and --workers must be positive.')
+        
+        scheduler = ReminderScheduler(
+            get_backend(options['backend']),
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            lookback=timedelta(hours=options['lookback']),
+        )
+        try:
+            while True:
+                close_old_connections()
+                started = time.perf_counter()
+                result = scheduler.tick()
+                scheduler.prune()
+                elapsed = time.perf_counter() - started
+                if result.candidates or options['verbosity'] >= 2:
+                    self.stdout.write(
+                        f'{result.sent} sent, {result.duplicates} already sent, '
+                        f'{result.failed} failed, of {result.candidates} due tasks in {elapsed:.2f}s'
+                    )
+                if options['once']:
+                    break
+                time.sleep(max(0.0, options['interval'] - elapsed))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            scheduler.close()
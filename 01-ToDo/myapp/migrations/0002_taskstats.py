@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:14
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def create_stats_row(apps, schema_editor):
+    """Seed the singleton counter row from the existing tasks."""
+    Task = apps.get_model('myapp', 'Task')
+    TaskStats = apps.get_model('myapp', 'TaskStats')
+    db_alias = schema_editor.connection.alias
+    counts = Task.objects.using(db_alias).aggregate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(completed=True)),
+    )
+    TaskStats.objects.using(db_alias).update_or_create(pk=1, defaults=counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.BigIntegerField(default=0, help_text='Total number of tasks')),
+                ('completed', models.BigIntegerField(default=0, help_text='Number of completed tasks')),
+            ],
+            options={
+                'verbose_name': 'Task statistics',
+                'verbose_name_plural': 'Task statistics',
+            },
+        ),
+        migrations.RunPython(create_stats_row, migrations.RunPython.noop),
+    ]
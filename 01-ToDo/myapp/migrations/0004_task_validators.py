@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0003_task_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskstats',
+            name='delete_seq',
+            field=models.BigIntegerField(default=0, help_text='Incremented on every task deletion'),
+        ),
+        migrations.AddField(
+            model_name='taskstats',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, help_text='When a task was last deleted', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['updated_at', 'id'], name='task_updated_id_idx'),
+        ),
+    ]
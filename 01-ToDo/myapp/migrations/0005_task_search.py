@@ -0,0 +1,81 @@
+from django.db import migrations
+
+FTS_TABLE = 'myapp_task_fts'
+
+SQLITE_FORWARD = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, description,
+        content='myapp_task', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )""",
+    # Titles weigh ten times as much as descriptions in ORDER BY rank
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON myapp_task BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON myapp_task BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, description ON myapp_task BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+POSTGRES_FORWARD = [
+    # Title words weigh more than description words in ts_rank
+    """ALTER TABLE myapp_task ADD COLUMN search_document tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A')
+        || setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'B')
+    ) STORED""",
+    'CREATE INDEX task_search_idx ON myapp_task USING GIN (search_document)',
+]
+
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS task_search_idx',
+    'ALTER TABLE myapp_task DROP COLUMN IF EXISTS search_document',
+]
+
+
+STATEMENTS = {
+    'sqlite': (SQLITE_FORWARD, SQLITE_BACKWARD),
+    'postgresql': (POSTGRES_FORWARD, POSTGRES_BACKWARD),
+}
+
+
+def create_search_index(apps, schema_editor):
+    forward, _ = STATEMENTS.get(schema_editor.connection.vendor, ([], []))
+    for statement in forward:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    _, backward = STATEMENTS.get(schema_editor.connection.vendor, ([], []))
+    for statement in backward:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0004_task_validators'),
+    ]
+
+    operations = [
+        # Vendor-specific and invisible to the model state; queried through
+        # myapp.search
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0005_task_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='version',
+            field=models.PositiveIntegerField(default=1, help_text='Incremented on every write'),
+        ),
+    ]
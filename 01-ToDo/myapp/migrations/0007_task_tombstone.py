@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0006_task_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.BigIntegerField(help_text='Primary key the deleted task had')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, help_text='When the task was deleted')),
+            ],
+            options={
+                'verbose_name': 'Task tombstone',
+                'verbose_name_plural': 'Task tombstones',
+                'indexes': [models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_id_idx')],
+            },
+        ),
+    ]
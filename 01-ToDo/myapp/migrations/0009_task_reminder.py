@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:50
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0008_archived_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.BigIntegerField(help_text='Primary key of the task reminded about')),
+                ('kind', models.CharField(choices=[('due_soon', 'Due soon'), ('overdue', 'Overdue')], help_text='Which reminder was sent', max_length=10)),
+                ('due_date', models.DateTimeField(help_text='Due date the reminder was for')),
+                ('claim', models.CharField(help_text='Token of the scheduler batch that claimed the reminder', max_length=32)),
+                ('sent_at', models.DateTimeField(default=django.utils.timezone.now, help_text='When the reminder was claimed')),
+            ],
+            options={
+                'verbose_name': 'Task reminder',
+                'verbose_name_plural': 'Task reminders',
+                'indexes': [models.Index(fields=['claim'], name='reminder_claim_idx'), models.Index(fields=['due_date'], name='reminder_due_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('task_id', 'kind', 'due_date'), name='task_reminder_once')],
+            },
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.8 on 2026-10-17 05:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def split_stats_rows(apps, schema_editor):
+    """Turn the single counter row into one row per task owner."""
+    Task = apps.get_model('myapp', 'Task')
+    TaskStats = apps.get_model('myapp', 'TaskStats')
+    db_alias = schema_editor.connection.alias
+    # The existing row becomes the anonymous owner's and keeps its delete sequence
+    TaskStats.objects.using(db_alias).update(total=0, completed=0)
+    counts = Task.objects.using(db_alias).values('user_id').annotate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(completed=True)),
+    ).order_by()
+    for row in counts:
+        TaskStats.objects.using(db_alias).update_or_create(
+            owner=row['user_id'] or 0,
+            defaults={'total': row['total'], 'completed': row['completed']},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0009_task_reminder'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='archivedtask',
+            name='archived_updated_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_created_id_idx',
+        ),
+        migrations.AddField(
+            model_name='taskstats',
+            name='owner',
+            field=models.BigIntegerField(default=0, help_text='Id of the user the counters are for (0: tasks without a user)', unique=True),
+        ),
+        migrations.AddField(
+            model_name='tasktombstone',
+            name='user_id',
+            field=models.BigIntegerField(blank=True, help_text='Owner the deleted task had', null=True),
+        ),
+        migrations.AlterField(
+            model_name='archivedtask',
+            name='user',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_tasks', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='user',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, help_text='User who owns this task', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtask',
+            index=models.Index(fields=['user', '-updated_at', '-id'], name='archived_user_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='task_user_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='task_user_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('completed', False)), fields=['user', 'due_date'], name='task_user_open_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tasktombstone',
+            index=models.Index(fields=['user_id', 'deleted_at', 'id'], name='tombstone_user_deleted_idx'),
+        ),
+        migrations.RunPython(split_stats_rows, migrations.RunPython.noop),
+    ]
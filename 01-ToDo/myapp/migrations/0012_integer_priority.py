@@ -0,0 +1,101 @@
+# Generated by Django 5.2.8 on 2026-10-17 05:28
+
+import myapp.models
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Value, When
+
+# Stored value of each priority name (myapp.models.PriorityField.LEVELS)
+PRIORITY_LEVELS = {'low': 1, 'medium': 2, 'high': 3}
+
+
+def names_to_levels(apps, schema_editor):
+    """Fill the integer column from the priority names, one UPDATE per table."""
+    db_alias = schema_editor.connection.alias
+    for model_name in ('Task', 'ArchivedTask'):
+        model = apps.get_model('myapp', model_name)
+        model.objects.using(db_alias).update(priority_level=Case(
+            *(When(priority=name, then=Value(level)) for name, level in PRIORITY_LEVELS.items()),
+            default=Value(PRIORITY_LEVELS['medium']),
+        ))
+
+
+def levels_to_names(apps, schema_editor):
+    """Reverse of names_to_levels."""
+    db_alias = schema_editor.connection.alias
+    for model_name in ('Task', 'ArchivedTask'):
+        model = apps.get_model('myapp', model_name)
+        model.objects.using(db_alias).update(priority=Case(
+            *(When(priority_level=level, then=Value(name)) for name, level in PRIORITY_LEVELS.items()),
+            default=Value('medium'),
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0011_admin_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='task',
+            name='task_priority_updated_idx',
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='priority_level',
+            field=models.PositiveSmallIntegerField(default=2),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='priority_level',
+            field=models.PositiveSmallIntegerField(default=2),
+        ),
+        migrations.RunPython(names_to_levels, levels_to_names),
+        migrations.RemoveField(
+            model_name='task',
+            name='priority',
+        ),
+        migrations.RemoveField(
+            model_name='archivedtask',
+            name='priority',
+        ),
+        migrations.RenameField(
+            model_name='task',
+            old_name='priority_level',
+            new_name='priority',
+        ),
+        migrations.RenameField(
+            model_name='archivedtask',
+            old_name='priority_level',
+            new_name='priority',
+        ),
+        migrations.AlterField(
+            model_name='archivedtask',
+            name='priority',
+            field=myapp.models.PriorityField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')], default='medium'),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='priority',
+            field=myapp.models.PriorityField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')], default='medium', help_text='Priority level of the task'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['priority', 'updated_at', 'id'], name='task_priority_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'completed', '-priority', 'due_date', 'id'], name='task_user_done_prio_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', '-priority', 'due_date', 'id'], name='task_user_prio_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'due_date', 'id'], name='task_user_due_id_idx'),
+        ),
+    ]
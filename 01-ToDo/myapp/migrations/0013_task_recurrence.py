@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-17 05:38
+
+import myapp.recurrence
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0012_integer_priority'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='recurrence',
+            field=models.CharField(blank=True, default='', help_text='Repeat rule, e.g. weekly or FREQ=WEEKLY;BYDAY=MO,TH', max_length=200, validators=[myapp.recurrence.validate_recurrence]),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('completed', False), models.Q(('recurrence', ''), _negated=True)), fields=['user', 'due_date'], name='task_user_recurring_idx'),
+        ),
+    ]
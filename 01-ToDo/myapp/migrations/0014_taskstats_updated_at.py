@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 05:48
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0013_task_recurrence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskstats',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='When a task of the owner was last written'),
+        ),
+    ]
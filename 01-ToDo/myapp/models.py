@@ -1,6 +1,156 @@
-from django.db import models
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from django.core.exceptions import ValidationError
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .recurrence import validate_recurrence
+from .replicas import read_alias
+from .sharding import shard_for_user
+
+
+def owner_id(user: Optional[User]) -> Optional[int]:
+    """
+    Id under which ``user``'s tasks are stored.
+    
+    Anonymous visitors (and ``None``) get ``None``: they share the tasks
+    that have no owner.
+    """
+    if user is None or not user.is_authenticated:
+        return None
+    return user.pk
+
+
+class VersionConflict(Exception):
+    """
+    Raised when a task changed (or was deleted) since it was read.
+    
+    Attributes:
+        pk: Primary key of the task
+        expected: Version the writer based its change on
+    """
+    
+    def __init__(self, pk: Any, expected: Optional[int]) -> None:
+        super().__init__(f'Task {pk} is no longer at version {expected}')
+        self.pk = pk
+        self.expected = expected
+
+
+class OwnedQuerySet(models.QuerySet):
+    """
+    Scoping for models stored per owner (see ``myapp.sharding``).
+    """
+    
+    def owned_by(self, user_id: Optional[int]) -> 'OwnedQuerySet':
+        """
+        Rows owned by ``user_id`` (``None``: no owner), on their shard.
+        
+        Inside ``replica_reads`` views this reads from one of the shard's replicas.
+        """
+        return self.using(read_alias(shard_for_user(user_id))).filter(user_id=user_id)
+    
+    def for_user(self, user: Optional[User]) -> 'OwnedQuerySet':
+        """Rows visible to ``user``; anonymous users see the unowned rows."""
+        return self.owned_by(owner_id(user))
+    
+    def create(self, **kwargs) -> models.Model:
+        """Create a row on its owner's shard, unless a database was chosen."""
+        if self._db is None:
+            user = kwargs.get('user')
+            user_id = kwargs.get('user_id', user.pk if user is not None else None)
+            return super(OwnedQuerySet, self.using(shard_for_user(user_id))).create(**kwargs)
+        return super().create(**kwargs)
+
+
+class TaskQuerySet(OwnedQuerySet):
+    """
+    Query helpers for ``Task`` that push filtering into SQL.
+    """
+    
+    def overdue(self, now: Optional[datetime] = None) -> 'TaskQuerySet':
+        """
+        Open tasks whose due date has passed.
+        
+        Same predicate as ``Task.is_overdue()``, evaluated by the database
+        and served by the partial index on ``due_date WHERE NOT completed``.
+        """
+        return self.filter(completed=False, due_date__lt=now or timezone.now())
+    
+    def recurring(self) -> 'TaskQuerySet':
+        """
+        Open tasks that repeat: the one stored occurrence of each series
+        that carries its rule (see ``myapp.recurrence``).
+        
+        Served by the partial index on ``(user, due_date)`` of these tasks.
+        """
+        return self.filter(completed=False).exclude(recurrence='')
+    
+    def toggle_completed(self) -> int:
+        """
+        Flip ``completed`` on every matching task with a single ``UPDATE``.
+        
+        Bumps ``version`` and ``updated_at`` in the same statement and
+        returns the number of rows changed.  Bypasses signals: callers must
+        adjust the stats counters (``stats.adjust_toggled``).
+        """
+        return self.update(
+            completed=models.Case(
+                models.When(completed=True, then=models.Value(False)),
+                default=models.Value(True),
+            ),
+            version=models.F('version') + 1,
+            updated_at=timezone.now(),
+        )
+    
+    def annotate_overdue(self, now: Optional[datetime] = None) -> 'TaskQuerySet':
+        """Add a boolean ``overdue`` column computed by the database."""
+        return self.annotate(overdue=models.Case(
+            models.When(completed=False, due_date__lt=now or timezone.now(), then=True),
+            default=False,
+            output_field=models.BooleanField(),
+        ))
+
+
+class PriorityField(models.PositiveSmallIntegerField):
+    """
+    Priority stored as a small integer and used in Python by its name.
+    
+    ``'low'``, ``'medium'`` and ``'high'`` are stored as 1, 2 and 3, so
+    ``ORDER BY priority`` sorts by urgency and composite indexes stay
+    small, while forms, templates, the JSON API and
+    ``get_priority_display()`` keep working with the names.
+    """
+    
+    LEVELS = {'low': 1, 'medium': 2, 'high': 3}
+    NAMES = {level: name for name, level in LEVELS.items()}
+    
+    @cached_property
+    def validators(self) -> list:
+        # The integer range validators cannot compare names
+        return [*self.default_validators, *self._validators]
+    
+    def from_db_value(self, value: Optional[int], expression, connection) -> Optional[str]:
+        return None if value is None else self.NAMES.get(value, value)
+    
+    def to_python(self, value: Any) -> Optional[str]:
+        if value is None or value in self.LEVELS:
+            return value
+        try:
+            return self.NAMES[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value},
+            )
+    
+    def get_prep_value(self, value: Any) -> Optional[int]:
+        if isinstance(value, str) and value in self.LEVELS:
+            return self.LEVELS[value]
+        if isinstance(value, str) and not value.isdigit():
+            raise ValueError(f"Field '{self.name}' expected one of {list(self.LEVELS)} but got {value!r}.")
+        return super().get_prep_value(value)
 
 
 class Task(models.Model):
@@ -15,7 +165,9 @@ class Task(models.Model):
         updated_at: Timestamp when task was last modified
         due_date: Optional deadline for the task
         priority: Priority level of the task
+        recurrence: Repeat rule of the task (see ``myapp.recurrence``); empty: none
         user: Foreign key to User (optional, for multi-user support)
+        version: Incremented on every write, for optimistic concurrency
     """
     
     # Priority choices
@@ -60,35 +212,429 @@ class Task(models.Model):
         help_text="Deadline for the task"
     )
     
-    priority = models.CharField(
-        max_length=10,
+    priority = PriorityField(
         choices=PRIORITY_CHOICES,
         default='medium',
         help_text="Priority level of the task"
     )
     
-    # Multi-user support (optional)
+    # Carried by the open occurrence only; see myapp.recurrence
+    recurrence = models.CharField(
+        max_length=200,
+        blank=True,
+        default='',
+        validators=[validate_recurrence],
+        help_text="Repeat rule, e.g. weekly or FREQ=WEEKLY;BYDAY=MO,TH"
+    )
+    
+    # Multi-user support (optional). Tasks may live on another database
+    # than the user table (see myapp.sharding), so there is no constraint;
+    # the composite indexes below all lead with the user.
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='tasks',
         blank=True,
         null=True,
+        db_constraint=False,
+        db_index=False,
         help_text="User who owns this task"
     )
     
+    # Optimistic concurrency: see save()
+    version = models.PositiveIntegerField(
+        default=1,
+        help_text="Incremented on every write"
+    )
+    
+    objects = TaskQuerySet.as_manager()
+    
     class Meta:
         """Metadata for the Task model."""
         ordering = ['-created_at']  # Newest first
         verbose_name = 'Task'
         verbose_name_plural = 'Tasks'
+        indexes = [
+            # Keyset pagination of a user's task list (newest first)
+            models.Index(fields=['user', '-created_at', '-id'], name='task_user_created_id_idx'),
+            # Per-user lists filtered by completion, newest first
+            models.Index(
+                fields=['user', 'completed', '-created_at'],
+                name='task_user_done_created_idx',
+            ),
+            # Changes since a moment, across users: reminders and archival
+            models.Index(fields=['updated_at', 'id'], name='task_updated_id_idx'),
+            # A user's changes: change feed and Max('updated_at') for HTTP validators
+            models.Index(fields=['user', 'updated_at', 'id'], name='task_user_updated_id_idx'),
+            # Overdue / upcoming lookups only ever look at open tasks
+            models.Index(
+                fields=['due_date'],
+                condition=models.Q(completed=False),
+                name='task_open_due_date_idx',
+            ),
+            models.Index(
+                fields=['user', 'due_date'],
+                condition=models.Q(completed=False),
+                name='task_user_open_due_idx',
+            ),
+            # task_list ?sort=priority,due_date (most urgent, then soonest due),
+            # with and without ?completed=; ?priority= is an equality on the
+            # priority column, so it uses the same indexes
+            models.Index(
+                fields=['user', 'completed', '-priority', 'due_date', 'id'],
+                name='task_user_done_prio_due_idx',
+            ),
+            models.Index(fields=['user', '-priority', 'due_date', 'id'], name='task_user_prio_due_idx'),
+            # task_list ?sort=due_date
+            models.Index(fields=['user', 'due_date', 'id'], name='task_user_due_id_idx'),
+            # Recurring series to expand for a date range: their open occurrences
+            models.Index(
+                fields=['user', 'due_date'],
+                condition=models.Q(completed=False) & ~models.Q(recurrence=''),
+                name='task_user_recurring_idx',
+            ),
+            # Admin changelist: each filter, then its (-updated_at, -id) keyset order
+            models.Index(fields=['completed', 'updated_at', 'id'], name='task_done_updated_idx'),
+            models.Index(fields=['priority', 'updated_at', 'id'], name='task_priority_updated_idx'),
+            models.Index(fields=['due_date'], name='task_due_date_idx'),
+        ]
     
     def __str__(self) -> str:
         """String representation of the task."""
         return self.title
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the stored completion state and version of the row."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_completed = instance.__dict__.get('completed')
+        instance._loaded_version = instance.__dict__.get('version')
+        return instance
+    
+    def refresh_from_db(self, *args, **kwargs) -> None:
+        """Reload the row and the stored state remembered by ``from_db``."""
+        super().refresh_from_db(*args, **kwargs)
+        self._loaded_completed = self.__dict__.get('completed')
+        self._loaded_version = self.__dict__.get('version')
+    
+    def save(self, *args, expected_version: Optional[int] = None, **kwargs) -> None:
+        """
+        Save the task and increment ``version``.
+        
+        Updating an existing row only succeeds while the row is still at
+        ``expected_version`` (default: the version this instance was loaded
+        with); otherwise :class:`VersionConflict` is raised and nothing is
+        written.  The check is part of the ``UPDATE`` itself, so concurrent
+        writers cannot lose each other's changes.  With ``update_fields``
+        only the named columns are written, plus ``version`` and
+        ``updated_at``.
+        """
+        expected = expected_version if expected_version is not None else getattr(
+            self, '_loaded_version', None
+        )
+        if self._state.adding or expected is None:
+            self._expected_version = None
+        else:
+            self._expected_version = expected
+            self.version = expected + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version', 'updated_at'}
+        connection = transaction.get_connection(
+            kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        )
+        needs_rollback = connection.needs_rollback
+        try:
+            super().save(*args, **kwargs)
+        except VersionConflict:
+            # save() marks the enclosing atomic block for rollback on any
+            # error, but an UPDATE that matched no rows leaves it intact
+            connection.needs_rollback = needs_rollback
+            self.version = expected
+            raise
+        self._loaded_version = self.version
+    
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update, *args, **kwargs):
+        """Add the version check to the ``UPDATE`` issued by ``save()``."""
+        expected = getattr(self, '_expected_version', None)
+        if expected is None:
+            return super()._do_update(
+                base_qs, using, pk_val, values, update_fields, forced_update, *args, **kwargs
+            )
+        updated = super()._do_update(
+            base_qs.filter(version=expected), using, pk_val, values, update_fields,
+            forced_update, *args, **kwargs
+        )
+        if not updated:
+            raise VersionConflict(pk_val, expected)
+        return updated
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize the task to a JSON-compatible dictionary."""
+        return {
+            'id': self.pk,
+            'title': self.title,
+            'description': self.description,
+            'completed': self.completed,
+            'priority': self.priority,
+            'recurrence': self.recurrence,
+            'due_date': self.due_date.isoformat() if self.due_date else None,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat(),
+            'version': self.version,
+        }
+    
     def is_overdue(self) -> bool:
-        """Check if the task is overdue."""
+        """
+        Check if the task is overdue.
+        
+        Use ``Task.objects.overdue()`` to find overdue tasks in bulk.
+        """
         if self.due_date and not self.completed:
             return timezone.now() > self.due_date
         return False
+
+
+class TaskStats(models.Model):
+    """
+    Denormalized task counters, one row per task owner.
+    
+    Stored on the owner's shard, next to their tasks, and maintained
+    incrementally by ``myapp.stats`` when the ``TASK_STATS_COUNTERS``
+    setting is enabled, so the dashboard can read totals in O(1) instead of
+    scanning the task table.  Rebuild with
+    ``manage.py rebuild_task_stats``.
+    
+    The row also records when the owner's tasks were last written and
+    deleted, so the HTTP validators in ``myapp.conditional`` read one row
+    instead of aggregating the task table.  These are maintained whether or
+    not counters are enabled.
+    
+    Attributes:
+        owner: Id of the user the counters are for (``ANONYMOUS``: no owner)
+        total: Number of tasks
+        completed: Number of completed tasks
+        updated_at: When a task of the owner was last created, changed or deleted
+        delete_seq: Incremented on every task deletion
+        deleted_at: When a task was last deleted
+    """
+    
+    # Owner key of the tasks without a user
+    ANONYMOUS = 0
+    
+    owner = models.BigIntegerField(
+        unique=True,
+        default=ANONYMOUS,
+        help_text="Id of the user the counters are for (0: tasks without a user)"
+    )
+    
+    total = models.BigIntegerField(
+        default=0,
+        help_text="Total number of tasks"
+    )
+    
+    completed = models.BigIntegerField(
+        default=0,
+        help_text="Number of completed tasks"
+    )
+    
+    updated_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When a task of the owner was last written"
+    )
+    
+    delete_seq = models.BigIntegerField(
+        default=0,
+        help_text="Incremented on every task deletion"
+    )
+    
+    deleted_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="When a task was last deleted"
+    )
+    
+    class Meta:
+        """Metadata for the TaskStats model."""
+        verbose_name = 'Task statistics'
+        verbose_name_plural = 'Task statistics'
+    
+    def __str__(self) -> str:
+        """String representation of the counters."""
+        return f'{self.completed}/{self.total} completed'
+    
+    @property
+    def pending(self) -> int:
+        """Number of tasks not yet completed."""
+        return self.total - self.completed
+
+
+class TaskTombstone(models.Model):
+    """
+    Record of a deleted task, for the incremental change feed.
+    
+    Written by ``myapp.changes`` whenever a task is deleted, so sync clients
+    can learn about deletions without re-reading every task.  Tombstones
+    older than ``TASK_TOMBSTONE_RETENTION_DAYS`` are removed by
+    ``manage.py purge_tombstones``.
+    
+    Attributes:
+        task_id: Primary key the deleted task had
+        user_id: Owner the deleted task had
+        deleted_at: When the task was deleted
+    """
+    
+    task_id = models.BigIntegerField(
+        help_text="Primary key the deleted task had"
+    )
+    
+    user_id = models.BigIntegerField(
+        blank=True,
+        null=True,
+        help_text="Owner the deleted task had"
+    )
+    
+    deleted_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When the task was deleted"
+    )
+    
+    objects = OwnedQuerySet.as_manager()
+    
+    class Meta:
+        """Metadata for the TaskTombstone model."""
+        verbose_name = 'Task tombstone'
+        verbose_name_plural = 'Task tombstones'
+        indexes = [
+            # Purge cutoff
+            models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_id_idx'),
+            # Change feed cursor
+            models.Index(fields=['user_id', 'deleted_at', 'id'], name='tombstone_user_deleted_idx'),
+        ]
+    
+    def __str__(self) -> str:
+        """String representation of the tombstone."""
+        return f'Task {self.task_id} deleted at {self.deleted_at}'
+
+
+class ArchivedTask(models.Model):
+    """
+    A completed task moved out of the hot ``Task`` table.
+    
+    Written by ``manage.py archive_tasks``, which moves tasks completed more
+    than ``TASK_ARCHIVE_AFTER_DAYS`` ago so that the task table, its indexes
+    and every list and count over it track active work instead of history.
+    Keeps the task's original primary key and fields.
+    
+    Attributes:
+        id: Primary key the task had in the task table
+        archived_at: When the task was moved here
+    """
+    
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True, null=True)
+    completed = models.BooleanField(default=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    due_date = models.DateTimeField(blank=True, null=True)
+    priority = PriorityField(choices=Task.PRIORITY_CHOICES, default='medium')
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_tasks',
+        blank=True,
+        null=True,
+        db_constraint=False,
+        db_index=False,
+    )
+    version = models.PositiveIntegerField(default=1)
+    
+    archived_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When the task was archived"
+    )
+    
+    objects = OwnedQuerySet.as_manager()
+    
+    class Meta:
+        """Metadata for the ArchivedTask model."""
+        verbose_name = 'Archived task'
+        verbose_name_plural = 'Archived tasks'
+        indexes = [
+            # Archive browsing: a user's most recently finished first
+            models.Index(fields=['user', '-updated_at', '-id'], name='archived_user_updated_id_idx'),
+        ]
+    
+    def __str__(self) -> str:
+        """String representation of the archived task."""
+        return self.title
+
+
+class TaskReminder(models.Model):
+    """
+    Sent-marker for a due-date reminder, so each is delivered once.
+    
+    ``manage.py run_reminders`` claims a marker before sending and the
+    unique constraint makes the claim exclusive, also across scheduler
+    processes.  ``due_date`` is part of the key: moving a task's due date
+    arms its reminders again.
+    
+    Attributes:
+        task_id: Primary key of the task reminded about
+        kind: ``due_soon`` or ``overdue``
+        due_date: Due date the reminder was for
+        claim: Token of the scheduler batch that claimed the reminder
+        sent_at: When the reminder was claimed
+    """
+    
+    DUE_SOON = 'due_soon'
+    OVERDUE = 'overdue'
+    
+    KIND_CHOICES = [
+        (DUE_SOON, 'Due soon'),
+        (OVERDUE, 'Overdue'),
+    ]
+    
+    task_id = models.BigIntegerField(
+        help_text="Primary key of the task reminded about"
+    )
+    
+    kind = models.CharField(
+        max_length=10,
+        choices=KIND_CHOICES,
+        help_text="Which reminder was sent"
+    )
+    
+    due_date = models.DateTimeField(
+        help_text="Due date the reminder was for"
+    )
+    
+    claim = models.CharField(
+        max_length=32,
+        help_text="Token of the scheduler batch that claimed the reminder"
+    )
+    
+    sent_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When the reminder was claimed"
+    )
+    
+    class Meta:
+        """Metadata for the TaskReminder model."""
+        verbose_name = 'Task reminder'
+        verbose_name_plural = 'Task reminders'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['task_id', 'kind', 'due_date'], name='task_reminder_once'
+            ),
+        ]
+        indexes = [
+            # Winners of a claim
+            models.Index(fields=['claim'], name='reminder_claim_idx'),
+            # Pruning markers that can no longer be needed
+            models.Index(fields=['due_date'], name='reminder_due_date_idx'),
+        ]
+    
+    def __str__(self) -> str:
+        """String representation of the marker."""
+        return f'{self.kind} reminder for task {self.task_id}'
@@ -0,0 +1,243 @@
+"""
+Keyset (cursor) pagination for task querysets.
+
+Instead of ``OFFSET n`` (which makes the database walk and discard ``n``
+rows), each page is fetched with a ``WHERE`` clause that starts right after
+the last row of the previous page.  Cost per page stays constant no matter
+how deep the client pages or how large the table grows.
+
+Cursors are opaque, URL-safe strings encoding the ordering values of the
+boundary row plus the paging direction.
+
+Nullable ordering columns (``due_date``) sort their NULLs last, whichever
+the direction of the column.
+"""
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Sequence, Set, Tuple
+
+from django.db.models import F, Model, Q, QuerySet
+
+
+# Default ordering for task lists: newest first, ``id`` as a unique tiebreaker
+DEFAULT_ORDERING: Tuple[str, ...] = ('-created_at', '-id')
+
+NEXT = 'n'
+PREV = 'p'
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client supplies a cursor that cannot be decoded."""
+
+
+@dataclass
+class KeysetPage:
+    """
+    A single page of results.
+
+    Attributes:
+        items: Model instances on this page, in display order
+        next_cursor: Cursor for the following page (None on the last page)
+        prev_cursor: Cursor for the preceding page (None on the first page)
+    """
+    items: List[Model] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+def _split(ordering: Sequence[str]) -> List[Tuple[str, bool]]:
+    """Turn ``['-created_at', 'id']`` into ``[('created_at', True), ('id', False)]``."""
+    return [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+
+def _nullable(model: type, ordering: Sequence[str]) -> Set[str]:
+    """Names of the ordering columns that may be NULL."""
+    return {name for name, _ in _split(ordering) if model._meta.get_field(name).null}
+
+
+def encode_cursor(instance: Model, ordering: Sequence[str], direction: str) -> str:
+    """
+    Build a cursor pointing just past ``instance`` in ``direction``.
+    """
+    model = type(instance)
+    values = []
+    for name, _ in _split(ordering):
+        model_field = model._meta.get_field(name)
+        if model_field.value_from_object(instance) is None:
+            values.append(None)
+        else:
+            values.append(model_field.value_to_string(instance))
+    payload = json.dumps({'v': values, 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(
+    cursor: str, model: type, ordering: Sequence[str]
+) -> Tuple[List[Any], str]:
+    """
+    Decode a cursor into typed ordering values and a direction.
+
+    Raises:
+        InvalidCursor: If the cursor is malformed or does not match ``ordering``
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        raw_values = payload['v']
+        direction = payload['d']
+    except (ValueError, KeyError, TypeError, binascii.Error) as exc:
+        raise InvalidCursor('Malformed cursor') from exc
+
+    fields = _split(ordering)
+    if direction not in (NEXT, PREV) or not isinstance(raw_values, list) \
+            or len(raw_values) != len(fields):
+        raise InvalidCursor('Cursor does not match the requested ordering')
+
+    values = []
+    for (name, _), raw in zip(fields, raw_values):
+        if raw is None and model._meta.get_field(name).null:
+            values.append(None)
+            continue
+        try:
+            values.append(model._meta.get_field(name).to_python(raw))
+        except Exception as exc:  # ValidationError and friends
+            raise InvalidCursor(f'Invalid cursor value for {name}') from exc
+    return values, direction
+
+
+def _after(
+    fields: List[Tuple[str, bool]], values: List[Any], forward: bool, nullable: Set[str] = frozenset(),
+) -> Q:
+    """
+    Build the row-value comparison ``(f1, f2, ...) > (v1, v2, ...)``
+    (respecting per-field direction) as a portable ``Q`` expression.
+
+    Columns in ``nullable`` place NULLs after every value going forward.
+    """
+    condition = Q()
+    equal_prefix = Q()
+    for (name, descending), value in zip(fields, values):
+        # Moving forward through a descending column means "less than"
+        lookup = 'lt' if descending == forward else 'gt'
+        if value is None:
+            # Only NULLs tie with NULL; going back, every value comes first
+            if not forward:
+                condition |= equal_prefix & Q(**{f'{name}__isnull': False})
+            equal_prefix &= Q(**{f'{name}__isnull': True})
+            continue
+        beyond = Q(**{f'{name}__{lookup}': value})
+        if forward and name in nullable:
+            beyond |= Q(**{f'{name}__isnull': True})
+        condition |= equal_prefix & beyond
+        equal_prefix &= Q(**{name: value})
+
+    # Redundant bound on the leading column: lets the planner turn the OR
+    # chain into an index range seek instead of scanning from the start
+    name, descending = fields[0]
+    bound = 'lte' if descending == forward else 'gte'
+    if name not in nullable:
+        return Q(**{f'{name}__{bound}': values[0]}) & condition
+    if values[0] is None:
+        return Q(**{f'{name}__isnull': True}) & condition if forward else condition
+    if forward:
+        return (Q(**{f'{name}__{bound}': values[0]}) | Q(**{f'{name}__isnull': True})) & condition
+    return Q(**{f'{name}__{bound}': values[0]}) & condition
+
+
+def _reverse(ordering: Sequence[str]) -> List[str]:
+    return [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+
+
+def _order_by(ordering: Sequence[str], forward: bool, nullable: Set[str]) -> List[Any]:
+    """``ORDER BY`` terms for paging in ``forward`` direction, NULLs last going forward."""
+    terms: List[Any] = list(ordering if forward else _reverse(ordering))
+    for index, term in enumerate(terms):
+        name = term.lstrip('-')
+        if name in nullable:
+            placement = {'nulls_last': True} if forward else {'nulls_first': True}
+            terms[index] = F(name).desc(**placement) if term.startswith('-') else F(name).asc(**placement)
+    return terms
+
+
+def _prepare(
+    queryset: QuerySet, cursor: Optional[str], page_size: int, ordering: Sequence[str]
+) -> Tuple[QuerySet, bool]:
+    """Apply the cursor predicate, ordering and limit; return the query and direction."""
+    forward = True
+    qs = queryset
+    nullable = _nullable(queryset.model, ordering)
+
+    if cursor:
+        values, direction = decode_cursor(cursor, queryset.model, ordering)
+        forward = direction == NEXT
+        qs = qs.filter(_after(_split(ordering), values, forward, nullable))
+
+    qs = qs.order_by(*_order_by(ordering, forward, nullable))
+    return qs[:page_size + 1], forward
+
+
+def _build_page(
+    rows: List[Model], cursor: Optional[str], page_size: int,
+    ordering: Sequence[str], forward: bool,
+) -> KeysetPage:
+    """Trim the look-ahead row, restore display order and compute cursors."""
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if not forward:
+        rows.reverse()
+
+    page = KeysetPage(items=rows)
+    if not rows:
+        return page
+
+    if forward:
+        if has_more:
+            page.next_cursor = encode_cursor(rows[-1], ordering, NEXT)
+        if cursor:
+            page.prev_cursor = encode_cursor(rows[0], ordering, PREV)
+    else:
+        if has_more:
+            page.prev_cursor = encode_cursor(rows[0], ordering, PREV)
+        page.next_cursor = encode_cursor(rows[-1], ordering, NEXT)
+    return page
+
+
+def paginate(
+    queryset: QuerySet,
+    cursor: Optional[str],
+    page_size: int,
+    ordering: Sequence[str] = DEFAULT_ORDERING,
+) -> KeysetPage:
+    """
+    Return one page of ``queryset`` ordered by ``ordering``.
+
+    ``ordering`` must end in a unique column (normally ``id``) so that every
+    row has a distinct position.  Fetches ``page_size + 1`` rows to learn
+    whether another page exists without a COUNT query.
+
+    Raises:
+        InvalidCursor: If ``cursor`` cannot be decoded
+    """
+    qs, forward = _prepare(queryset, cursor, page_size, ordering)
+    return _build_page(list(qs), cursor, page_size, ordering, forward)
+
+
+async def apaginate(
+    queryset: QuerySet,
+    cursor: Optional[str],
+    page_size: int,
+    ordering: Sequence[str] = DEFAULT_ORDERING,
+) -> KeysetPage:
+    """
+    Async version of :func:`paginate` for use in async views.
+
+    Raises:
+        InvalidCursor: If ``cursor`` cannot be decoded
+    """
+    qs, forward = _prepare(queryset, cursor, page_size, ordering)
+    rows = [row async for row in qs]
+    return _build_page(rows, cursor, page_size, ordering, forward)
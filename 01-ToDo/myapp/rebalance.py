@@ -0,0 +1,168 @@
+"""
+Moving task owners between shards.
+
+After a shard is appended to ``TASK_SHARDS`` or a pin changes,
+``shard_for_user`` sends some owners to a new shard while their rows are
+still on the old one.  :func:`misplaced_owners` finds them and
+:func:`move_owner` copies their tasks, archived tasks, tombstones and
+reminder markers across, in primary-key batches:
+
+* each batch is inserted on the target first, then deleted from the source,
+  so an interrupted move loses nothing and can simply be run again;
+* rows are copied raw, keeping ids (unique across shards, see
+  ``myapp.sharding``), ``created_at``, ``updated_at`` and versions, and
+  rows already on the target are skipped;
+* on a SQLite target, tasks with ids above the target's range are given
+  new ids from it instead (see ``sharding.id_ceiling``).  Their old ids get
+  tombstones and the new rows a fresh ``updated_at``, so sync clients
+  replace their copies.  Such a batch is copied again if a move is
+  interrupted between the insert and the delete;
+* the owner's counter row is rebuilt on the target and removed from the
+  source, keeping its delete sequence.
+
+Until an owner has been moved, their existing tasks are not found on the
+new shard, so run ``manage.py rebalance_shards`` right after deploying the
+settings change.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Type
+
+from django.db import models, transaction
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+
+from . import stats
+from .models import ArchivedTask, Task, TaskReminder, TaskStats, TaskTombstone
+from .sharding import id_ceiling, shard_for_user
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+@dataclass
+class MoveResult:
+    """
+    Rows moved for one owner.
+
+    Attributes:
+        tasks: Tasks moved
+        archived: Archived tasks moved
+        tombstones: Change-feed tombstones moved
+        reminders: Reminder sent-markers moved
+    """
+    tasks: int = 0
+    archived: int = 0
+    tombstones: int = 0
+    reminders: int = 0
+
+
+def owners_on(using: str) -> Set[Optional[int]]:
+    """Every owner (``None``: no owner) with rows on shard ``using``."""
+    found: Set[Optional[int]] = set()
+    for model in (Task, ArchivedTask, TaskTombstone):
+        found.update(model.objects.using(using).order_by().values_list('user_id', flat=True).distinct())
+    # Migrations leave an empty counter row on every shard
+    counters = TaskStats.objects.using(using).exclude(total=0, completed=0, delete_seq=0)
+    for owner in counters.values_list('owner', flat=True):
+        found.add(None if owner == TaskStats.ANONYMOUS else owner)
+    return found
+
+
+def misplaced_owners(using: str) -> List[Tuple[Optional[int], str]]:
+    """``(user_id, target)`` for every owner on ``using`` that belongs elsewhere."""
+    return sorted(
+        ((user_id, shard_for_user(user_id)) for user_id in owners_on(using)
+         if shard_for_user(user_id) != using),
+        key=lambda move: move[0] or 0,
+    )
+
+
+def _copy(model: Type[models.Model], rows: Iterable[models.Model], target: str,
+          keep_pk: bool = True) -> None:
+    """Insert ``rows`` on ``target`` as they are, skipping ones already there."""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if keep_pk or not field.primary_key
+    ]
+    rows = list(rows)
+    if rows:
+        # raw: no auto_now/auto_now_add, the timestamps are copied as stored
+        model.objects.using(target)._insert(
+            rows, fields=fields, using=target, raw=True, on_conflict=OnConflict.IGNORE,
+        )
+
+
+def _rekey(tasks: List[Task], target: str) -> Dict[int, int]:
+    """
+    Insert ``tasks`` on ``target`` under new ids, returning ``{old: new}``.
+
+    The old ids get tombstones, and the new rows a fresh ``updated_at`` so
+    the change feed reports them.
+    """
+    if not tasks:
+        return {}
+    now = timezone.now()
+    for task in tasks:
+        task.updated_at = now
+    fields = [field for field in Task._meta.concrete_fields if not field.primary_key]
+    returned = Task.objects.using(target)._insert(
+        tasks, fields=fields, using=target, raw=True, returning_fields=[Task._meta.pk],
+    )
+    TaskTombstone.objects.using(target).bulk_create([
+        TaskTombstone(task_id=task.pk, user_id=task.user_id, deleted_at=now) for task in tasks
+    ])
+    return {task.pk: new_id for task, (new_id,) in zip(tasks, returned)}
+
+
+def _move_batches(model: Type[models.Model], user_id: Optional[int], source: str, target: str,
+                  batch_size: int, result: MoveResult, counter: str, keep_pk: bool = True) -> None:
+    """Move every ``model`` row of ``user_id`` from ``source`` to ``target``."""
+    owned = model.objects.using(source).filter(user_id=user_id).order_by('pk')
+    while True:
+        batch = list(owned[:batch_size])
+        if not batch:
+            return
+        ids = [row.pk for row in batch]
+        markers = []
+        if model is Task:
+            markers = list(TaskReminder.objects.using(source).filter(task_id__in=ids))
+        with transaction.atomic(using=target):
+            ceiling = id_ceiling(target) if model is Task else None
+            if ceiling is None:
+                _copy(model, batch, target, keep_pk)
+            else:
+                _copy(model, [row for row in batch if row.pk < ceiling], target, keep_pk)
+                new_ids = _rekey([row for row in batch if row.pk >= ceiling], target)
+                for marker in markers:
+                    marker.task_id = new_ids.get(marker.task_id, marker.task_id)
+            _copy(TaskReminder, markers, target, keep_pk=False)
+        with transaction.atomic(using=source):
+            if markers:
+                TaskReminder.objects.using(source).filter(pk__in=[m.pk for m in markers])._raw_delete(source)
+            moved = model.objects.using(source).filter(pk__in=ids)._raw_delete(source)
+        setattr(result, counter, getattr(result, counter) + moved)
+        result.reminders += len(markers)
+
+
+def move_owner(user_id: Optional[int], source: str, target: str,
+               batch_size: int = DEFAULT_BATCH_SIZE) -> MoveResult:
+    """Move all rows of ``user_id`` from shard ``source`` to ``target``."""
+    result = MoveResult()
+    _move_batches(Task, user_id, source, target, batch_size, result, 'tasks')
+    _move_batches(ArchivedTask, user_id, source, target, batch_size, result, 'archived')
+    # Tombstone ids are per shard; the feed orders them by deletion time first
+    _move_batches(TaskTombstone, user_id, source, target, batch_size, result, 'tombstones',
+                  keep_pk=False)
+
+    owner = TaskStats.ANONYMOUS if user_id is None else user_id
+    previous = TaskStats.objects.using(source).filter(owner=owner).first()
+    with transaction.atomic(using=target):
+        row = stats.rebuild(user_id, using=target)
+        if previous is not None and previous.delete_seq > row.delete_seq:
+            # Keep the HTTP validators moving forward
+            row.delete_seq = previous.delete_seq
+            row.deleted_at = previous.deleted_at
+            row.save(update_fields=['delete_seq', 'deleted_at'])
+    if previous is not None:
+        TaskStats.objects.using(source).filter(owner=owner).delete()
+    return result
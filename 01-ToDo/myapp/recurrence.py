@@ -0,0 +1,335 @@
+"""
+Recurring tasks.
+
+A task repeats when its ``recurrence`` holds a rule: ``daily``, ``weekly``,
+``monthly``, ``yearly`` or an RRULE-like string such as
+``FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH;UNTIL=20270630``.  The supported
+parts are ``FREQ``, ``INTERVAL``, ``BYDAY`` (weekly rules), ``BYMONTHDAY``
+(monthly and yearly rules) and ``UNTIL``.  ``COUNT`` is not supported:
+occurrences are not numbered.
+
+Occurrences are expanded lazily and never stored ahead:
+
+* only the open occurrence of a series carries the rule.  Completing it
+  (:func:`advance`, called by every completion path) inserts the next
+  occurrence, due on the rule's next date after its own, and moves the
+  rule there.  A series holds one row per occurrence worked on, plus one
+  open row, however long it runs;
+* date-range reads (:func:`expand`) add the future occurrences of the
+  open rows on the fly, computed from the rule, without writing anything.
+  A series without a due date counts from when its task was created.
+
+Dates step in the current time zone, so a task due at 09:00 stays at 09:00
+across daylight saving changes.  Monthly and yearly rules keep the day of
+the month they started on and fall on the last day of shorter months.
+"""
+
+import heapq
+from calendar import monthrange
+from collections import Counter
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')
+
+# BYDAY codes, in datetime.weekday() order
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+PARTS = ('FREQ', 'INTERVAL', 'BYDAY', 'BYMONTHDAY', 'UNTIL')
+
+
+def get_agenda_limit() -> int:
+    """Most occurrences returned by one date-range read."""
+    return getattr(settings, 'TASK_AGENDA_LIMIT', 1000)
+
+
+def get_agenda_max_days() -> int:
+    """Longest date range a date-range read may ask for, in days."""
+    return getattr(settings, 'TASK_AGENDA_MAX_DAYS', 366)
+
+
+@dataclass(frozen=True)
+class Rule:
+    """
+    A parsed recurrence rule.
+
+    Attributes:
+        freq: One of ``FREQUENCIES``
+        interval: Repeat every ``interval`` days/weeks/months/years
+        weekdays: Weekdays (0 = Monday) a weekly rule falls on; empty: the start's
+        monthday: Day of the month of monthly and yearly rules; ``None``: the start's
+        until: Last day an occurrence may fall on
+    """
+    freq: str
+    interval: int = 1
+    weekdays: Tuple[int, ...] = ()
+    monthday: Optional[int] = None
+    until: Optional[date] = None
+
+    @classmethod
+    def parse(cls, text: str) -> 'Rule':
+        """
+        Parse ``daily``/``weekly``/``monthly``/``yearly`` or an RRULE-like string.
+
+        Raises:
+            ValueError: If the rule is malformed or uses an unsupported part
+        """
+        text = text.strip().upper()
+        if text.startswith('RRULE:'):
+            text = text[len('RRULE:'):]
+        if text in FREQUENCIES:
+            return cls(text)
+
+        parts: Dict[str, str] = {}
+        for item in text.split(';'):
+            name, sep, value = item.partition('=')
+            if not sep or not value or name in parts:
+                raise ValueError(f'Invalid recurrence part {item!r}')
+            parts[name] = value
+        unknown = sorted(set(parts) - set(PARTS))
+        if unknown:
+            raise ValueError(f'Unsupported recurrence part(s): {", ".join(unknown)}')
+
+        freq = parts.get('FREQ')
+        if freq not in FREQUENCIES:
+            raise ValueError(f'FREQ must be one of {", ".join(FREQUENCIES)}')
+        interval = _parse_int(parts.get('INTERVAL', '1'), 'INTERVAL', 1, 1000)
+        weekdays: Tuple[int, ...] = ()
+        if 'BYDAY' in parts:
+            if freq != 'WEEKLY':
+                raise ValueError('BYDAY is only supported with FREQ=WEEKLY')
+            try:
+                weekdays = tuple(sorted({WEEKDAYS.index(day) for day in parts['BYDAY'].split(',')}))
+            except ValueError:
+                raise ValueError(f"BYDAY must list days out of {','.join(WEEKDAYS)}") from None
+        monthday = None
+        if 'BYMONTHDAY' in parts:
+            if freq not in ('MONTHLY', 'YEARLY'):
+                raise ValueError('BYMONTHDAY is only supported with FREQ=MONTHLY or YEARLY')
+            monthday = _parse_int(parts['BYMONTHDAY'], 'BYMONTHDAY', 1, 31)
+        until = _parse_until(parts['UNTIL']) if 'UNTIL' in parts else None
+        return cls(freq, interval, weekdays, monthday, until)
+
+    def __str__(self) -> str:
+        """Canonical RRULE-like form, as stored in ``Task.recurrence``."""
+        parts = [f'FREQ={self.freq}']
+        if self.interval != 1:
+            parts.append(f'INTERVAL={self.interval}')
+        if self.weekdays:
+            parts.append(f"BYDAY={','.join(WEEKDAYS[day] for day in self.weekdays)}")
+        if self.monthday is not None:
+            parts.append(f'BYMONTHDAY={self.monthday}')
+        if self.until is not None:
+            parts.append(f"UNTIL={self.until.strftime('%Y%m%d')}")
+        return ';'.join(parts)
+
+    def pinned(self, start: datetime) -> 'Rule':
+        """
+        This rule with the day of the month of ``start`` made explicit.
+
+        Keeps monthly and yearly series on their day after passing through
+        a shorter month (Jan 31, Feb 28, Mar 31 rather than Mar 28).
+        """
+        if self.freq in ('MONTHLY', 'YEARLY') and self.monthday is None:
+            return replace(self, monthday=timezone.localtime(start).day)
+        return self
+
+    def next_after(self, moment: datetime) -> Optional[datetime]:
+        """
+        The occurrence following ``moment``, an occurrence or the series' start.
+
+        Returns ``None`` once the series has ended (``UNTIL``).
+        """
+        local = timezone.localtime(moment).replace(tzinfo=None)
+        if self.freq == 'DAILY':
+            following = local + timedelta(days=self.interval)
+        elif self.freq == 'WEEKLY' and self.weekdays:
+            later = [day for day in self.weekdays if day > local.weekday()]
+            if later:
+                following = local + timedelta(days=later[0] - local.weekday())
+            else:
+                # First listed day of the next active week
+                following = local + timedelta(
+                    days=7 * self.interval - local.weekday() + self.weekdays[0]
+                )
+        elif self.freq == 'WEEKLY':
+            following = local + timedelta(weeks=self.interval)
+        else:
+            months = self.interval * (12 if self.freq == 'YEARLY' else 1)
+            following = _add_months(local, months, self.monthday or local.day)
+        if self.until is not None and following.date() > self.until:
+            return None
+        return timezone.make_aware(following)
+
+    def between(self, start: datetime, first: datetime, last: datetime) -> Iterator[datetime]:
+        """
+        Occurrences after ``start`` that fall within ``[first, last]``, in order.
+
+        Whole periods before ``first`` are skipped arithmetically, so a
+        series that started years ago costs the same as a new one.
+        """
+        moment = self._skip(start, first)
+        while True:
+            moment = self.next_after(moment)
+            if moment is None or moment > last:
+                return
+            if moment >= first:
+                yield moment
+
+    def _skip(self, start: datetime, first: datetime) -> datetime:
+        # Jump to the last whole period that still ends before ``first``
+        local = timezone.localtime(start).replace(tzinfo=None)
+        target = timezone.localtime(first).replace(tzinfo=None)
+        if self.freq in ('DAILY', 'WEEKLY'):
+            period = self.interval * (7 if self.freq == 'WEEKLY' else 1)
+            periods = (target.date() - local.date()).days // period - 1
+            if periods > 0:
+                return timezone.make_aware(local + timedelta(days=periods * period))
+        else:
+            period = self.interval * (12 if self.freq == 'YEARLY' else 1)
+            months = (target.year - local.year) * 12 + target.month - local.month
+            periods = months // period - 1
+            if periods > 0:
+                return timezone.make_aware(
+                    _add_months(local, periods * period, self.monthday or local.day)
+                )
+        return start
+
+
+def _parse_int(value: str, name: str, low: int, high: int) -> int:
+    if not value.isdigit() or not low <= int(value) <= high:
+        raise ValueError(f'{name} must be a number from {low} to {high}')
+    return int(value)
+
+
+def _parse_until(value: str) -> date:
+    # 2027-06-30, or the RRULE forms 20270630 and 20270630T000000Z
+    day = parse_date(value[:10]) if '-' in value else None
+    if day is None and len(value) >= 8 and value[:8].isdigit():
+        try:
+            day = date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+        except ValueError:
+            day = None
+    if day is None:
+        raise ValueError(f'Invalid UNTIL date {value!r}')
+    return day
+
+
+def _add_months(moment: datetime, months: int, day: int) -> datetime:
+    years, month = divmod(moment.month - 1 + months, 12)
+    year = moment.year + years
+    return moment.replace(year=year, month=month + 1, day=min(day, monthrange(year, month + 1)[1]))
+
+
+def validate_recurrence(value: str) -> None:
+    """Model field validator for ``Task.recurrence``; the empty string means no repeat."""
+    if value:
+        try:
+            Rule.parse(value)
+        except ValueError as exc:
+            raise ValidationError(str(exc), code='invalid_recurrence')
+
+
+def advance(tasks: QuerySet, completed: Iterable[Any]) -> List[Any]:
+    """
+    Create the next occurrence of each recurring task in ``completed``.
+
+    ``completed`` are tasks of ``tasks`` that have just been marked
+    completed.  The next occurrence copies the task, is due on the rule's
+    next date after the task's due date (or after now, for tasks without
+    one) and takes over the rule; the completed task keeps none, so
+    completing it again repeats nothing.  Call in the transaction that
+    completed the tasks: the rule moves as part of that write.
+
+    Returns the created tasks.
+    """
+    from . import stats
+    from .models import Task
+
+    now = timezone.now()
+    done: List[int] = []
+    following: List[Task] = []
+    for task in completed:
+        if not task.recurrence:
+            continue
+        start = task.due_date or now
+        rule = Rule.parse(task.recurrence).pinned(start)
+        done.append(task.pk)
+        task.recurrence = ''
+        due_date = rule.next_after(start)
+        if due_date is not None:
+            following.append(Task(
+                title=task.title, description=task.description, priority=task.priority,
+                user_id=task.user_id, due_date=due_date, recurrence=str(rule),
+            ))
+    if not done:
+        return []
+
+    tasks.filter(pk__in=done).update(recurrence='')
+    created = tasks.bulk_create(following) if following else []
+    for user_id, count in Counter(task.user_id for task in created).items():
+        stats.adjust(total=count, user_id=user_id, using=tasks.db)
+    return created
+
+
+@dataclass
+class Occurrence:
+    """
+    One occurrence in a date range.
+
+    Attributes:
+        task: The stored task; for a virtual occurrence, the open
+            occurrence of its series
+        due_date: When this occurrence is due
+        virtual: Whether the occurrence is computed from the rule rather than stored
+    """
+    task: Any
+    due_date: datetime
+    virtual: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The task's JSON form, with this occurrence's due date."""
+        return {**self.task.to_dict(), 'due_date': self.due_date.isoformat(), 'virtual': self.virtual}
+
+
+def expand(tasks: QuerySet, first: datetime, last: datetime, limit: int) -> Tuple[List[Occurrence], bool]:
+    """
+    Occurrences of ``tasks`` due within ``[first, last]``, soonest first.
+
+    Stored tasks due in the range are read from the ``(user, due_date, id)``
+    index; the future occurrences of every open recurring task due by
+    ``last``, or without a due date and created by then (the partial
+    ``task_user_recurring_idx``), are added from their rules.  Nothing is
+    written.  Returns at most ``limit`` occurrences and whether more were
+    left out.
+    """
+    stored = (
+        Occurrence(task, task.due_date)
+        for task in tasks.filter(due_date__gte=first, due_date__lte=last).order_by('due_date', 'id')[:limit + 1]
+    )
+    series = tasks.recurring().filter(
+        Q(due_date__lte=last) | Q(due_date__isnull=True, created_at__lte=last)
+    ).order_by('due_date', 'id')
+    computed = [_virtual(task, first, last) for task in series]
+    merged = heapq.merge(stored, *computed, key=lambda occurrence: (occurrence.due_date, occurrence.task.pk))
+    occurrences = list(islice(merged, limit + 1))
+    return occurrences[:limit], len(occurrences) > limit
+
+
+def _virtual(task: Any, first: datetime, last: datetime) -> Iterator[Occurrence]:
+    for moment in _between(task, first, last):
+        yield Occurrence(task, moment, virtual=True)
+
+
+def _between(task: Any, first: datetime, last: datetime) -> Iterator[datetime]:
+    start = task.due_date or task.created_at
+    rule = Rule.parse(task.recurrence).pinned(start)
+    return rule.between(start, first, last)
@@ -0,0 +1,307 @@
+"""
+Due-date reminders.
+
+:class:`ReminderScheduler` finds open tasks that are about to become due
+(within ``TASK_REMINDER_LEAD_MINUTES``) or have become overdue, and hands
+them to the configured backend.  It never scans the whole task table.
+Each tick reads three index ranges, each covering only what is new since
+the previous tick:
+
+* ``due_date`` from the last tick's overdue horizon up to now (newly
+  overdue), on the partial index of open tasks;
+* ``due_date`` from the last tick's lead horizon up to now + lead (newly
+  due soon), on the same index;
+* ``updated_at`` since the previous tick, on the ``(updated_at, id)``
+  index, for tasks created or rescheduled into a range already scanned.
+
+Each shard is scanned in turn; sent-markers live on the task's shard.
+
+Candidates are processed in batches.  Each batch claims its reminders by
+inserting :class:`~myapp.models.TaskReminder` sent-markers under a unique
+constraint, so a reminder is sent once even with several schedulers
+running.  The winners are handed to a thread pool that calls the backend
+while the scheduler reads the next batch.  Delivery is at most once: a
+crash between claiming and sending loses that batch.  A batch the
+backend fails to send is retried on the next tick while the process runs.
+
+Backends are classes named by ``TASK_REMINDER_BACKEND``, as with Django's
+email backends:
+
+* :class:`ConsoleBackend` writes one line per reminder to stdout;
+* :class:`FileBackend` appends JSON lines to ``TASK_REMINDER_FILE``.
+"""
+
+import json
+import logging
+import sys
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task, TaskReminder
+from .sharding import get_shards
+
+logger = logging.getLogger('myapp.reminders')
+
+# Task columns a reminder needs
+REMINDER_FIELDS = ('pk', 'title', 'due_date', 'user_id')
+
+
+@dataclass
+class Reminder:
+    """
+    One reminder to deliver.
+
+    Attributes:
+        task_id: Primary key of the task
+        title: Task title
+        due_date: When the task is due
+        kind: ``TaskReminder.DUE_SOON`` or ``TaskReminder.OVERDUE``
+        user_id: Owner of the task, if any
+    """
+    task_id: int
+    title: str
+    due_date: datetime
+    kind: str
+    user_id: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, object]:
+        """JSON-serializable form of the reminder."""
+        return {**asdict(self), 'due_date': self.due_date.isoformat()}
+
+
+class BaseReminderBackend:
+    """
+    Base class for reminder delivery.
+
+    Subclasses implement :meth:`send`; it is called from worker threads,
+    with batches of up to ``--batch-size`` reminders, and must not use the
+    database.
+    """
+
+    def __init__(self, **kwargs) -> None:
+        self.options = kwargs
+
+    def send(self, reminders: List[Reminder]) -> int:
+        """Deliver ``reminders``; return how many were sent."""
+        raise NotImplementedError('subclasses of BaseReminderBackend must provide a send() method')
+
+    def close(self) -> None:
+        """Release any resources once the scheduler stops."""
+
+
+class ConsoleBackend(BaseReminderBackend):
+    """Write reminders to a stream (stdout by default), one line each."""
+
+    def __init__(self, stream: Optional[TextIO] = None, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def send(self, reminders: List[Reminder]) -> int:
+        lines = ''.join(
+            f'[{reminder.kind}] task {reminder.task_id} "{reminder.title}" '
+            f'due {reminder.due_date.isoformat()}\n'
+            for reminder in reminders
+        )
+        with self._lock:
+            self.stream.write(lines)
+            self.stream.flush()
+        return len(reminders)
+
+
+class FileBackend(BaseReminderBackend):
+    """Append reminders as JSON lines to ``TASK_REMINDER_FILE``."""
+
+    def __init__(self, path: Optional[str] = None, **kwargs) -> None:
+        super().__init__(**kwargs)
+        path = path or getattr(settings, 'TASK_REMINDER_FILE', None)
+        if not path:
+            raise ValueError('FileBackend needs TASK_REMINDER_FILE or a path')
+        self.file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def send(self, reminders: List[Reminder]) -> int:
+        lines = ''.join(json.dumps(reminder.to_dict()) + '\n' for reminder in reminders)
+        with self._lock:
+            self.file.write(lines)
+            self.file.flush()
+        return len(reminders)
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def get_backend(path: Optional[str] = None, **kwargs) -> BaseReminderBackend:
+    """Instantiate the backend named by ``path`` or ``TASK_REMINDER_BACKEND``."""
+    path = path or getattr(settings, 'TASK_REMINDER_BACKEND', 'myapp.reminders.ConsoleBackend')
+    return import_string(path)(**kwargs)
+
+
+def get_lead() -> timedelta:
+    """How long before the due date the "due soon" reminder goes out."""
+    return timedelta(minutes=getattr(settings, 'TASK_REMINDER_LEAD_MINUTES', 60))
+
+
+@dataclass
+class TickResult:
+    """
+    What one scheduler tick did.
+
+    Attributes:
+        candidates: Tasks found in the scanned ranges
+        sent: Reminders delivered
+        duplicates: Candidates whose reminder had already been claimed
+        failed: Reminders the backend failed to send (retried next tick)
+    """
+    candidates: int = 0
+    sent: int = 0
+    duplicates: int = 0
+    failed: int = 0
+
+
+class ReminderScheduler:
+    """
+    Scan for due and overdue tasks and dispatch reminders in batches.
+
+    Call :meth:`tick` periodically; it returns once every batch of the tick
+    has been delivered.  ``lookback`` bounds how far back overdue tasks are
+    picked up on the first tick.
+    """
+
+    # Rows are timestamped before commit; rescan this far back to catch
+    # transactions that were still in flight at the previous tick
+    SETTLE = timedelta(seconds=5)
+
+    def __init__(self, backend: BaseReminderBackend, batch_size: int = 1000,
+                 workers: int = 4, lead: Optional[timedelta] = None,
+                 lookback: timedelta = timedelta(hours=24)) -> None:
+        self.backend = backend
+        self.batch_size = batch_size
+        self.lead = get_lead() if lead is None else lead
+        self.lookback = lookback
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='reminders')
+        self.retry: List[Reminder] = []
+        self.overdue_from: Optional[datetime] = None
+        self.soon_from: Optional[datetime] = None
+        self.changed_from: Optional[datetime] = None
+
+    def close(self) -> None:
+        """Stop the worker threads and the backend."""
+        self.executor.shutdown(wait=True)
+        self.backend.close()
+
+    def tick(self, now: Optional[datetime] = None) -> TickResult:
+        """Send every reminder that became due since the previous tick."""
+        now = now or timezone.now()
+        if self.overdue_from is None:
+            self.overdue_from = now - self.lookback
+            self.soon_from = now
+            self.changed_from = now
+        ranges = []
+        for alias in get_shards():
+            open_tasks = Task.objects.using(alias).filter(completed=False)
+            ranges += [
+                # Newly overdue
+                open_tasks.filter(due_date__gte=self.overdue_from - self.SETTLE, due_date__lt=now)
+                .order_by('due_date', 'pk'),
+                # Newly due soon
+                open_tasks.filter(due_date__gte=self.soon_from - self.SETTLE, due_date__lt=now + self.lead)
+                .order_by('due_date', 'pk'),
+                # Created or rescheduled into a range that was already scanned
+                open_tasks.filter(
+                    updated_at__gte=self.changed_from - self.SETTLE,
+                    due_date__gte=now - self.lookback, due_date__lt=now + self.lead,
+                ).order_by('updated_at', 'pk'),
+            ]
+
+        result = TickResult()
+        pending: List[Tuple[Future, List[Reminder]]] = []
+        if self.retry:
+            retry, self.retry = self.retry, []
+            pending.append((self.executor.submit(self.backend.send, retry), retry))
+        for using, batch in self._batches(ranges, now):
+            result.candidates += len(batch)
+            claimed = self._claim(batch, using)
+            result.duplicates += len(batch) - len(claimed)
+            if claimed:
+                pending.append((self.executor.submit(self.backend.send, claimed), claimed))
+
+        for future, reminders in pending:
+            try:
+                future.result()
+            except Exception:
+                logger.exception('Sending %d reminders failed; retrying next tick', len(reminders))
+                result.failed += len(reminders)
+                self.retry.extend(reminders)
+            else:
+                result.sent += len(reminders)
+
+        self.overdue_from = now
+        self.soon_from = now + self.lead
+        self.changed_from = now
+        return result
+
+    def _batches(self, ranges: List[QuerySet], now: datetime) -> Iterator[Tuple[str, List[Reminder]]]:
+        """Yield ``(shard, reminders)`` for every task in ``ranges``, ``batch_size`` at a time."""
+        for queryset in ranges:
+            ordering = queryset.query.order_by
+            last = None
+            while True:
+                page = queryset
+                if last is not None:
+                    # Keyset seek past the previous batch, as in pagination
+                    page = page.filter(
+                        Q(**{f'{ordering[0]}__gte': last[0]}),
+                        Q(**{f'{ordering[0]}__gt': last[0]}) | Q(**{ordering[0]: last[0], 'pk__gt': last[1]}),
+                    )
+                rows = list(page.values_list(*REMINDER_FIELDS, ordering[0])[:self.batch_size])
+                if not rows:
+                    break
+                yield queryset.db, [
+                    Reminder(
+                        task_id=pk, title=title, due_date=due_date, user_id=user_id,
+                        kind=TaskReminder.OVERDUE if due_date < now else TaskReminder.DUE_SOON,
+                    )
+                    for pk, title, due_date, user_id, _ in rows
+                ]
+                if len(rows) < self.batch_size:
+                    break
+                last = (rows[-1][-1], rows[-1][0])
+
+    def _claim(self, batch: List[Reminder], using: str = DEFAULT_DB_ALIAS) -> List[Reminder]:
+        """Insert sent-markers for ``batch`` on shard ``using``; return the reminders this call won."""
+        # A task can turn up in more than one scanned range
+        unique = list({(r.task_id, r.kind, r.due_date): r for r in batch}.values())
+        token = uuid.uuid4().hex
+        markers = TaskReminder.objects.using(using)
+        with transaction.atomic(using=using):
+            markers.bulk_create(
+                [
+                    TaskReminder(task_id=r.task_id, kind=r.kind, due_date=r.due_date, claim=token)
+                    for r in unique
+                ],
+                ignore_conflicts=True,
+            )
+            won = set(
+                markers.filter(claim=token).values_list('task_id', 'kind')
+            )
+        return [r for r in unique if (r.task_id, r.kind) in won]
+
+    def prune(self, now: Optional[datetime] = None) -> int:
+        """Delete markers too old to be scanned again; return how many."""
+        now = now or timezone.now()
+        cutoff = now - self.lookback - self.SETTLE - timedelta(days=1)
+        return sum(
+            TaskReminder.objects.using(alias).filter(due_date__lt=cutoff).delete()[0]
+            for alias in get_shards()
+        )
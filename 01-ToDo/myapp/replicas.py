@@ -0,0 +1,164 @@
+"""
+Read replicas with read-your-writes stickiness.
+
+``DATABASE_REPLICAS`` maps a primary alias (``default`` or a task shard)
+to the aliases of its replicas.  Reads go to a random replica only inside
+views wrapped with :func:`replica_reads` (the list, search and dashboard
+pages).  Every other view, and every write, uses the primary, so a replica
+can never be written to by accident.
+
+Replicas lag behind the primary.  After a request that wrote (any unsafe
+method, or a view that called :func:`pin_primary`),
+:class:`StickyPrimaryMiddleware` sets a cookie that keeps the client's
+reads on the primary for ``REPLICA_STICKY_SECONDS``, so the redirect back
+to the task list shows the change.
+
+Querysets that pick their shard explicitly (``Task.objects.for_user()``)
+ask :func:`read_alias` for the database to read from;
+:class:`PrimaryReplicaRouter` covers the reads Django routes itself and
+keeps replicas out of migrations.
+"""
+
+import random
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, List, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpRequest, HttpResponse
+
+# Cookie marking a client that wrote recently
+STICKY_COOKIE = 'primary_reads'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+_replica_reads: ContextVar[bool] = ContextVar('replica_reads', default=False)
+
+
+def get_replicas() -> Dict[str, List[str]]:
+    """Replica aliases of each primary alias."""
+    return getattr(settings, 'DATABASE_REPLICAS', {})
+
+
+def get_sticky_seconds() -> int:
+    """How long a client reads from the primary after writing."""
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+
+def read_alias(alias: str) -> str:
+    """Database to read ``alias``'s data from in the current context."""
+    if not _replica_reads.get():
+        return alias
+    replicas = get_replicas().get(alias)
+    return random.choice(replicas) if replicas else alias
+
+
+def primary_of(alias: str) -> str:
+    """The primary of replica ``alias`` (``alias`` itself if it is a primary)."""
+    for primary, replicas in get_replicas().items():
+        if alias in replicas:
+            return primary
+    return alias
+
+
+def pin_primary(request: HttpRequest) -> None:
+    """Mark ``request`` as a write, for views that write on a safe method."""
+    request.wrote_primary = True
+
+
+def replica_reads(view):
+    """
+    Let ``view`` read from replicas, unless the client wrote recently.
+
+    Apply it outermost, so conditional-GET checks read from replicas too.
+    """
+    def allowed(request: HttpRequest) -> bool:
+        return request.method in SAFE_METHODS and STICKY_COOKIE not in request.COOKIES
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request: HttpRequest, *args, **kwargs):
+            if not allowed(request):
+                return await view(request, *args, **kwargs)
+            token = _replica_reads.set(True)
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request: HttpRequest, *args, **kwargs):
+        if not allowed(request):
+            return view(request, *args, **kwargs)
+        token = _replica_reads.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    """
+    Send unrouted reads to a replica of ``default`` inside :func:`replica_reads`.
+
+    Objects keep to the database they were loaded from; writes are left to
+    the other routers (and end up on a primary).  Replicas are never
+    migrated: they receive the schema from their primary.
+    """
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if _replica_reads.get():
+            return read_alias(DEFAULT_DB_ALIAS)
+        return None
+
+    def db_for_write(self, model, **hints) -> Optional[str]:
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return primary_of(instance._state.db)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:
+        if primary_of(obj1._state.db or DEFAULT_DB_ALIAS) == primary_of(obj2._state.db or DEFAULT_DB_ALIAS):
+            return True
+        return None
+
+    def allow_migrate(self, db: str, app_label: str, model_name: Optional[str] = None,
+                      **hints) -> Optional[bool]:
+        if primary_of(db) != db:
+            return False
+        return None
+
+
+class StickyPrimaryMiddleware:
+    """Keep a client's reads on the primary for a while after it writes."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest):
+        if iscoroutinefunction(self):
+            return self._acall(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def _acall(self, request: HttpRequest):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request: HttpRequest, response: HttpResponse) -> HttpResponse:
+        wrote = request.method not in SAFE_METHODS or getattr(request, 'wrote_primary', False)
+        if wrote and get_replicas():
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=get_sticky_seconds(), httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,291 @@
+"""
+Ranked full-text search over task titles and descriptions.
+
+The index depends on the database:
+
+* SQLite: an external-content FTS5 table, ``myapp_task_fts``, that mirrors
+  ``title`` and ``description``.  Triggers on the task table keep it in
+  sync, so bulk inserts, ``QuerySet.update`` and raw deletes are indexed
+  too.  Results are ranked by BM25, with title matches weighted 10:1.
+* PostgreSQL: a stored generated ``tsvector`` column, ``search_document``,
+  weighting the title over the description, with a GIN index.  Results are
+  ranked by ``ts_rank``.  Storing the vector means ranking reads it instead
+  of re-running ``to_tsvector`` on every matching row.
+
+Ranking is the expensive part: a common word can match a large share of a
+million tasks.  Every match is ranked by default.  With
+``TASK_SEARCH_RANK_WINDOW = N`` only the newest N matches are ranked, which
+keeps every query in the low milliseconds (finding them is an index walk
+in id order); older matches then appear on no page, and the page reports
+``truncated`` so clients can tell.
+
+Searches are limited to one owner's tasks and run on the owner's shard.
+The index covers every task on the shard, so matches are checked against
+the owner by primary key as they are walked.
+
+Both are created by migration ``0005_task_search``.  Rebuild them with
+``manage.py rebuild_search_index``.  Other databases are not supported:
+the ``myapp.E001`` system check stops the project from starting on them.
+
+Queries are reduced to their words and matched as "all words", with
+stemming, on both backends, so user input cannot inject query syntax.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.core import checks
+from django.db import connection, connections
+from django.db.models import QuerySet
+
+from .models import Task
+from .pagination import InvalidCursor
+
+
+FTS_TABLE = 'myapp_task_fts'
+
+# Databases with a full-text index implementation below
+SUPPORTED_VENDORS = ('sqlite', 'postgresql')
+
+SEARCH_CONFIG = 'english'
+
+POSTGRES_INDEX = 'task_search_idx'
+
+# Generated tsvector column on Postgres (not a model field)
+DOCUMENT_COLUMN = 'search_document'
+
+# Re-created after every migrate: Django rebuilds SQLite tables for many
+# schema changes, which drops their triggers
+SQLITE_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON myapp_task BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON myapp_task BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, description ON myapp_task BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+]
+
+# Longest query, in words, that is searched
+MAX_TERMS = 16
+
+
+@dataclass
+class SearchPage:
+    """
+    One page of ranked search results.
+
+    Attributes:
+        items: Matching tasks, best first; each has a ``rank`` attribute
+        offset: Position of the first item in the full result list
+        limit: Page size
+        has_next: Whether more results follow this page
+        truncated: Whether older matches were left out by the rank window
+    """
+    items: List[Task]
+    offset: int
+    limit: int
+    has_next: bool
+    truncated: bool = False
+
+    @property
+    def next_cursor(self) -> Optional[str]:
+        """Opaque token for the following page, or ``None`` on the last one."""
+        return str(self.offset + self.limit) if self.has_next else None
+
+    @property
+    def prev_cursor(self) -> Optional[str]:
+        """Opaque token for the preceding page, or ``None`` on the first one."""
+        return str(max(0, self.offset - self.limit)) if self.offset else None
+
+
+def decode_search_cursor(cursor: Optional[str]) -> int:
+    """
+    Return the result offset encoded in ``cursor``.
+
+    Ranked results have no stable sort key to seek on, so search pages
+    by offset; the ranking query costs the same for every page.
+    """
+    if not cursor:
+        return 0
+    if not cursor.isdigit():
+        raise InvalidCursor(cursor)
+    return int(cursor)
+
+
+def get_rank_window() -> Optional[int]:
+    """How many of the newest matches are ranked; ``None`` (the default) ranks them all."""
+    return getattr(settings, 'TASK_SEARCH_RANK_WINDOW', None) or None
+
+
+def search_terms(query: str) -> List[str]:
+    """Split free text into the words that are searched for."""
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def search_tasks(query: str, limit: int, offset: int = 0,
+                 queryset: Optional[QuerySet] = None, user_id: Optional[int] = None) -> SearchPage:
+    """
+    Return tasks of ``user_id`` matching every word of ``query``, best match first.
+
+    ``queryset`` (default: the owner's tasks) supplies annotations for the
+    results; it is not used to narrow the search.
+    """
+    if queryset is None:
+        queryset = Task.objects.owned_by(user_id)
+    terms = search_terms(query)
+    if not terms:
+        return SearchPage(items=[], offset=offset, limit=limit, has_next=False)
+
+    using = connections[queryset.db]
+    window = get_rank_window()
+    if using.vendor == 'sqlite':
+        ranked = _search_sqlite(using, terms, user_id, limit + 1, offset, window)
+    elif using.vendor == 'postgresql':
+        ranked = _search_postgres(using, terms, user_id, limit + 1, offset, window)
+    else:
+        raise NotImplementedError(f'Full-text search is not available on {using.vendor}')
+    truncated = bool(window) and _has_match_beyond(using, terms, user_id, window)
+
+    tasks = queryset.in_bulk([pk for pk, _ in ranked])
+    items = []
+    for pk, rank in ranked:
+        task = tasks.get(pk)
+        if task is not None:
+            task.rank = rank
+            items.append(task)
+    return SearchPage(
+        items=items[:limit], offset=offset, limit=limit, has_next=len(items) > limit, truncated=truncated,
+    )
+
+
+def _owner_clause(column: str, user_id: Optional[int]) -> Tuple[str, List[int]]:
+    """SQL restricting ``column`` to ``user_id``, which may be NULL."""
+    if user_id is None:
+        return f'{column} IS NULL', []
+    return f'{column} = %s', [user_id]
+
+
+def _search_sqlite(using, terms: List[str], user_id: Optional[int], limit: int, offset: int,
+                   window: Optional[int]) -> List[Tuple[int, float]]:
+    # Quoted terms are literal strings to FTS5; adjacent terms are ANDed
+    match = ' '.join(f'"{term}"' for term in terms)
+    owner, owner_params = _owner_clause('myapp_task.user_id', user_id)
+    matches = (
+        f'FROM {FTS_TABLE} JOIN myapp_task ON myapp_task.id = {FTS_TABLE}.rowid '
+        f'WHERE {FTS_TABLE} MATCH %s AND {owner} '
+    )
+    params = [match, *owner_params]
+    window_clause = ''
+    if window:
+        # FTS5 walks matches in rowid order for free; only ranking costs
+        window_clause = (
+            f'AND {FTS_TABLE}.rowid >= (SELECT min(rowid) FROM (SELECT {FTS_TABLE}.rowid AS rowid '
+            f'{matches}ORDER BY {FTS_TABLE}.rowid DESC LIMIT %s)) '
+        )
+        params += [match, *owner_params, window]
+    with using.cursor() as cursor:
+        cursor.execute(
+            f'SELECT {FTS_TABLE}.rowid, {FTS_TABLE}.rank {matches}{window_clause}'
+            f'ORDER BY {FTS_TABLE}.rank, {FTS_TABLE}.rowid DESC LIMIT %s OFFSET %s',
+            params + [limit, offset],
+        )
+        # BM25 is lower-is-better in FTS5; report higher-is-better
+        return [(pk, -rank) for pk, rank in cursor.fetchall()]
+
+
+def _search_postgres(using, terms: List[str], user_id: Optional[int], limit: int, offset: int,
+                     window: Optional[int]) -> List[Tuple[int, float]]:
+    owner, owner_params = _owner_clause('user_id', user_id)
+    with using.cursor() as cursor:
+        cursor.execute(
+            f'SELECT id, ts_rank({DOCUMENT_COLUMN}, query) AS rank '
+            f'FROM (SELECT id, {DOCUMENT_COLUMN} FROM myapp_task, '
+            f'      plainto_tsquery(%s::regconfig, %s) query '
+            f'      WHERE {DOCUMENT_COLUMN} @@ query AND {owner} ORDER BY id DESC LIMIT %s) recent, '
+            f'     plainto_tsquery(%s::regconfig, %s) query '
+            f'ORDER BY rank DESC, id DESC LIMIT %s OFFSET %s',
+            [SEARCH_CONFIG, ' '.join(terms), *owner_params, window,
+             SEARCH_CONFIG, ' '.join(terms), limit, offset],
+        )
+        return cursor.fetchall()
+
+
+def _has_match_beyond(using, terms: List[str], user_id: Optional[int], window: int) -> bool:
+    # Whether a match older than the newest ``window`` exists: an index walk of window + 1 rows
+    if using.vendor == 'sqlite':
+        owner, owner_params = _owner_clause('myapp_task.user_id', user_id)
+        sql = (
+            f'SELECT 1 FROM {FTS_TABLE} JOIN myapp_task ON myapp_task.id = {FTS_TABLE}.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s AND {owner} ORDER BY {FTS_TABLE}.rowid DESC LIMIT 1 OFFSET %s'
+        )
+        params = [' '.join(f'"{term}"' for term in terms), *owner_params, window]
+    else:
+        owner, owner_params = _owner_clause('user_id', user_id)
+        sql = (
+            f'SELECT 1 FROM myapp_task WHERE {DOCUMENT_COLUMN} @@ plainto_tsquery(%s::regconfig, %s) '
+            f'AND {owner} ORDER BY id DESC LIMIT 1 OFFSET %s'
+        )
+        params = [SEARCH_CONFIG, ' '.join(terms), *owner_params, window]
+    with using.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone() is not None
+
+
+def install_sqlite_triggers(using_connection=None) -> None:
+    """Create the FTS sync triggers if they are missing (SQLite only)."""
+    using_connection = using_connection or connection
+    if using_connection.vendor != 'sqlite':
+        return
+    with using_connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE]
+        )
+        if cursor.fetchone() is None:
+            return
+        for statement in SQLITE_TRIGGERS:
+            cursor.execute(statement)
+
+
+def rebuild_index(using_connection=None) -> None:
+    """Rebuild the full-text index from the task table."""
+    using_connection = using_connection or connection
+    with using_connection.cursor() as cursor:
+        if using_connection.vendor == 'sqlite':
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        elif using_connection.vendor == 'postgresql':
+            cursor.execute(f'REINDEX INDEX {using_connection.ops.quote_name(POSTGRES_INDEX)}')
+        else:
+            raise NotImplementedError(
+                f'Full-text search is not available on {using_connection.vendor}'
+            )
+
+
+def check_search_backend(app_configs=None, **kwargs) -> List[checks.CheckMessage]:
+    """System check: every database that may hold tasks supports full-text search."""
+    errors = []
+    for alias in connections:
+        vendor = connections[alias].vendor
+        if vendor not in SUPPORTED_VENDORS:
+            errors.append(checks.Error(
+                f'Database {alias!r} uses {vendor}, which has no task search index.',
+                hint=f'Task search supports {" and ".join(SUPPORTED_VENDORS)}.',
+                obj=alias,
+                id='myapp.E001',
+            ))
+    return errors
+
+
+def sqlite_triggers_post_migrate(sender, using: str, **kwargs) -> None:
+    """``post_migrate`` handler restoring triggers lost to table rebuilds."""
+    install_sqlite_triggers(connections[using])
@@ -0,0 +1,217 @@
+"""
+User-sharded task storage.
+
+Tasks, and everything derived from them (counters, tombstones, archived
+tasks, reminder markers), live on one of the databases named by
+``TASK_SHARDS``, chosen per owner:
+
+* users listed in ``TASK_SHARD_PINS`` (``{user_id: alias}``) live on their
+  pinned shard, e.g. a heavy tenant on a database of its own;
+* every other user is placed by a jump consistent hash of their id, so
+  adding a shard at the end of the list moves only about ``1/n`` of the
+  users;
+* tasks without an owner (anonymous use) live on the first shard.
+
+Every query goes through ``Task.objects.for_user()``, which filters by
+owner and selects the shard, so a request only ever reads one user's
+rows on one database.  :class:`UserShardRouter` routes the writes and
+related lookups that Django makes without an explicit database.  Users,
+sessions and the admin stay on ``default``.
+
+Each shard hands out task ids from its own range, ``SHARD_ID_SPAN`` ids
+apart (see :func:`reserve_id_range`), so ids stay unique when an owner's
+tasks move between shards; SQLite shards re-key tasks that move to an
+earlier shard (see :func:`id_ceiling`).  Shards must therefore only ever
+be appended to ``TASK_SHARDS``.  After adding a shard or changing a pin, run
+``manage.py rebalance_shards`` to move owners to their new shard.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Q
+
+from .replicas import primary_of
+
+# Apps whose tables live on every shard
+SHARDED_APPS = ('myapp',)
+
+# Ids reserved per shard: shard i allocates task ids from i * SHARD_ID_SPAN
+SHARD_ID_SPAN = 2 ** 40
+
+# Tables whose primary keys must stay unique across shards
+ID_RANGE_TABLES = ('myapp_task',)
+
+
+def get_shards() -> List[str]:
+    """Database aliases holding tasks, in placement order."""
+    return list(getattr(settings, 'TASK_SHARDS', None) or [DEFAULT_DB_ALIAS])
+
+
+def get_pins() -> Dict[int, str]:
+    """Owners pinned to a specific shard."""
+    return getattr(settings, 'TASK_SHARD_PINS', {})
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """
+    Map ``key`` to one of ``buckets`` (Lamping & Veach's jump consistent hash).
+
+    Growing ``buckets`` by one moves only ``1/buckets`` of the keys, all of
+    them to the new bucket.
+    """
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_for_user(user_id: Optional[int]) -> str:
+    """Alias of the database that holds the tasks of ``user_id``."""
+    shards = get_shards()
+    if user_id is None:
+        return shards[0]
+    pinned = get_pins().get(user_id)
+    if pinned is not None:
+        return pinned
+    return shards[jump_hash(user_id, len(shards))]
+
+
+def is_sharded(model: Any) -> bool:
+    """Whether ``model`` (class or instance) is stored on the task shards."""
+    return model._meta.app_label in SHARDED_APPS
+
+
+class UserShardRouter:
+    """
+    Route task models to their owner's shard and everything else to default.
+
+    Querysets pick their shard explicitly (``for_user``); the router covers
+    what Django routes by instance: saving a new task, following
+    ``user.tasks`` and loading ``task.user``.
+    """
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        return self._route(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints) -> Optional[str]:
+        alias = self._route(model, hints.get('instance'))
+        # Objects read from a replica are saved to its primary
+        return alias and primary_of(alias)
+
+    def _route(self, model, instance) -> Optional[str]:
+        if instance is None:
+            return None
+        if not is_sharded(model):
+            # task.user: the user table only exists on default
+            return DEFAULT_DB_ALIAS if is_sharded(instance) else None
+        if instance._meta.label == settings.AUTH_USER_MODEL:
+            # user.tasks
+            return shard_for_user(instance.pk)
+        if is_sharded(instance) and instance._state.db:
+            return instance._state.db
+        if hasattr(instance, 'user_id'):
+            return shard_for_user(instance.user_id)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:
+        # Task.user crosses databases; the FK has no constraint
+        if is_sharded(obj1) or is_sharded(obj2):
+            return True
+        return None
+
+    def allow_migrate(self, db: str, app_label: str, model_name: Optional[str] = None,
+                      **hints) -> Optional[bool]:
+        if app_label in SHARDED_APPS:
+            # Also on default, so cascades from the user table find their tables
+            return db == DEFAULT_DB_ALIAS or db in get_shards()
+        if db != DEFAULT_DB_ALIAS and db in get_shards():
+            return False
+        return None
+
+
+def reserve_id_range(using: str) -> None:
+    """Start task ids on shard ``using`` at its own ``SHARD_ID_SPAN`` range."""
+    shards = get_shards()
+    if using not in shards or not shards.index(using):
+        return
+    start = shards.index(using) * SHARD_ID_SPAN
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for table in ID_RANGE_TABLES:
+            if connection.vendor == 'sqlite':
+                # Django declares SQLite primary keys AUTOINCREMENT
+                cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, start])
+                elif row[0] < start:
+                    cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s', [start, table])
+            elif connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT setval(seq, %s) FROM pg_get_serial_sequence(%s, %s) AS seq '
+                    'WHERE COALESCE(pg_sequence_last_value(seq::regclass), 0) < %s',
+                    [start, table, 'id', start],
+                )
+
+
+def id_ceiling(using: str) -> Optional[int]:
+    """
+    Lowest task id shard ``using`` cannot store as is (``None``: no limit).
+
+    SQLite's AUTOINCREMENT continues after the largest id in the table, so
+    a row copied in from a later shard's range would move the shard's new
+    ids into that range.  PostgreSQL sequences ignore explicit ids.
+    """
+    shards = get_shards()
+    if using not in shards or connections[using].vendor != 'sqlite':
+        return None
+    return (shards.index(using) + 1) * SHARD_ID_SPAN
+
+
+def shards_post_migrate(sender, using: str, **kwargs) -> None:
+    """``post_migrate`` handler giving a newly migrated shard its id range."""
+    reserve_id_range(using)
+
+
+def user_deleted(sender, instance, **kwargs) -> None:
+    """
+    ``pre_delete`` handler for users: delete everything they own on their shard.
+
+    Django's cascade only looks at the database the user is deleted from,
+    and tombstones and reminder markers have no foreign key to cascade
+    along, so the handler removes all of it itself, from the shard's
+    primary.  The rows go without signals: nothing of the owner is left to
+    keep counters or tombstones for.  When the user is deleted from the
+    shard's own database, the cascade still deletes the tasks it collected
+    beforehand; their handlers skip them (see :func:`deleted_with_owner`).
+    """
+    from .models import ArchivedTask, Task, TaskReminder, TaskStats, TaskTombstone
+
+    using = shard_for_user(instance.pk)
+    tasks = Task.objects.using(using).filter(user_id=instance.pk)
+    archived = ArchivedTask.objects.using(using).filter(user_id=instance.pk)
+    with transaction.atomic(using=using):
+        TaskReminder.objects.using(using).filter(
+            Q(task_id__in=tasks.values('pk')) | Q(task_id__in=archived.values('pk'))
+        )._raw_delete(using)
+        tasks._raw_delete(using)
+        archived._raw_delete(using)
+        TaskTombstone.objects.using(using).filter(user_id=instance.pk)._raw_delete(using)
+        TaskStats.objects.using(using).filter(owner=instance.pk).delete()
+
+
+
+def deleted_with_owner(origin: Any) -> bool:
+    """
+    Whether a task ``post_delete`` with ``origin`` is part of deleting its owner.
+
+    :func:`user_deleted` removes everything of the owner, so such deletes
+    need no tombstones or counter updates.
+    """
+    from django.contrib.auth import get_user_model
+
+    return isinstance(origin, get_user_model())
@@ -0,0 +1,149 @@
+"""
+Hashed, precompressed static files with far-future caching.
+
+* :class:`CompressedManifestStaticFilesStorage` is Django's
+  ``ManifestStaticFilesStorage`` (``app.css`` is collected as
+  ``app.<hash>.css`` and ``{% static %}`` links to that name).  It also
+  writes ``.gz`` copies of text assets, plus ``.br`` copies when
+  ``brotli`` is installed, so nothing is compressed per request.
+* :class:`StaticFilesMiddleware` serves ``STATIC_ROOT`` under
+  ``STATIC_URL`` when no web server does.  It picks the best precompressed
+  copy the client accepts.  Hashed names get ``Cache-Control: immutable``
+  for ``STATIC_MAX_AGE`` (a year by default), because a changed file gets a
+  new name.  Unhashed names are cached for a minute.
+
+``DEBUG`` keeps the plain storage and ``runserver``'s own static handler.
+Run ``manage.py collectstatic`` when deploying.
+"""
+
+import gzip
+import mimetypes
+import os
+from typing import Iterator, Optional, Set, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.http import FileResponse, HttpRequest, HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.utils.regex_helper import _lazy_re_compile
+from django.views.static import was_modified_since
+
+from .compression import accepts_brotli, brotli_available, compress_brotli
+
+re_accepts_gzip = _lazy_re_compile(r'\bgzip\b')
+
+# Text formats worth precompressing
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.txt', '.json', '.map', '.html', '.xml')
+
+# Encoded copy suffix -> Content-Encoding, best first
+ENCODINGS = (('.br', 'br'), ('.gz', 'gzip'))
+
+# Unhashed files may change under the same name
+SHORT_MAX_AGE = 60
+
+
+def get_static_max_age() -> int:
+    """``max-age`` for hashed static files, in seconds."""
+    return getattr(settings, 'STATIC_MAX_AGE', 365 * 24 * 60 * 60)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """``ManifestStaticFilesStorage`` that also writes gzip/Brotli copies."""
+
+    def post_process(self, *args, **kwargs) -> Iterator[Tuple[str, Optional[str], bool]]:
+        for name, hashed_name, processed in super().post_process(*args, **kwargs):
+            if isinstance(processed, Exception):
+                yield name, hashed_name, processed
+                continue
+            for path in {name, hashed_name} - {None}:
+                if path.endswith(COMPRESSIBLE_EXTENSIONS):
+                    self._write_compressed(path)
+            yield name, hashed_name, processed
+
+    def _write_compressed(self, name: str) -> None:
+        with self.open(name) as source:
+            data = source.read()
+        encoded = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli_available():
+            encoded.append(('.br', compress_brotli(data, quality=11)))
+        for suffix, payload in encoded:
+            if len(payload) < len(data):
+                with open(self.path(name + suffix), 'wb') as target:
+                    target.write(payload)
+
+
+class StaticFilesMiddleware:
+    """
+    Serve collected static files, precompressed and cached.
+
+    Place it right after ``SecurityMiddleware`` so static requests skip the
+    rest of the stack (sessions, CSRF, compression).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.root = settings.STATIC_ROOT and os.path.realpath(settings.STATIC_ROOT)
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/') if settings.STATIC_URL else None
+        self._hashed: Optional[Set[str]] = None
+
+    def __call__(self, request: HttpRequest):
+        response = self.serve(request)
+        if iscoroutinefunction(self):
+            return self._acall(request, response)
+        return response or self.get_response(request)
+
+    async def _acall(self, request: HttpRequest, response: Optional[HttpResponse]):
+        return response or await self.get_response(request)
+
+    @property
+    def hashed_names(self) -> Set[str]:
+        """Names written by the manifest storage (safe to cache forever)."""
+        if self._hashed is None:
+            self._hashed = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        return self._hashed
+
+    def serve(self, request: HttpRequest) -> Optional[HttpResponse]:
+        """Return a response for a static file, or ``None`` to pass through."""
+        if not self.root or not self.prefix or not request.path.startswith(self.prefix):
+            return None
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        name = request.path[len(self.prefix):]
+        path = os.path.realpath(os.path.join(self.root, name))
+        if not path.startswith(self.root + os.sep) or not os.path.isfile(path):
+            return None
+
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        encoding = None
+        for suffix, candidate in ENCODINGS:
+            accepted = accepts_brotli(request) if candidate == 'br' else bool(
+                re_accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+            )
+            if accepted and os.path.isfile(path + suffix):
+                path, encoding = path + suffix, candidate
+                break
+
+        stat = os.stat(path)
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+            # FileResponse names the encoded copy; the URL already names the file
+            response.headers.pop('Content-Disposition', None)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.headers['Last-Modified'] = http_date(stat.st_mtime)
+        if name in self.hashed_names:
+            response.headers['Cache-Control'] = f'public, max-age={get_static_max_age()}, immutable'
+        else:
+            response.headers['Cache-Control'] = f'public, max-age={SHORT_MAX_AGE}'
+        if name.endswith(COMPRESSIBLE_EXTENSIONS):
+            patch_vary_headers(response, ('Accept-Encoding',))
+        return response
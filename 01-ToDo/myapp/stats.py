@@ -0,0 +1,206 @@
+"""
+Task statistics for the dashboard and list pages.
+
+Two strategies are available:
+
+* By default a single conditional aggregate computes all counts in one
+  query (one table scan instead of three).
+* With ``TASK_STATS_COUNTERS = True`` the counts are read from the
+  denormalized ``TaskStats`` row, which is adjusted in the same transaction
+  as every task insert, delete and completion change.  Reads become O(1).
+
+Counts are per task owner (``user_id``; ``None`` for tasks without one) and
+the counter rows live on the owner's shard, next to their tasks.
+
+Every write to an owner's tasks also stamps the row's ``updated_at``, which
+the HTTP validators (``myapp.conditional``) read instead of aggregating the
+task table; this costs one single-row ``UPDATE`` per write transaction.
+
+Code paths that bypass model signals (``bulk_create``, ``QuerySet.update``,
+``QuerySet._raw_delete``) must call :func:`adjust` themselves, with no
+deltas for writes that change no count; ``QuerySet.toggle_completed``
+pairs with :func:`adjust_toggled`.
+"""
+
+from typing import Dict, Iterable, Optional, Union
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Func, Q, QuerySet, Subquery
+from django.utils import timezone
+
+from .models import Task, TaskStats
+from .replicas import read_alias
+from .sharding import deleted_with_owner, shard_for_user
+
+
+def counters_enabled() -> bool:
+    """Whether the incrementally maintained counter row is in use."""
+    return getattr(settings, 'TASK_STATS_COUNTERS', False)
+
+
+def counter_row(user_id: Optional[int] = None, using: Optional[str] = None) -> QuerySet:
+    """
+    The counter row of ``user_id``, on their shard unless ``using`` says otherwise.
+
+    Without ``using``, reads may go to a replica (see ``myapp.replicas``).
+    """
+    return TaskStats.objects.using(using or read_alias(shard_for_user(user_id))).filter(
+        owner=TaskStats.ANONYMOUS if user_id is None else user_id
+    )
+
+
+def aggregate_stats(queryset: Optional[QuerySet] = None) -> Dict[str, int]:
+    """
+    Compute total/completed/pending with a single aggregate query.
+
+    ``queryset`` defaults to the tasks without an owner.
+    """
+    if queryset is None:
+        queryset = Task.objects.owned_by(None)
+    counts = queryset.aggregate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(completed=True)),
+    )
+    counts['pending'] = counts['total'] - counts['completed']
+    return counts
+
+
+def owner_counts(using: str) -> Dict[Optional[int], Dict[str, int]]:
+    """Actual ``{'total', 'completed'}`` of every owner on shard ``using``, in one query."""
+    rows = Task.objects.using(using).order_by().values_list('user_id').annotate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(completed=True)),
+    )
+    return {user_id: {'total': total, 'completed': completed} for user_id, total, completed in rows}
+
+
+def get_task_stats(user_id: Optional[int] = None) -> Dict[str, int]:
+    """
+    Return ``{'total': ..., 'completed': ..., 'pending': ...}`` for the
+    tasks of ``user_id``.
+
+    Reads the counter row when counters are enabled, falling back to a
+    rebuild if the row is missing.
+    """
+    if not counters_enabled():
+        return aggregate_stats(Task.objects.owned_by(user_id))
+
+    row = counter_row(user_id).first()
+    if row is None:
+        row = rebuild(user_id)
+    return {'total': row.total, 'completed': row.completed, 'pending': row.pending}
+
+
+async def aget_task_stats(user_id: Optional[int] = None) -> Dict[str, int]:
+    """Async version of :func:`get_task_stats` for use in async views."""
+    if counters_enabled():
+        row = await counter_row(user_id).afirst()
+        if row is not None:
+            return {'total': row.total, 'completed': row.completed, 'pending': row.pending}
+        row = await sync_to_async(rebuild)(user_id)
+        return {'total': row.total, 'completed': row.completed, 'pending': row.pending}
+
+    counts = await Task.objects.owned_by(user_id).aaggregate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(completed=True)),
+    )
+    counts['pending'] = counts['total'] - counts['completed']
+    return counts
+
+
+def adjust(total: int = 0, completed: int = 0, deleted: int = 0,
+           user_id: Optional[int] = None, using: Optional[str] = None) -> None:
+    """
+    Apply a delta to the counter row of ``user_id`` with a single atomic ``UPDATE``.
+
+    ``total``/``completed`` are ignored when counters are disabled;
+    ``deleted`` (number of tasks removed) always advances the delete
+    sequence, and every call stamps ``updated_at``, both used by the HTTP
+    validators.  Call inside the same transaction as the task write, on the
+    same database (``using``, default: the owner's shard), so the counters
+    can never drift from the data.
+    """
+    values = {'updated_at': timezone.now()}
+    if counters_enabled():
+        if total:
+            values['total'] = F('total') + total
+        if completed:
+            values['completed'] = F('completed') + completed
+    if deleted:
+        values['delete_seq'] = F('delete_seq') + deleted
+        values['deleted_at'] = values['updated_at']
+
+    updated = counter_row(user_id, using or shard_for_user(user_id)).update(**values)
+    if not updated:
+        # Row missing: the rebuild below already reflects this write
+        row = rebuild(user_id, using)
+        if deleted:
+            TaskStats.objects.using(row._state.db).filter(pk=row.pk).update(
+                delete_seq=F('delete_seq') + deleted, deleted_at=timezone.now()
+            )
+
+
+def adjust_toggled(pk: Union[int, Iterable[int]], user_id: Optional[int] = None) -> None:
+    """
+    Count completion flips of task ``pk`` (or of each task in a list of
+    ``pk``) that have already been written.
+
+    The directions are read from the task rows inside the counter
+    ``UPDATE`` itself, so toggles cost no extra round trip to find out
+    which way they went.  Stamps ``updated_at`` also when counters are
+    disabled.  Call in the same transaction as the toggle.
+    """
+    pks = [pk] if isinstance(pk, int) else list(pk)
+    values = {'updated_at': timezone.now()}
+    if counters_enabled():
+        # Each flip counts +1 if the task is now completed, -1 otherwise
+        now_completed = Task.objects.filter(pk__in=pks, completed=True).order_by().values(
+            count=Func(F('pk'), function='COUNT')
+        )
+        values['completed'] = F('completed') + 2 * Subquery(now_completed) - len(pks)
+    updated = counter_row(user_id, shard_for_user(user_id)).update(**values)
+    if not updated:
+        rebuild(user_id)
+
+
+def rebuild(user_id: Optional[int] = None, using: Optional[str] = None) -> TaskStats:
+    """
+    Recompute the counter row of ``user_id`` from the task table.
+
+    The row is locked for the duration so concurrent adjustments queue
+    behind the rebuild instead of being overwritten by it.
+    """
+    using = using or shard_for_user(user_id)
+    with transaction.atomic(using=using):
+        row, _ = TaskStats.objects.using(using).select_for_update().get_or_create(
+            owner=TaskStats.ANONYMOUS if user_id is None else user_id
+        )
+        counts = aggregate_stats(Task.objects.using(using).filter(user_id=user_id))
+        row.total = counts['total']
+        row.completed = counts['completed']
+        row.updated_at = timezone.now()
+        row.save(update_fields=['total', 'completed', 'updated_at'])
+    return row
+
+
+def task_saved(sender, instance: Task, created: bool, using: str, **kwargs) -> None:
+    """``post_save`` handler: count inserts and completion changes, stamp every save."""
+    previous = getattr(instance, '_loaded_completed', None)
+    instance._loaded_completed = instance.completed
+
+    if created:
+        adjust(total=1, completed=int(instance.completed), user_id=instance.user_id, using=using)
+    elif previous is not None and previous != instance.completed:
+        adjust(completed=1 if instance.completed else -1, user_id=instance.user_id, using=using)
+    else:
+        adjust(user_id=instance.user_id, using=using)
+
+
+def task_deleted(sender, instance: Task, using: str, **kwargs) -> None:
+    """``post_delete`` handler: count deletions."""
+    if deleted_with_owner(kwargs.get('origin')):
+        return
+    completed = getattr(instance, '_loaded_completed', instance.completed)
+    adjust(total=-1, completed=-int(bool(completed)), deleted=1, user_id=instance.user_id, using=using)
@@ -1,12 +1,45 @@
 # myapp/tests.py
 
-from django.test import TestCase, Client
-from django.urls import reverse
+import csv
+import importlib
+import gzip
+import json
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections, router
+from django.http import HttpResponse
+from asgiref.sync import iscoroutinefunction
+from django.test import AsyncClient, TestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
+from io import StringIO
 from typing import Dict, Any
+from unittest import mock, skipUnless
 from time import sleep  # Add this import
-from .models import Task
+from . import api, views
+from .admin import CURSOR_VAR, estimated_count
+from .cache import LRUFileBasedCache
+from .compression import brotli_available
+from .instrumentation import RequestMetricsMiddleware, get_sample_rate, get_server_timing
+from .batch import apply_batch
+from .models import ArchivedTask, Task, TaskQuerySet, TaskReminder, TaskStats, TaskTombstone, VersionConflict
+from .recurrence import Rule
+from .reminders import BaseReminderBackend, ReminderScheduler
+from .search import check_search_backend
+from .replicas import STICKY_COOKIE
+from .sharding import SHARD_ID_SPAN, jump_hash, shard_for_user
+from .stats import aggregate_stats, get_task_stats, rebuild as rebuild_task_stats
 
 
 class TaskModelTestCase(TestCase):
@@ -282,4 +315,2113 @@ class TaskURLTestCase(TestCase):
     def test_task_delete_url_resolves(self) -> None:
         """Test that task delete URL resolves."""
         url = reverse('task_delete', kwargs={'pk': self.task.pk})
-        self.assertEqual(url, f'/tasks/{self.task.pk}/delete/')
\ No newline at end of file
+        self.assertEqual(url, f'/tasks/{self.task.pk}/delete/')
+
+
+@override_settings(TASK_LIST_PAGE_SIZE=2)
+class TaskPaginationTestCase(TestCase):
+    """
+    Test cases for keyset (cursor) pagination of the task list.
+    """
+    
+    def setUp(self) -> None:
+        """Create five tasks; several may share a created_at timestamp."""
+        self.tasks = [Task.objects.create(title=f'Task {i}') for i in range(5)]
+        # Newest first, id as tiebreaker
+        self.expected = sorted(
+            self.tasks, key=lambda t: (t.created_at, t.pk), reverse=True
+        )
+    
+    def test_walk_forward_and_back(self) -> None:
+        """Following next then prev cursors visits every task exactly once."""
+        seen = []
+        cursor = None
+        pages = []
+        while True:
+            params = {'cursor': cursor} if cursor else {}
+            response = self.client.get(reverse('task_list'), params)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.context)
+            seen.extend(response.context['tasks'])
+            cursor = response.context['next_cursor']
+            if not cursor:
+                break
+        
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(pages), 3)
+        self.assertIsNone(pages[0]['prev_cursor'])
+        
+        # Step back from the last page to the middle one
+        response = self.client.get(
+            reverse('task_list'), {'cursor': pages[-1]['prev_cursor']}
+        )
+        self.assertEqual(list(response.context['tasks']), self.expected[2:4])
+    
+    def test_invalid_cursor_returns_400(self) -> None:
+        """A garbage cursor is rejected rather than raising a 500."""
+        response = self.client.get(reverse('task_list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_json_variant(self) -> None:
+        """The JSON list endpoint returns the same page and cursors."""
+        response = self.client.get(reverse('api_task_list'))
+        data = response.json()
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['id'] for item in data['results']],
+            [task.pk for task in self.expected[:2]],
+        )
+        self.assertIsNotNone(data['next_cursor'])
+        self.assertIsNone(data['prev_cursor'])
+        
+        response = self.client.get(
+            reverse('api_task_list'), {'cursor': data['next_cursor']}
+        )
+        self.assertEqual(
+            [item['id'] for item in response.json()['results']],
+            [task.pk for task in self.expected[2:4]],
+        )
+
+
+class TaskStatsTestCase(TestCase):
+    """
+    Test cases for dashboard statistics and the denormalized counters.
+    """
+    
+    def setUp(self) -> None:
+        """Create a mix of completed and pending tasks."""
+        Task.objects.create(title='Done', completed=True)
+        Task.objects.create(title='Pending 1')
+        Task.objects.create(title='Pending 2')
+    
+    def test_aggregate_uses_single_query(self) -> None:
+        """Without counters, all stats come from one aggregate query."""
+        with self.assertNumQueries(1):
+            stats = get_task_stats()
+        self.assertEqual(stats, {'total': 3, 'completed': 1, 'pending': 2})
+    
+    def test_home_view_stats(self) -> None:
+        """The home page shows the aggregated statistics."""
+        response = self.client.get(reverse('home'))
+        
+        self.assertEqual(response.context['total_tasks'], 3)
+        self.assertEqual(response.context['completed_tasks'], 1)
+        self.assertEqual(response.context['pending_tasks'], 2)
+    
+    @override_settings(TASK_STATS_COUNTERS=True)
+    def test_counters_follow_writes(self) -> None:
+        """Create, toggle, update and delete keep the counter row exact."""
+        rebuild_task_stats()
+        
+        self.client.post(reverse('task_create'), {'title': 'New', 'priority': 'low'})
+        new_task = Task.objects.get(title='New')
+        self.client.get(reverse('task_toggle_complete', kwargs={'pk': new_task.pk}))
+        pending = Task.objects.get(title='Pending 1')
+        self.client.post(
+            reverse('task_update', kwargs={'pk': pending.pk}),
+            {'title': 'Pending 1', 'priority': 'medium', 'completed': 'on'},
+        )
+        done = Task.objects.get(title='Done')
+        self.client.post(reverse('task_delete', kwargs={'pk': done.pk}))
+        
+        with self.assertNumQueries(1):
+            stats = get_task_stats()
+        self.assertEqual(stats, aggregate_stats())
+        self.assertEqual(stats, {'total': 3, 'completed': 2, 'pending': 1})
+    
+    @override_settings(TASK_STATS_COUNTERS=True)
+    def test_rebuild_command(self) -> None:
+        """The management command detects drift and repairs it."""
+        TaskStats.objects.filter(owner=TaskStats.ANONYMOUS).update(total=99)
+        
+        with self.assertRaises(CommandError):
+            call_command('rebuild_task_stats', '--verify-only', stdout=StringIO())
+        
+        call_command('rebuild_task_stats', stdout=StringIO())
+        call_command('rebuild_task_stats', '--verify-only', stdout=StringIO())
+        self.assertEqual(TaskStats.objects.get().total, 3)
+
+
+class ExplainCommandTestCase(TestCase):
+    """
+    Test cases for the ``explain`` management command.
+    """
+    
+    def test_views_avoid_full_scans(self) -> None:
+        """Every view query is served by an index on the test database."""
+        for i in range(3):
+            Task.objects.create(title=f'Task {i}')
+        out = StringIO()
+        
+        call_command('explain', '--fail-on-scan', stdout=out)
+        
+        output = out.getvalue()
+        self.assertIn('== task_list', output)
+        self.assertIn('task_user_created_id_idx', output)
+
+
+class TaskBatchAPITestCase(TestCase):
+    """
+    Test cases for the batch mutation endpoint.
+    """
+    
+    def setUp(self) -> None:
+        """Create tasks for the batch to operate on."""
+        self.keep = Task.objects.create(title='Keep')
+        self.toggle = Task.objects.create(title='Toggle')
+        self.remove = Task.objects.create(title='Remove', completed=True)
+        self.url = reverse('api_task_batch')
+    
+    def post(self, body: Any):
+        return self.client.post(self.url, data=body, content_type='application/json')
+    
+    def test_mixed_operations(self) -> None:
+        """All operation types apply and report per-item results."""
+        response = self.post({'operations': [
+            {'op': 'create', 'data': {'title': 'New', 'priority': 'high'}},
+            {'op': 'update', 'id': self.keep.pk, 'data': {'description': 'Edited'}},
+            {'op': 'toggle', 'id': self.toggle.pk},
+            {'op': 'delete', 'id': self.remove.pk},
+            {'op': 'create', 'data': {'title': 'x' * 201}},
+            {'op': 'update', 'id': 99999, 'data': {}},
+        ]})
+        results = response.json()['results']
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [r['status'] for r in results],
+            ['ok', 'ok', 'ok', 'ok', 'error', 'error'],
+        )
+        self.assertIn('title', results[4]['errors'])
+        self.assertEqual(Task.objects.get(pk=results[0]['id']).priority, 'high')
+        self.keep.refresh_from_db()
+        self.assertEqual(self.keep.description, 'Edited')
+        self.toggle.refresh_from_db()
+        self.assertTrue(self.toggle.completed)
+        self.assertFalse(Task.objects.filter(pk=self.remove.pk).exists())
+    
+    def test_query_count_independent_of_batch_size(self) -> None:
+        """A batch costs a fixed number of queries, not one per item."""
+        def batch(n: int, priority: str) -> list:
+            return [{'op': 'create', 'data': {'title': f'T{i}'}} for i in range(n)] + [
+                {'op': 'toggle', 'id': self.keep.pk},
+                {'op': 'update', 'id': self.toggle.pk, 'data': {'priority': priority}},
+            ]
+        
+        with CaptureQueriesContext(connection) as small:
+            self.post(batch(2, 'low'))
+        # 90 rows stay within one INSERT under SQLite's 999 parameter limit
+        with CaptureQueriesContext(connection) as large:
+            self.post(batch(90, 'high'))
+        
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(Task.objects.count(), 3 + 92)
+    
+    def test_writes_require_csrf_token(self) -> None:
+        """Session-authenticated writes are refused without the CSRF token."""
+        client = Client(enforce_csrf_checks=True)
+        body = json.dumps([{'op': 'toggle', 'id': self.keep.pk}])
+        toggle_url = reverse('api_task_toggle', kwargs={'pk': self.keep.pk})
+        
+        self.assertEqual(client.post(self.url, body, content_type='application/json').status_code, 403)
+        self.assertEqual(client.post(toggle_url).status_code, 403)
+        
+        token = client.get(reverse('api_task_list')).cookies['csrftoken'].value
+        response = client.post(self.url, body, content_type='application/json', HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.post(toggle_url, HTTP_X_CSRFTOKEN=token).status_code, 200)
+    
+    def test_atomic_batch_rolls_back_on_error(self) -> None:
+        """With atomic=true, one bad item means nothing is written."""
+        response = self.post({'atomic': True, 'operations': [
+            {'op': 'create', 'data': {'title': 'New'}},
+            {'op': 'create', 'data': {'title': 'Bad', 'priority': 'urgent'}},
+        ]})
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [r['status'] for r in response.json()['results']], ['skipped', 'error']
+        )
+        self.assertFalse(Task.objects.filter(title='New').exists())
+    
+    @override_settings(TASK_STATS_COUNTERS=True)
+    def test_batch_keeps_counters_exact(self) -> None:
+        """Bulk writes adjust the denormalized counters."""
+        rebuild_task_stats()
+        self.post([
+            {'op': 'create', 'data': {'title': 'A', 'completed': True}},
+            {'op': 'create', 'data': {'title': 'B'}},
+            {'op': 'toggle', 'id': self.toggle.pk},
+            {'op': 'toggle', 'id': self.keep.pk},
+            {'op': 'update', 'id': self.keep.pk, 'data': {'title': 'Kept'}},
+            {'op': 'toggle', 'id': self.remove.pk},
+            {'op': 'delete', 'id': self.remove.pk},
+        ])
+        
+        self.assertEqual(get_task_stats(), aggregate_stats())
+    
+    def test_stale_version_is_a_conflict(self) -> None:
+        """Items based on an outdated version are reported and not applied."""
+        seen = self.keep.version
+        first = self.post([{'op': 'update', 'id': self.keep.pk, 'version': seen,
+                            'data': {'title': 'Renamed'}}])
+        self.assertEqual(first.json()['results'][0]['task']['version'], seen + 1)
+        
+        response = self.post([
+            {'op': 'toggle', 'id': self.keep.pk, 'version': seen},
+            {'op': 'toggle', 'id': self.toggle.pk, 'version': self.toggle.version},
+            {'op': 'delete', 'id': self.remove.pk, 'version': 'x'},
+        ])
+        results = response.json()['results']
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['status'] for r in results], ['conflict', 'ok', 'error'])
+        self.assertEqual(results[0]['version'], seen + 1)
+        self.keep.refresh_from_db()
+        self.assertFalse(self.keep.completed)
+        self.assertEqual(self.keep.title, 'Renamed')
+        
+        atomic = self.post({'atomic': True, 'operations': [
+            {'op': 'update', 'id': self.keep.pk, 'version': seen, 'data': {'priority': 'low'}},
+        ]})
+        self.assertEqual(atomic.status_code, 409)
+    
+    @override_settings(TASK_STATS_COUNTERS=True)
+    def test_interleaved_batches_keep_both_writes(self) -> None:
+        """A batch that commits between another's read and write loses nothing."""
+        rebuild_task_stats()
+        in_bulk = TaskQuerySet.in_bulk
+        interleaved = []
+        
+        def read_then_interleave(queryset, *args, **kwargs):
+            rows = in_bulk(queryset, *args, **kwargs)
+            if not interleaved:
+                interleaved.append(queryset)
+                apply_batch([
+                    {'op': 'toggle', 'id': self.toggle.pk},
+                    {'op': 'update', 'id': self.keep.pk, 'data': {'priority': 'high'}},
+                ])
+            return rows
+        
+        with mock.patch.object(TaskQuerySet, 'in_bulk', read_then_interleave):
+            outcome = apply_batch([
+                {'op': 'toggle', 'id': self.toggle.pk},
+                {'op': 'update', 'id': self.keep.pk, 'data': {'title': 'Renamed'}},
+                {'op': 'update', 'id': self.remove.pk, 'data': {'priority': 'low'}},
+            ])
+        
+        self.toggle.refresh_from_db()
+        self.assertFalse(self.toggle.completed)
+        self.assertEqual(self.toggle.version, 3)
+        self.assertFalse(outcome.results[0]['task']['completed'])
+        self.keep.refresh_from_db()
+        self.assertEqual((self.keep.title, self.keep.priority), ('Renamed', 'high'))
+        self.assertEqual(get_task_stats(), aggregate_stats())
+    
+    def test_writes_only_changed_fields(self) -> None:
+        """Each task writes its own changed columns; toggles flip in SQL."""
+        with CaptureQueriesContext(connection) as ctx:
+            self.post([
+                {'op': 'update', 'id': self.keep.pk, 'data': {'title': 'Keep', 'description': 'New'}},
+                {'op': 'toggle', 'id': self.toggle.pk},
+            ])
+        writes = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "myapp_task"')]
+        
+        self.assertEqual(len(writes), 2)
+        self.assertIn('"description" = CASE', writes[1])
+        self.assertNotIn('"title"', writes[1])
+        self.assertNotIn('"priority"', writes[1])
+        self.assertIn('"completed" = CASE WHEN ("myapp_task"."completed")', writes[0])
+    
+    def test_malformed_body(self) -> None:
+        """Non-JSON or non-list bodies are rejected with 400."""
+        response = self.client.post(self.url, data='nope', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post({'operations': 'x'}).status_code, 400)
+
+
+class TaskExportTestCase(TestCase):
+    """
+    Test cases for streaming CSV/NDJSON export.
+    """
+    
+    def setUp(self) -> None:
+        """Create tasks with different priorities and states."""
+        Task.objects.create(title='High done', priority='high', completed=True)
+        Task.objects.create(title='High open', priority='high',
+                            description='Line one\nline two')
+        Task.objects.create(title='Low open', priority='low')
+    
+    def test_csv_export_streams_all_rows(self) -> None:
+        """CSV export is a streaming response with a header and every task."""
+        response = self.client.get(reverse('api_task_export'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(
+            StringIO(b''.join(response.streaming_content).decode())
+        ))
+        self.assertEqual([row['title'] for row in rows], ['High done', 'High open', 'Low open'])
+        self.assertEqual(rows[1]['description'], 'Line one\nline two')
+    
+    def test_ndjson_export_with_filters(self) -> None:
+        """Filters on priority and completion narrow the export."""
+        response = self.client.get(reverse('api_task_export'), {
+            'format': 'ndjson', 'priority': 'high', 'completed': 'false',
+        })
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([json.loads(line)['title'] for line in lines], ['High open'])
+    
+    def test_invalid_filter_returns_400(self) -> None:
+        """Bad filter values are rejected up front."""
+        response = self.client.get(reverse('api_task_export'), {'priority': 'urgent'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_export_command(self) -> None:
+        """The management command writes the same rows to stdout."""
+        out = StringIO()
+        call_command('export_tasks', '--format', 'ndjson', '--priority', 'low', stdout=out)
+        
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([record['title'] for record in records], ['Low open'])
+
+
+class TaskImportTestCase(TestCase):
+    """
+    Test cases for the ``import_tasks`` management command.
+    """
+    
+    def setUp(self) -> None:
+        """Create a scratch directory for input and sidecar files."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+    
+    def write(self, name: str, content: str) -> str:
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(content)
+        return path
+    
+    def test_csv_import_in_batches_with_rejects(self) -> None:
+        """Valid rows are inserted; invalid rows land in the sidecar file."""
+        path = self.write('tasks.csv', (
+            'title,description,priority,completed,due_date\n'
+            'One,,high,True,2030-01-01T09:00:00\n'
+            'Two,Desc,low,,\n'
+            ',,medium,,\n'
+            'Three,,urgent,,\n'
+            'Four,,,,not-a-date\n'
+            'Five,,,False,\n'
+        ))
+        out = StringIO()
+        
+        call_command('import_tasks', path, '--batch-size', '2', stdout=out)
+        
+        self.assertEqual(
+            list(Task.objects.order_by('id').values_list('title', flat=True)),
+            ['One', 'Two', 'Five'],
+        )
+        one = Task.objects.get(title='One')
+        self.assertTrue(one.completed)
+        self.assertEqual(one.priority, 'high')
+        self.assertIsNotNone(one.due_date)
+        self.assertIsNone(Task.objects.get(title='Two').due_date)
+        self.assertIn('rows/s', out.getvalue())
+        
+        with open(f'{path}.rejected.ndjson', encoding='utf-8') as handle:
+            rejects = [json.loads(line) for line in handle]
+        self.assertEqual([r['line'] for r in rejects], [4, 5, 6])
+        self.assertIn('title', rejects[0]['errors'])
+        self.assertIn('priority', rejects[1]['errors'])
+        self.assertIn('due_date', rejects[2]['errors'])
+    
+    def test_ndjson_round_trip_from_export(self) -> None:
+        """An NDJSON export can be imported back unchanged."""
+        Task.objects.create(title='Exported', priority='low', completed=True)
+        out = StringIO()
+        call_command('export_tasks', '--format', 'ndjson', stdout=out)
+        path = self.write('tasks.ndjson', out.getvalue() + 'not json\n')
+        
+        call_command('import_tasks', path, stdout=StringIO())
+        
+        copies = Task.objects.filter(title='Exported')
+        self.assertEqual(copies.count(), 2)
+        self.assertTrue(all(task.completed for task in copies))
+        self.assertTrue(os.path.exists(f'{path}.rejected.ndjson'))
+    
+    def test_stdin_rejects_go_to_stderr(self) -> None:
+        """Rejects of piped input are written to stderr and counted."""
+        records = '{"title": "Piped"}\n{"title": ""}\nnot json\n'
+        out, err = StringIO(), StringIO()
+        
+        with mock.patch('sys.stdin', StringIO(records)):
+            call_command('import_tasks', '-', '--format', 'ndjson', stdout=out, stderr=err)
+        
+        self.assertTrue(Task.objects.filter(title='Piped').exists())
+        rejects = [json.loads(line) for line in err.getvalue().splitlines()]
+        self.assertEqual([r['line'] for r in rejects], [2, 3])
+        self.assertIn('Rejected 2 records; see stderr', out.getvalue())
+    
+    def test_csv_round_trip_keeps_recurrence(self) -> None:
+        """Repeat rules survive a CSV export and import; invalid rules are rejected."""
+        Task.objects.create(title='Weekly', due_date=timezone.now(),
+                            recurrence='FREQ=WEEKLY;BYDAY=MO,TH')
+        Task.objects.create(title='Once')
+        out = StringIO()
+        call_command('export_tasks', stdout=out)
+        header = out.getvalue().splitlines()[0].split(',')
+        self.assertIn('recurrence', header)
+        bad = dict.fromkeys(header, '')
+        bad.update(title='Bad rule', priority='medium', recurrence='fortnightly')
+        path = self.write('tasks.csv', out.getvalue() + ','.join(bad.values()) + '\n')
+        
+        call_command('import_tasks', path, stdout=StringIO())
+        
+        self.assertEqual(
+            list(Task.objects.filter(title='Weekly').values_list('recurrence', flat=True)),
+            ['FREQ=WEEKLY;BYDAY=MO,TH'] * 2,
+        )
+        self.assertEqual(
+            list(Task.objects.filter(title='Once').values_list('recurrence', flat=True)),
+            ['', ''],
+        )
+        self.assertFalse(Task.objects.filter(title='Bad rule').exists())
+        with open(f'{path}.rejected.ndjson', encoding='utf-8') as handle:
+            self.assertIn('recurrence', json.loads(handle.readline())['errors'])
+
+
+class TaskRowCacheTestCase(TestCase):
+    """
+    Test cases for per-row fragment caching of the task list.
+    """
+    
+    def setUp(self) -> None:
+        """Start each test with an empty row cache."""
+        caches['task_rows'].clear()
+        self.task = Task.objects.create(title='Cached Task')
+    
+    def test_rows_are_cached_by_pk_and_updated_at(self) -> None:
+        """Rendering the list stores each row under (pk, updated_at, overdue)."""
+        self.client.get(reverse('task_list'))
+        
+        key = make_template_fragment_key(
+            'task_row', [self.task.pk, self.task.updated_at, False]
+        )
+        self.assertIn('Cached Task', caches['task_rows'].get(key))
+    
+    def test_edit_invalidates_row(self) -> None:
+        """Saving a task changes updated_at, so the stale row is not reused."""
+        self.client.get(reverse('task_list'))
+        self.client.post(
+            reverse('task_update', kwargs={'pk': self.task.pk}),
+            {'title': 'Renamed Task', 'priority': 'medium'},
+        )
+        
+        response = self.client.get(reverse('task_list'))
+        self.assertContains(response, 'Renamed Task')
+        self.assertNotContains(response, 'Cached Task')
+    
+    def test_file_cache_evicts_least_recently_used(self) -> None:
+        """The file backend culls the oldest-used entries first."""
+        with tempfile.TemporaryDirectory() as location:
+            cache = LRUFileBasedCache(
+                location, {'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_FREQUENCY': 3}}
+            )
+            for age, key in enumerate(['a', 'b', 'c']):
+                cache.set(key, key)
+                os.utime(cache._key_to_file(key), (100 + age, 100 + age))
+            
+            self.assertEqual(cache.get('a'), 'a')  # 'a' becomes most recent
+            cache.set('d', 'd')  # Triggers a cull of one entry
+            
+            self.assertIsNone(cache.get('b'))
+            self.assertEqual(cache.get('a'), 'a')
+            self.assertEqual(cache.get('d'), 'd')
+
+
+class ConditionalGetTestCase(TestCase):
+    """
+    Test cases for ETag / Last-Modified handling on list and dashboard pages.
+    """
+    
+    def setUp(self) -> None:
+        """Create a couple of tasks."""
+        self.task = Task.objects.create(title='First')
+        Task.objects.create(title='Second')
+    
+    def test_matching_etag_returns_304_without_rendering(self) -> None:
+        """A repeated poll is answered before the list query and template."""
+        for name in ('home', 'task_list', 'api_task_list'):
+            first = self.client.get(reverse(name))
+            self.assertEqual(first.status_code, 200)
+            self.assertIn('ETag', first)
+            self.assertIn('no-cache', first['Cache-Control'])
+            
+            # The counter row, with the overdue moment as a subquery
+            with self.assertNumQueries(1):
+                second = self.client.get(reverse(name), HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(second.status_code, 304)
+            self.assertEqual(second.content, b'')
+    
+    def test_if_modified_since(self) -> None:
+        """Last-Modified alone is enough to get a 304."""
+        first = self.client.get(reverse('task_list'))
+        second = self.client.get(
+            reverse('task_list'), HTTP_IF_MODIFIED_SINCE=first['Last-Modified']
+        )
+        self.assertEqual(second.status_code, 304)
+    
+    def test_validators_change_on_edit_and_delete(self) -> None:
+        """Edits and deletions both produce a new ETag."""
+        etag = self.client.get(reverse('task_list'))['ETag']
+        
+        self.client.get(reverse('task_toggle_complete', kwargs={'pk': self.task.pk}))
+        response = self.client.get(reverse('task_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        
+        self.client.post(reverse('task_delete', kwargs={'pk': self.task.pk}))
+        response = self.client.get(reverse('task_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(TaskStats.objects.get().delete_seq, 1)
+    
+    def test_validators_change_on_field_edit(self) -> None:
+        """An edit that changes no count still stamps the row and changes the ETag."""
+        etag = self.client.get(reverse('task_list'))['ETag']
+        self.task.title = 'Renamed'
+        self.task.save()
+        response = self.client.get(reverse('task_list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Renamed')
+    
+    @override_settings(TASK_STATS_COUNTERS=True)
+    def test_view_reuses_validator_counts(self) -> None:
+        """With counters on, pages take their numbers from the row the validators read."""
+        rebuild_task_stats()
+        with mock.patch('myapp.conditional.get_task_stats') as get_stats:
+            response = self.client.get(reverse('home'))
+        get_stats.assert_not_called()
+        self.assertEqual(response.context['total_tasks'], 2)
+        self.assertEqual(response.context['pending_tasks'], 2)
+    
+    def test_etag_varies_with_cursor(self) -> None:
+        """Different pages of the list have different validators."""
+        with self.settings(TASK_LIST_PAGE_SIZE=1):
+            first = self.client.get(reverse('task_list'))
+            second = self.client.get(
+                reverse('task_list'), {'cursor': first.context['next_cursor']}
+            )
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+
+class TaskOverdueTestCase(TestCase):
+    """
+    Test cases for database-side overdue filtering and the overdue view.
+    """
+    
+    def setUp(self) -> None:
+        """Create tasks on both sides of the overdue predicate."""
+        now = timezone.now()
+        self.very_late = Task.objects.create(title='Very late', due_date=now - timedelta(days=3))
+        self.late = Task.objects.create(title='Late', due_date=now - timedelta(hours=1))
+        Task.objects.create(title='Done late', due_date=now - timedelta(days=1), completed=True)
+        Task.objects.create(title='Future', due_date=now + timedelta(days=1))
+        Task.objects.create(title='No due date')
+    
+    def test_overdue_queryset_matches_is_overdue(self) -> None:
+        """The SQL predicate agrees with the Python method."""
+        overdue = set(Task.objects.overdue())
+        expected = {task for task in Task.objects.all() if task.is_overdue()}
+        
+        self.assertEqual(overdue, expected)
+        self.assertEqual(overdue, {self.very_late, self.late})
+    
+    def test_annotate_overdue(self) -> None:
+        """annotate_overdue adds the flag to every row, in one query."""
+        with self.assertNumQueries(1):
+            flags = {task.title: task.overdue for task in Task.objects.annotate_overdue()}
+        
+        self.assertEqual(flags, {
+            'Very late': True, 'Late': True, 'Done late': False,
+            'Future': False, 'No due date': False,
+        })
+    
+    def test_overdue_view(self) -> None:
+        """The overdue page lists only overdue tasks, most overdue first."""
+        response = self.client.get(reverse('task_overdue'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['tasks']), [self.very_late, self.late])
+        self.assertContains(response, '(overdue)', count=2)
+    
+    def test_etag_changes_when_task_becomes_overdue(self) -> None:
+        """Crossing a due date changes the validators without any write."""
+        first = self.client.get(reverse('task_list'))
+        with mock.patch('django.utils.timezone.now',
+                        return_value=timezone.now() + timedelta(days=2)):
+            second = self.client.get(reverse('task_list'), HTTP_IF_NONE_MATCH=first['ETag'])
+        
+        self.assertEqual(second.status_code, 200)
+        self.assertContains(second, '(overdue)', count=3)
+
+
+class TaskJSONEndpointTestCase(TestCase):
+    """
+    Test cases for the single-task JSON endpoints.
+    """
+    
+    def setUp(self) -> None:
+        """Create a task to read and toggle."""
+        self.task = Task.objects.create(title='JSON Task')
+    
+    def test_detail(self) -> None:
+        """The detail endpoint returns the serialized task or 404."""
+        response = self.client.get(reverse('api_task_detail', kwargs={'pk': self.task.pk}))
+        self.assertEqual(response.json()['title'], 'JSON Task')
+        
+        response = self.client.get(reverse('api_task_detail', kwargs={'pk': 99999}))
+        self.assertEqual(response.status_code, 404)
+    
+    def test_toggle(self) -> None:
+        """Toggling flips completion and returns the new state."""
+        response = self.client.post(reverse('api_task_toggle', kwargs={'pk': self.task.pk}))
+        self.assertTrue(response.json()['completed'])
+
+
+@override_settings(ROOT_URLCONF='myproject.asgi_urls')
+class AsyncViewTestCase(TestCase):
+    """
+    Test cases for the async views served under ASGI.
+    """
+    
+    def setUp(self) -> None:
+        """Create a few tasks."""
+        self.tasks = [Task.objects.create(title=f'Async {i}') for i in range(3)]
+        self.async_client = AsyncClient()
+    
+    def test_routes_resolve_to_async_views(self) -> None:
+        """The ASGI URLconf points the hot paths at coroutine views."""
+        for path in ('/', '/tasks/', '/api/tasks/', f'/api/tasks/{self.tasks[0].pk}'):
+            self.assertTrue(iscoroutinefunction(resolve(path).func), path)
+        # Everything else falls through to the sync patterns
+        self.assertEqual(resolve('/tasks/create/').func, views.task_create)
+    
+    async def test_home_and_list(self) -> None:
+        """Async pages render the same context as the sync ones."""
+        response = await self.async_client.get('/')
+        self.assertEqual(response.context['total_tasks'], 3)
+        
+        with self.settings(TASK_LIST_PAGE_SIZE=2):
+            response = await self.async_client.get('/tasks/')
+        self.assertEqual(len(response.context['tasks']), 2)
+        self.assertIsNotNone(response.context['next_cursor'])
+        
+        etag = response['ETag']
+        with self.settings(TASK_LIST_PAGE_SIZE=2):
+            response = await self.async_client.get('/tasks/', headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+    
+    async def test_json_endpoints(self) -> None:
+        """List, detail and toggle work through the async ORM."""
+        response = await self.async_client.get('/api/tasks/')
+        self.assertEqual(len(response.json()['results']), 3)
+        
+        pk = self.tasks[0].pk
+        response = await self.async_client.get(f'/api/tasks/{pk}')
+        self.assertEqual(response.json()['title'], 'Async 0')
+        
+        response = await self.async_client.post(f'/api/tasks/{pk}/toggle')
+        self.assertTrue(response.json()['completed'])
+        self.assertTrue((await Task.objects.aget(pk=pk)).completed)
+        
+        response = await self.async_client.post('/api/tasks/99999/toggle')
+        self.assertEqual(response.status_code, 404)
+    
+    async def test_toggle_requires_csrf_token(self) -> None:
+        """The async toggle is CSRF-protected like the sync one."""
+        client = AsyncClient(enforce_csrf_checks=True)
+        url = f'/api/tasks/{self.tasks[0].pk}/toggle'
+        response = await client.post(url)
+        self.assertEqual(response.status_code, 403)
+        
+        token = (await client.get('/api/tasks/')).cookies['csrftoken'].value
+        response = await client.post(url, headers={'x-csrftoken': token})
+        self.assertTrue(response.json()['completed'])
+
+
+class DatabaseProfileTestCase(TestCase):
+    """Test cases for the tuned SQLite connection settings."""
+    
+    def test_sqlite_pragmas_applied(self):
+        """Test that every new SQLite connection runs the tuning pragmas"""
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite profile only')
+        
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)  # MEMORY
+    
+    def test_sqlite_immediate_transactions(self):
+        """Test that writes take the lock at BEGIN instead of on first write"""
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite profile only')
+        
+        self.assertEqual(connection.settings_dict['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+
+
+class SeedTasksCommandTestCase(TestCase):
+    """Test cases for the seed_tasks management command."""
+    
+    def test_seed_creates_tasks_and_rebuilds_stats(self):
+        """Test that seeding inserts the requested rows and refreshes the counters"""
+        call_command('seed_tasks', 500, seed=1, stdout=StringIO())
+        
+        self.assertEqual(Task.objects.count(), 500)
+        row = TaskStats.objects.get(owner=TaskStats.ANONYMOUS)
+        self.assertEqual(row.total, 500)
+        self.assertEqual(row.completed, Task.objects.filter(completed=True).count())
+    
+    def test_seed_distributions(self):
+        """Test that priorities, completion and due dates are mixed"""
+        call_command('seed_tasks', 2000, seed=1, stdout=StringIO())
+        
+        priorities = set(Task.objects.values_list('priority', flat=True))
+        self.assertEqual(priorities, {'low', 'medium', 'high'})
+        completed = Task.objects.filter(completed=True).count()
+        self.assertTrue(0 < completed < 2000)
+        self.assertTrue(Task.objects.overdue().exists())
+        self.assertTrue(Task.objects.filter(due_date__isnull=True).exists())
+        for task in Task.objects.all()[:100]:
+            self.assertLessEqual(task.created_at, task.updated_at)
+            self.assertLessEqual(task.updated_at, timezone.now())
+    
+    def test_seed_creation_order_follows_ids(self):
+        """Test that newer ids have newer creation dates, like real data"""
+        call_command('seed_tasks', 300, seed=1, stdout=StringIO())
+        
+        created = list(Task.objects.order_by('id').values_list('created_at', flat=True))
+        self.assertEqual(created, sorted(created))
+    
+    def test_seed_clear(self):
+        """Test that --clear replaces existing tasks"""
+        Task.objects.create(title='Existing')
+        call_command('seed_tasks', 10, clear=True, stdout=StringIO())
+        
+        self.assertEqual(Task.objects.count(), 10)
+        self.assertFalse(Task.objects.filter(title='Existing').exists())
+    
+    def test_seed_rejects_negative_count(self):
+        """Test that a negative count is refused"""
+        with self.assertRaises(CommandError):
+            call_command('seed_tasks', -1, stdout=StringIO())
+
+
+@override_settings(REQUEST_METRICS_SAMPLE_RATE=1.0, REQUEST_METRICS_SERVER_TIMING=True)
+class RequestMetricsTestCase(TestCase):
+    """Test cases for the request metrics middleware."""
+    
+    def setUp(self):
+        """Create a few tasks."""
+        for i in range(5):
+            Task.objects.create(title=f'Metrics {i}')
+    
+    def parse_server_timing(self, header: str) -> Dict[str, Dict[str, str]]:
+        """Split a Server-Timing header into {name: {param: value}}."""
+        entries = {}
+        for entry in header.split(', '):
+            name, *params = entry.split(';')
+            entries[name] = dict(param.split('=', 1) for param in params)
+        return entries
+    
+    def test_server_timing_header(self):
+        """Test that DB, template, view and total timings are reported"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('task_list'))
+        
+        timing = self.parse_server_timing(response['Server-Timing'])
+        self.assertEqual(set(timing), {'db', 'tpl', 'view', 'total'})
+        self.assertEqual(timing['db']['desc'], f'"{len(queries)} queries"')
+        self.assertGreater(float(timing['tpl']['dur']), 0)
+        self.assertLessEqual(float(timing['view']['dur']), float(timing['total']['dur']))
+    
+    def test_json_endpoint_has_no_template_time(self):
+        """Test that views without templates report zero template time"""
+        response = self.client.get(reverse('api_task_list'))
+        
+        timing = self.parse_server_timing(response['Server-Timing'])
+        self.assertEqual(float(timing['tpl']['dur']), 0)
+    
+    def test_production_defaults(self):
+        """Test that outside DEBUG few requests are sampled and no header is sent"""
+        with override_settings(DEBUG=False):
+            del settings.REQUEST_METRICS_SAMPLE_RATE
+            del settings.REQUEST_METRICS_SERVER_TIMING
+            self.assertEqual(get_sample_rate(), 0.01)
+            self.assertFalse(get_server_timing())
+            with mock.patch('myapp.instrumentation.random.random', return_value=0.0):
+                response = self.client.get(reverse('home'))
+            self.assertNotIn('Server-Timing', response)
+        
+        with override_settings(DEBUG=True):
+            del settings.REQUEST_METRICS_SAMPLE_RATE
+            del settings.REQUEST_METRICS_SERVER_TIMING
+            self.assertEqual(get_sample_rate(), 1.0)
+            self.assertTrue(get_server_timing())
+    
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_measured(self):
+        """Test that requests outside the sample get no header"""
+        response = self.client.get(reverse('home'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+    
+    def test_structured_log_record(self):
+        """Test that each measured request is logged with its numbers"""
+        with self.assertLogs('myapp.metrics', level='INFO') as logs:
+            self.client.get(reverse('home'))
+        
+        record = logs.records[0].metrics
+        self.assertEqual(record['view'], 'home')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertIn('queries=', logs.records[0].getMessage())
+    
+    def test_duplicate_queries_flagged(self):
+        """Test that the same SQL repeated per row is reported as N+1"""
+        def n_plus_one(request):
+            for pk in Task.objects.values_list('pk', flat=True):
+                Task.objects.get(pk=pk)
+            return HttpResponse('ok')
+        
+        middleware = RequestMetricsMiddleware(n_plus_one)
+        request = RequestFactory().get('/n-plus-one/')
+        with self.assertLogs('myapp.metrics', level='WARNING') as logs:
+            response = middleware(request)
+        
+        self.assertIn('1 duplicated', response['Server-Timing'])
+        self.assertIn('duplicate query x5', logs.output[0])
+
+
+@override_settings(ROOT_URLCONF='myproject.asgi_urls')
+class AsyncRequestMetricsTestCase(TestCase):
+    """Test cases for the request metrics middleware under async views."""
+    
+    async def test_async_view_queries_counted(self):
+        """Test that queries issued through the async ORM are counted"""
+        await Task.objects.acreate(title='Async metrics')
+        response = await AsyncClient().get('/api/tasks/')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+
+class TaskSearchTestCase(TestCase):
+    """Test cases for full-text search."""
+    
+    def setUp(self):
+        """Create tasks with searchable words in titles and descriptions."""
+        self.title_match = Task.objects.create(title='Renew passport', description='Bring photos')
+        self.description_match = Task.objects.create(
+            title='Travel errands', description='Check the passport expiry date'
+        )
+        self.other = Task.objects.create(title='Buy groceries', description='Milk and eggs')
+    
+    def search_ids(self, query: str, **params) -> list:
+        """Return the ids returned by the JSON search endpoint, in order."""
+        response = self.client.get(reverse('api_task_search'), {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [task['id'] for task in response.json()['results']]
+    
+    def test_title_matches_rank_first(self):
+        """Test that a word in the title outranks the same word in the description"""
+        self.assertEqual(
+            self.search_ids('passport'), [self.title_match.pk, self.description_match.pk]
+        )
+    
+    def test_all_words_must_match_with_stemming(self):
+        """Test that every word is required and word forms are folded"""
+        self.assertEqual(self.search_ids('renewing passports'), [self.title_match.pk])
+        self.assertEqual(self.search_ids('passport milk'), [])
+    
+    def test_index_follows_writes(self):
+        """Test that edits, deletes and bulk inserts are reflected immediately"""
+        self.other.title = 'Buy passport cover'
+        self.other.save()
+        self.title_match.delete()
+        Task.objects.bulk_create([Task(title='Passport photos')])
+        Task.objects.filter(pk=self.description_match.pk).update(description='Nothing here')
+        
+        titles = [task.title for task in Task.objects.filter(pk__in=self.search_ids('passport'))]
+        self.assertCountEqual(titles, ['Buy passport cover', 'Passport photos'])
+    
+    def test_query_syntax_is_not_interpreted(self):
+        """Test that operators and quotes in user input are treated as words"""
+        for query in ['passport"', 'passport AND (', '*', 'NEAR(passport', "'; DROP TABLE"]:
+            response = self.client.get(reverse('api_task_search'), {'q': query})
+            self.assertEqual(response.status_code, 200, query)
+        self.assertEqual(self.search_ids(''), [])
+    
+    def test_pagination(self):
+        """Test that cursors walk the ranked results page by page"""
+        Task.objects.bulk_create([Task(title=f'Passport form {i}') for i in range(5)])
+        
+        with self.settings(TASK_LIST_PAGE_SIZE=3):
+            response = self.client.get(reverse('api_task_search'), {'q': 'passport'})
+            first = response.json()
+            self.assertEqual(len(first['results']), 3)
+            self.assertIsNone(first['prev_cursor'])
+            
+            second = self.client.get(
+                reverse('api_task_search'), {'q': 'passport', 'cursor': first['next_cursor']}
+            ).json()
+        ids = [task['id'] for task in first['results'] + second['results']]
+        self.assertEqual(len(set(ids)), 6)
+        self.assertEqual(second['prev_cursor'], '0')
+        
+        response = self.client.get(reverse('api_task_search'), {'q': 'passport', 'cursor': 'x'})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_rank_window_limits_ranked_matches(self):
+        """Test that only the newest matches are ranked when a window is set"""
+        with self.settings(TASK_SEARCH_RANK_WINDOW=1):
+            self.assertEqual(self.search_ids('passport'), [self.description_match.pk])
+            response = self.client.get(reverse('api_task_search'), {'q': 'passport'})
+            self.assertTrue(response.json()['truncated'])
+    
+    def test_unsupported_database_fails_system_check(self):
+        """Test that a database without a search index stops the project at startup"""
+        self.assertEqual(check_search_backend(), [])
+        with mock.patch.object(type(connections['default']), 'vendor', 'mysql'):
+            errors = check_search_backend()
+        self.assertEqual([error.id for error in errors], ['myapp.E001'])
+        self.assertIn('mysql', errors[0].msg)
+    
+    def test_every_match_ranked_by_default(self):
+        """Test that without a window no match is left out"""
+        response = self.client.get(reverse('api_task_search'), {'q': 'passport'})
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertFalse(response.json()['truncated'])
+    
+    def test_search_page(self):
+        """Test the HTML search page and its empty states"""
+        response = self.client.get(reverse('task_search'), {'q': 'passport'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Renew passport')
+        self.assertNotContains(response, 'Buy groceries')
+        
+        response = self.client.get(reverse('task_search'))
+        self.assertContains(response, 'Type a few words')
+    
+    def test_rebuild_command_restores_triggers(self):
+        """Test that the rebuild command reinstalls dropped triggers and reindexes"""
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite FTS5 only')
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER myapp_task_fts_ai')
+        Task.objects.create(title='Passport while unindexed')
+        self.assertEqual(len(self.search_ids('unindexed')), 0)
+        
+        call_command('rebuild_search_index', stdout=StringIO())
+        
+        self.assertEqual(len(self.search_ids('unindexed')), 1)
+        Task.objects.create(title='Passport after rebuild')
+        self.assertEqual(len(self.search_ids('rebuild')), 1)
+
+
+class TaskWritePathTestCase(TestCase):
+    """Test cases for single-statement toggles and versioned, field-scoped updates."""
+    
+    def setUp(self):
+        """Create a task to edit."""
+        self.task = Task.objects.create(title='Write path', priority='low')
+    
+    def form_data(self, **overrides) -> Dict[str, Any]:
+        """POST data for the edit form, as rendered from the current task."""
+        data = {'title': self.task.title, 'priority': self.task.priority, 'version': self.task.version}
+        data.update(overrides)
+        return data
+    
+    def test_toggle_is_one_update(self):
+        """Test that toggling issues a single UPDATE and no read of the task"""
+        url = reverse('task_toggle_complete', kwargs={'pk': self.task.pk})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        writes = [q['sql'] for q in ctx.captured_queries if '"myapp_task"' in q['sql']]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('UPDATE'))
+        
+        self.client.get(url)
+        self.client.get(url)
+        self.task.refresh_from_db()
+        self.assertTrue(self.task.completed)
+        self.assertEqual(self.task.version, 4)
+        self.assertEqual(self.client.get(reverse('task_toggle_complete', kwargs={'pk': 99999})).status_code, 404)
+    
+    def test_update_writes_only_changed_fields(self):
+        """Test that the edit form writes only the changed columns plus version"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                reverse('task_update', kwargs={'pk': self.task.pk}), self.form_data(priority='high')
+            )
+        self.assertEqual(response.status_code, 302)
+        update = next(q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "myapp_task"'))
+        set_clause = update.split(' WHERE ')[0]
+        self.assertIn('"priority"', set_clause)
+        self.assertIn('"version"', set_clause)
+        self.assertNotIn('"title"', set_clause)
+        self.assertNotIn('"description"', set_clause)
+        
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.priority, self.task.version), ('high', 2))
+    
+    def test_unchanged_form_writes_nothing(self):
+        """Test that submitting the form without edits skips the UPDATE"""
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(reverse('task_update', kwargs={'pk': self.task.pk}), self.form_data())
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')])
+    
+    def test_untouched_precise_due_date_is_not_an_edit(self):
+        """Test that a due date with seconds survives a save of the form unchanged"""
+        due = timezone.make_aware(datetime(2030, 5, 1, 9, 30, 15, 250000))
+        Task.objects.filter(pk=self.task.pk).update(due_date=due)
+        url = reverse('task_update', kwargs={'pk': self.task.pk})
+        
+        self.assertContains(self.client.get(url), 'value="2030-05-01T09:30:15"')
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(url, self.form_data(due_date='2030-05-01T09:30:15'))
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')])
+        
+        self.client.post(url, self.form_data(due_date='2030-05-01T09:31'))
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.due_date, due.replace(minute=31, second=0, microsecond=0))
+        self.assertEqual(self.task.version, 2)
+    
+    def test_stale_form_is_rejected(self):
+        """Test that an edit based on an old version is refused with 409"""
+        stale = self.form_data(title='Stale edit')
+        self.client.post(reverse('task_update', kwargs={'pk': self.task.pk}), self.form_data(priority='high'))
+        
+        response = self.client.post(reverse('task_update', kwargs={'pk': self.task.pk}), stale)
+        self.assertEqual(response.status_code, 409)
+        self.assertContains(response, 'changed by someone else', status_code=409)
+        self.assertContains(response, 'name="version" value="2"', status_code=409)
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.title, self.task.priority), ('Write path', 'high'))
+        
+        response = self.client.post(reverse('task_update', kwargs={'pk': self.task.pk}), self.form_data(title=''))
+        self.assertEqual(response.status_code, 400)
+    
+    def test_concurrent_saves_do_not_lose_updates(self):
+        """Test that the second of two writers holding the same version fails"""
+        first = Task.objects.get(pk=self.task.pk)
+        second = Task.objects.get(pk=self.task.pk)
+        first.title = 'First'
+        first.save(update_fields=['title'])
+        second.priority = 'high'
+        with self.assertRaises(VersionConflict):
+            second.save(update_fields=['priority'])
+        self.assertEqual(second.version, 1)
+        
+        second.refresh_from_db()
+        second.priority = 'high'
+        second.save()
+        self.task.refresh_from_db()
+        self.assertEqual((self.task.title, self.task.priority, self.task.version), ('First', 'high', 3))
+    
+    def test_api_toggle_with_version(self):
+        """Test that the JSON toggle honours an optional expected version"""
+        url = reverse('api_task_toggle', kwargs={'pk': self.task.pk})
+        response = self.client.post(url, {'version': 1}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['version'], 2)
+        
+        response = self.client.post(url, {'version': 1}, content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['version'], 2)
+        
+        self.assertEqual(self.client.post(url, {'version': 'x'}).status_code, 400)
+        missing = reverse('api_task_toggle', kwargs={'pk': 99999})
+        self.assertEqual(self.client.post(missing, {'version': 1}).status_code, 404)
+    
+    @override_settings(TASK_STATS_COUNTERS=True)
+    def test_counters_follow_toggles(self):
+        """Test that single-statement toggles keep the counter row exact"""
+        rebuild_task_stats()
+        url = reverse('task_toggle_complete', kwargs={'pk': self.task.pk})
+        self.client.get(url)
+        self.assertEqual(get_task_stats(), {'total': 1, 'completed': 1, 'pending': 0})
+        self.client.get(url)
+        self.assertEqual(get_task_stats(), aggregate_stats())
+        
+        self.client.post(reverse('api_task_batch'), [{'op': 'toggle', 'id': self.task.pk}],
+                         content_type='application/json')
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.version, 4)
+        self.assertEqual(get_task_stats(), aggregate_stats())
+
+
+@override_settings(TASK_CHANGES_SETTLE_SECONDS=0)
+class TaskChangeFeedTestCase(TestCase):
+    """Test cases for the incremental change feed and delete tombstones."""
+    
+    def setUp(self):
+        """Create a few tasks for an initial sync."""
+        self.tasks = [Task.objects.create(title=f'Feed {i}') for i in range(3)]
+    
+    def changes(self, since=None, **params) -> Dict[str, Any]:
+        """Fetch one page of the feed and return the decoded body."""
+        if since:
+            params['since'] = since
+        response = self.client.get(reverse('api_task_changes'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+    
+    def test_initial_sync_pages_through_all_tasks(self):
+        """Test that a feed without a cursor lists every task in change order"""
+        first = self.changes(limit=2)
+        self.assertTrue(first['has_more'])
+        second = self.changes(first['next_cursor'], limit=2)
+        self.assertFalse(second['has_more'])
+        
+        ids = [task['id'] for task in first['changed'] + second['changed']]
+        self.assertEqual(ids, [task.pk for task in self.tasks])
+        self.assertEqual(self.changes(second['next_cursor'])['changed'], [])
+    
+    def test_updates_and_deletes_since_cursor(self):
+        """Test that only later edits, creations and deletions are returned"""
+        cursor = self.changes()['next_cursor']
+        
+        self.client.get(reverse('task_toggle_complete', kwargs={'pk': self.tasks[0].pk}))
+        self.client.post(reverse('task_delete', kwargs={'pk': self.tasks[1].pk}))
+        created = Task.objects.create(title='Feed new')
+        
+        page = self.changes(cursor)
+        self.assertEqual([task['id'] for task in page['changed']], [self.tasks[0].pk, created.pk])
+        self.assertTrue(page['changed'][0]['completed'])
+        self.assertEqual([tombstone['id'] for tombstone in page['deleted']], [self.tasks[1].pk])
+        
+        page = self.changes(page['next_cursor'])
+        self.assertEqual((page['changed'], page['deleted']), ([], []))
+    
+    def test_initial_sync_skips_old_tombstones(self):
+        """Test that a fresh client is not sent deletions of tasks it never saw"""
+        self.tasks[2].delete()
+        self.assertEqual(TaskTombstone.objects.count(), 1)
+        self.assertEqual(self.changes()['deleted'], [])
+    
+    def test_feed_uses_keyset_queries(self):
+        """Test that a page costs two indexed range queries, not a scan"""
+        cursor = self.changes()['next_cursor']
+        with CaptureQueriesContext(connection) as ctx:
+            self.changes(cursor)
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertIn('"updated_at" >', ctx.captured_queries[0]['sql'])
+        self.assertIn('"deleted_at" >', ctx.captured_queries[1]['sql'])
+    
+    def test_invalid_and_expired_cursors(self):
+        """Test that bad cursors are 400 and ones past the retention are 410"""
+        response = self.client.get(reverse('api_task_changes'), {'since': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('api_task_changes'), {'limit': 0})
+        self.assertEqual(response.status_code, 400)
+        
+        cursor = self.changes()['next_cursor']
+        with self.settings(TASK_TOMBSTONE_RETENTION_DAYS=0):
+            response = self.client.get(reverse('api_task_changes'), {'since': cursor})
+        self.assertEqual(response.status_code, 410)
+    
+    def test_purge_and_raw_deletes(self):
+        """Test that raw deletes leave tombstones and purge removes old ones"""
+        call_command('seed_tasks', '0', '--clear', stdout=StringIO())
+        self.assertEqual(
+            sorted(TaskTombstone.objects.values_list('task_id', flat=True)),
+            [task.pk for task in self.tasks],
+        )
+        TaskTombstone.objects.filter(task_id=self.tasks[0].pk).update(
+            deleted_at=timezone.now() - timedelta(days=31)
+        )
+        
+        call_command('purge_tombstones', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(TaskTombstone.objects.count(), 2)
+        call_command('purge_tombstones', '--days', '0', stdout=StringIO())
+        self.assertEqual(TaskTombstone.objects.count(), 0)
+
+
+class TaskArchiveTestCase(TestCase):
+    """Test cases for moving old completed tasks to the archive."""
+    
+    def setUp(self):
+        """Create old and recent, open and completed tasks."""
+        old = timezone.now() - timedelta(days=100)
+        self.old_done = [Task.objects.create(title=f'Old done {i}', completed=True) for i in range(5)]
+        self.old_open = Task.objects.create(title='Old open')
+        self.recent_done = Task.objects.create(title='Recent done', completed=True)
+        Task.objects.filter(pk__in=[t.pk for t in self.old_done] + [self.old_open.pk]).update(updated_at=old)
+    
+    def test_moves_only_old_completed_tasks(self):
+        """Test that the command archives old completed tasks and nothing else"""
+        call_command('archive_tasks', '--batch-size', '2', stdout=StringIO())
+        
+        self.assertEqual(
+            sorted(ArchivedTask.objects.values_list('id', flat=True)),
+            [task.pk for task in self.old_done],
+        )
+        self.assertCountEqual(
+            Task.objects.values_list('pk', flat=True), [self.old_open.pk, self.recent_done.pk]
+        )
+        archived = ArchivedTask.objects.get(pk=self.old_done[0].pk)
+        self.assertEqual((archived.title, archived.completed), ('Old done 0', True))
+    
+    def test_resumable_with_max(self):
+        """Test that a capped run stops cleanly and a second run finishes the job"""
+        call_command('archive_tasks', '--batch-size', '2', '--max', '3', stdout=StringIO())
+        self.assertEqual(ArchivedTask.objects.count(), 3)
+        
+        out = StringIO()
+        call_command('archive_tasks', '--dry-run', stdout=out)
+        self.assertIn('2 tasks', out.getvalue())
+        call_command('archive_tasks', stdout=StringIO())
+        self.assertEqual(ArchivedTask.objects.count(), 5)
+        self.assertEqual(Task.objects.count(), 2)
+    
+    @override_settings(TASK_STATS_COUNTERS=True)
+    def test_counters_and_tombstones(self):
+        """Test that archived tasks leave the counters and the change feed"""
+        rebuild_task_stats()
+        call_command('archive_tasks', stdout=StringIO())
+        
+        self.assertEqual(get_task_stats(), aggregate_stats())
+        self.assertEqual(get_task_stats(), {'total': 2, 'completed': 1, 'pending': 1})
+        self.assertEqual(TaskTombstone.objects.count(), 5)
+    
+    def test_archive_page(self):
+        """Test that the archive page lists archived tasks with keyset paging"""
+        call_command('archive_tasks', stdout=StringIO())
+        
+        with self.settings(TASK_LIST_PAGE_SIZE=3):
+            response = self.client.get(reverse('task_archive'))
+            self.assertEqual(len(response.context['tasks']), 3)
+            self.assertContains(response, 'Old done')
+            response = self.client.get(reverse('task_archive'), {'cursor': response.context['next_cursor']})
+        self.assertEqual(len(response.context['tasks']), 2)
+        self.assertEqual(self.client.get(reverse('task_archive'), {'cursor': 'x'}).status_code, 400)
+
+
+class RecordingBackend(BaseReminderBackend):
+    """Reminder backend that keeps what it was asked to send."""
+    
+    def __init__(self, fail: bool = False, **kwargs):
+        super().__init__(**kwargs)
+        self.fail = fail
+        self.sent = []
+    
+    def send(self, reminders):
+        if self.fail:
+            raise ConnectionError('backend down')
+        self.sent.extend(reminders)
+        return len(reminders)
+
+
+class TaskReminderTestCase(TestCase):
+    """Test cases for the due-date reminder scheduler."""
+    
+    def setUp(self):
+        """Create tasks due soon, overdue, far away and completed."""
+        self.now = timezone.now()
+        self.soon = Task.objects.create(title='Soon', due_date=self.now + timedelta(minutes=30))
+        self.overdue = Task.objects.create(title='Late', due_date=self.now - timedelta(hours=2))
+        Task.objects.create(title='Later', due_date=self.now + timedelta(days=3))
+        Task.objects.create(title='Done', completed=True, due_date=self.now + timedelta(minutes=5))
+        Task.objects.create(title='Ancient', due_date=self.now - timedelta(days=30))
+        self.backend = RecordingBackend()
+        self.scheduler = ReminderScheduler(self.backend, batch_size=1, workers=2)
+    
+    def tearDown(self):
+        self.scheduler.close()
+    
+    def sent(self):
+        """(title, kind) of every reminder sent so far."""
+        return sorted((reminder.title, reminder.kind) for reminder in self.backend.sent)
+    
+    def test_sends_due_soon_and_overdue_once(self):
+        """Test that each reminder goes out once, across ticks and batches"""
+        result = self.scheduler.tick(self.now)
+        self.assertEqual(self.sent(), [('Late', 'overdue'), ('Soon', 'due_soon')])
+        self.assertEqual(result.sent, 2)
+        
+        self.scheduler.tick(self.now + timedelta(minutes=1))
+        self.assertEqual(len(self.backend.sent), 2)
+        
+        self.scheduler.tick(self.now + timedelta(minutes=31))
+        self.assertEqual(self.sent()[-1], ('Soon', 'overdue'))
+        self.assertEqual(len(self.backend.sent), 3)
+    
+    def test_scans_only_new_ranges(self):
+        """Test that later ticks read only index ranges, and catch late arrivals"""
+        self.scheduler.tick(self.now)
+        Task.objects.create(title='Added late', due_date=self.now + timedelta(minutes=10))
+        
+        with CaptureQueriesContext(connection) as ctx:
+            self.scheduler.tick(self.now + timedelta(seconds=30))
+        scans = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT') and 'myapp_task"' in q['sql']]
+        self.assertTrue(scans)
+        for sql in scans:
+            self.assertIn('"due_date" <', sql)
+        self.assertIn(('Added late', 'due_soon'), self.sent())
+    
+    def test_claims_are_exclusive(self):
+        """Test that a second scheduler does not resend claimed reminders"""
+        self.scheduler.tick(self.now)
+        other = RecordingBackend()
+        second = ReminderScheduler(other, workers=1)
+        try:
+            result = second.tick(self.now)
+        finally:
+            second.close()
+        self.assertEqual(other.sent, [])
+        self.assertEqual(result.sent, 0)
+        self.assertEqual(TaskReminder.objects.count(), 2)
+    
+    def test_failed_sends_are_retried(self):
+        """Test that a batch the backend rejected is sent on the next tick"""
+        self.backend.fail = True
+        with self.assertLogs('myapp.reminders', 'ERROR'):
+            result = self.scheduler.tick(self.now)
+        self.assertEqual(result.failed, 2)
+        
+        self.backend.fail = False
+        result = self.scheduler.tick(self.now + timedelta(seconds=30))
+        self.assertEqual(result.sent, 2)
+        self.assertEqual(self.sent(), [('Late', 'overdue'), ('Soon', 'due_soon')])
+    
+    def test_command_with_file_backend(self):
+        """Test run_reminders --once writing JSON lines through FileBackend"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'reminders.jsonl')
+            with self.settings(TASK_REMINDER_FILE=path):
+                out = StringIO()
+                call_command('run_reminders', '--once', '--backend', 'myapp.reminders.FileBackend', stdout=out)
+            with open(path) as fh:
+                lines = [json.loads(line) for line in fh]
+        self.assertIn('2 sent', out.getvalue())
+        self.assertEqual(sorted(line['title'] for line in lines), ['Late', 'Soon'])
+
+
+class StaticAssetTestCase(TestCase):
+    """Test cases for the stylesheet, static file serving and compression."""
+    
+    def setUp(self):
+        """Create enough tasks for the list page to be worth compressing."""
+        for i in range(20):
+            Task.objects.create(title=f'Task {i}', priority='high' if i % 2 else 'low')
+    
+    def test_pages_have_no_inline_styles(self):
+        """Test that pages link the stylesheet instead of inlining styles"""
+        for name in ('home', 'task_list', 'task_create', 'task_overdue', 'task_archive'):
+            response = self.client.get(reverse(name))
+            self.assertContains(response, 'css/app.css')
+            self.assertNotContains(response, 'style=')
+            self.assertNotContains(response, '<style')
+        self.assertContains(self.client.get(reverse('task_list')), 'class="priority priority-high"')
+    
+    def test_html_is_gzipped(self):
+        """Test that HTML is gzipped for clients that accept it"""
+        response = self.client.get(reverse('task_list'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertIn(b'Task 19', gzip.decompress(response.content))
+        
+        response = self.client.get(reverse('task_list'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+    
+    def test_brotli_falls_back_to_gzip(self):
+        """Test that br clients get gzip when the brotli package is missing"""
+        with mock.patch('myapp.compression.brotli', None):
+            response = self.client.get(reverse('task_list'), HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+    
+    @skipUnless(brotli_available(), 'brotli is not installed')
+    def test_html_is_brotli_compressed(self):
+        """Test that HTML is Brotli-compressed when client and server support it"""
+        import brotli
+        response = self.client.get(reverse('task_list'), HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn(b'Task 19', brotli.decompress(response.content))
+    
+    def test_collected_files_are_served_immutable(self):
+        """Test that hashed static files are served precompressed with far-future caching"""
+        storages = {
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'myapp.staticfiles.CompressedManifestStaticFilesStorage'},
+        }
+        with tempfile.TemporaryDirectory() as root, self.settings(STATIC_ROOT=root, STORAGES=storages):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            client = Client()
+            page = client.get(reverse('home')).content.decode()
+            url = re.search(r'href="(/static/css/app\.[0-9a-f]{12}\.css)"', page).group(1)
+            
+            response = client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+            body = b''.join(response.streaming_content)
+            self.assertEqual(response['Content-Type'], 'text/css')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+            self.assertIn(b'.task-done', gzip.decompress(body))
+            
+            response = client.get('/static/css/app.css')
+            b''.join(response.streaming_content)
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+            
+            self.assertEqual(client.get('/static/../manage.py').status_code, 404)
+
+
+
+class TaskOwnershipTestCase(TestCase):
+    """Test cases for scoping tasks to their owner."""
+    
+    def setUp(self):
+        """Create two users with a task each, plus a task without an owner."""
+        self.alice = User.objects.create_user('alice', password='pw')
+        self.bob = User.objects.create_user('bob', password='pw')
+        self.mine = Task.objects.create(title='Alice report', user=self.alice)
+        self.theirs = Task.objects.create(title='Bob report', user=self.bob, completed=True)
+        self.anonymous = Task.objects.create(title='Shared report')
+        self.client.force_login(self.alice)
+    
+    def test_lists_show_own_tasks_only(self):
+        """Test that pages and the API only return the user's tasks"""
+        response = self.client.get(reverse('task_list'))
+        self.assertContains(response, 'Alice report')
+        self.assertNotContains(response, 'Bob report')
+        self.assertNotContains(response, 'Shared report')
+        
+        ids = [task['id'] for task in self.client.get(reverse('api_task_list')).json()['results']]
+        self.assertEqual(ids, [self.mine.pk])
+        
+        response = self.client.get(reverse('api_task_search'), {'q': 'report'})
+        self.assertEqual([task['id'] for task in response.json()['results']], [self.mine.pk])
+    
+    def test_other_users_tasks_are_not_found(self):
+        """Test that another user's task cannot be read or changed"""
+        for name in ('api_task_detail', 'api_task_toggle'):
+            method = self.client.get if name == 'api_task_detail' else self.client.post
+            self.assertEqual(method(reverse(name, kwargs={'pk': self.theirs.pk})).status_code, 404)
+        self.assertEqual(
+            self.client.post(reverse('task_delete', kwargs={'pk': self.theirs.pk})).status_code, 404
+        )
+        self.assertTrue(Task.objects.filter(pk=self.theirs.pk, completed=True).exists())
+    
+    def test_created_tasks_belong_to_the_user(self):
+        """Test that tasks created through the views and the batch API get an owner"""
+        self.client.post(reverse('task_create'), {'title': 'From the form'})
+        self.client.post(
+            reverse('api_task_batch'),
+            json.dumps({'operations': [{'op': 'create', 'data': {'title': 'From a batch'}}]}),
+            content_type='application/json',
+        )
+        
+        owned = Task.objects.filter(title__startswith='From').values_list('user_id', flat=True)
+        self.assertEqual(list(owned), [self.alice.pk, self.alice.pk])
+    
+    @override_settings(TASK_STATS_COUNTERS=True)
+    def test_stats_are_per_user(self):
+        """Test that the counters of each owner are kept apart"""
+        for user_id in (None, self.alice.pk, self.bob.pk):
+            rebuild_task_stats(user_id)
+        
+        self.assertEqual(get_task_stats(self.alice.pk), {'total': 1, 'completed': 0, 'pending': 1})
+        self.assertEqual(get_task_stats(self.bob.pk), {'total': 1, 'completed': 1, 'pending': 0})
+        self.assertEqual(get_task_stats(), {'total': 1, 'completed': 0, 'pending': 1})
+    
+    @override_settings(TASK_CHANGES_SETTLE_SECONDS=0)
+    def test_change_feed_is_per_user(self):
+        """Test that the change feed only reports the user's changes and deletions"""
+        initial = self.client.get(reverse('api_task_changes')).json()
+        self.assertEqual([task['id'] for task in initial['changed']], [self.mine.pk])
+        
+        self.theirs.delete()
+        doomed = Task.objects.create(title='Alice draft', user=self.alice)
+        doomed_id = doomed.pk
+        doomed.delete()
+        
+        data = self.client.get(reverse('api_task_changes'), {'since': initial['next_cursor']}).json()
+        self.assertEqual(data['changed'], [])
+        self.assertEqual([tombstone['id'] for tombstone in data['deleted']], [doomed_id])
+
+
+class UserShardingTestCase(TestCase):
+    """Test cases for placing task owners on shards and moving them."""
+    
+    # Resolved in setUpClass, once the extra shard exists
+    databases = '__all__'
+    
+    @classmethod
+    def setUpClass(cls):
+        """Add a second, in-memory shard and migrate it."""
+        connections.settings['shard1'] = connections.configure_settings({
+            **connections.settings,
+            'shard1': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': 'file:user_sharding_shard1?mode=memory&cache=shared',
+                'TEST': {'NAME': 'file:user_sharding_shard1?mode=memory&cache=shared'},
+            },
+        })['shard1']
+        cls.shards = override_settings(TASK_SHARDS=['default', 'shard1'])
+        cls.shards.enable()
+        call_command('migrate', database='shard1', verbosity=0)
+        super().setUpClass()
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Drop the extra shard again."""
+        super().tearDownClass()
+        cls.shards.disable()
+        connections['shard1'].close()
+        del connections['shard1']
+        del connections.settings['shard1']
+    
+    def setUp(self):
+        """Create a user placed on the second shard."""
+        self.user = User.objects.create_user('carol', password='pw')
+        self.pins = {self.user.pk: 'shard1'}
+    
+    def test_placement(self):
+        """Test that pins win, anonymous tasks stay first and hashing is consistent"""
+        self.assertEqual(shard_for_user(None), 'default')
+        with self.settings(TASK_SHARD_PINS={7: 'shard1'}):
+            self.assertEqual(shard_for_user(7), 'shard1')
+        
+        # Growing the shard count only moves keys to the new shard
+        for key in range(1000):
+            before, after = jump_hash(key, 4), jump_hash(key, 5)
+            self.assertIn(after, (before, 4))
+        moved = sum(jump_hash(key, 4) != jump_hash(key, 5) for key in range(1000))
+        self.assertLess(moved, 300)
+    
+    def test_tasks_are_created_on_owner_shard(self):
+        """Test that a user's tasks are written to and read from their shard"""
+        self.client.force_login(self.user)
+        with self.settings(TASK_SHARD_PINS=self.pins):
+            self.client.post(reverse('task_create'), {'title': 'Sharded task'})
+            task = Task.objects.using('shard1').get(title='Sharded task')
+            
+            self.assertFalse(Task.objects.filter(title='Sharded task').exists())
+            self.assertGreaterEqual(task.pk, SHARD_ID_SPAN)
+            self.assertEqual(list(self.user.tasks.all()), [task])
+            self.assertEqual(task.user, self.user)
+            self.assertContains(self.client.get(reverse('task_list')), 'Sharded task')
+    
+    def test_rebalance_moves_owner(self):
+        """Test that rebalancing copies rows with their ids and timestamps, then deletes them"""
+        kept = [Task.objects.create(title=f'Task {i}', user=self.user) for i in range(5)]
+        gone = Task.objects.create(title='Deleted', user=self.user)
+        gone_id = gone.pk
+        gone.delete()
+        anonymous = Task.objects.create(title='Anonymous')
+        
+        with self.settings(TASK_SHARD_PINS=self.pins):
+            out = StringIO()
+            call_command('rebalance_shards', '--dry-run', stdout=out)
+            self.assertIn(f'owner={self.user.pk}: default -> shard1', out.getvalue())
+            self.assertEqual(Task.objects.filter(user=self.user).count(), 5)
+            
+            call_command('rebalance_shards', '--batch-size', '2', stdout=StringIO())
+            # Idempotent
+            call_command('rebalance_shards', stdout=StringIO())
+        
+        moved = Task.objects.using('shard1').order_by('pk')
+        self.assertEqual(
+            [(task.pk, task.created_at, task.updated_at) for task in moved],
+            [(task.pk, task.created_at, task.updated_at) for task in kept],
+        )
+        self.assertEqual(list(Task.objects.values_list('pk', flat=True)), [anonymous.pk])
+        self.assertEqual(
+            list(TaskTombstone.objects.using('shard1').values_list('task_id', flat=True)), [gone_id]
+        )
+        self.assertFalse(TaskTombstone.objects.filter(user_id=self.user.pk).exists())
+        row = TaskStats.objects.using('shard1').get(owner=self.user.pk)
+        self.assertEqual((row.total, row.delete_seq), (5, 1))
+        self.assertFalse(TaskStats.objects.filter(owner=self.user.pk).exists())
+    
+    def test_moving_down_keeps_id_ranges(self):
+        """Test that tasks moved to a lower SQLite shard are re-keyed into its id range"""
+        with self.settings(TASK_SHARD_PINS=self.pins):
+            moved = Task.objects.create(title='Moved down', user=self.user,
+                                        due_date=timezone.now())
+        TaskReminder.objects.using('shard1').create(
+            task_id=moved.pk, kind=TaskReminder.OVERDUE, due_date=moved.due_date, claim='c',
+        )
+        self.assertGreaterEqual(moved.pk, SHARD_ID_SPAN)
+        
+        with self.settings(TASK_SHARD_PINS={self.user.pk: 'default'}):
+            call_command('rebalance_shards', stdout=StringIO())
+            rekeyed = Task.objects.get(title='Moved down')
+            on_default = Task.objects.create(title='New on default')
+            on_shard1 = Task.objects.using('shard1').create(title='New on shard1')
+        
+        self.assertLess(rekeyed.pk, SHARD_ID_SPAN)
+        self.assertEqual(rekeyed.created_at, moved.created_at)
+        self.assertGreater(rekeyed.updated_at, moved.updated_at)
+        self.assertTrue(TaskTombstone.objects.filter(task_id=moved.pk, user_id=self.user.pk).exists())
+        self.assertEqual(TaskReminder.objects.get().task_id, rekeyed.pk)
+        self.assertEqual(on_default.pk, rekeyed.pk + 1)
+        self.assertGreater(on_shard1.pk, moved.pk)
+        self.assertLess(on_shard1.pk, 2 * SHARD_ID_SPAN)
+    
+    def test_deleting_user_deletes_shard_tasks(self):
+        """Test that deleting a user removes everything they own from their shard"""
+        with self.settings(TASK_SHARD_PINS=self.pins):
+            task = Task.objects.create(title='Orphan to be', user=self.user, due_date=timezone.now())
+            Task.objects.create(title='Deleted', user=self.user).delete()
+            TaskReminder.objects.using('shard1').create(
+                task_id=task.pk, kind=TaskReminder.OVERDUE, due_date=task.due_date, claim='c',
+            )
+            ArchivedTask.objects.using('shard1').create(
+                id=task.pk + 100, title='Old', user=self.user,
+                created_at=timezone.now(), updated_at=timezone.now(),
+            )
+            self.assertEqual(Task.objects.using('shard1').count(), 1)
+            self.user.delete()
+        
+        for model in (Task, ArchivedTask, TaskTombstone, TaskReminder):
+            self.assertFalse(model.objects.using('shard1').exists(), model.__name__)
+        self.assertFalse(TaskStats.objects.using('shard1').filter(owner=task.user_id).exists())
+    
+    def test_deleting_user_on_default_leaves_no_tombstones(self):
+        """Test that a user on the default database loses their tombstones and markers too"""
+        with self.settings(TASK_SHARD_PINS={self.user.pk: 'default'}):
+            Task.objects.create(title='Deleted', user=self.user).delete()
+            task = Task.objects.create(title='Kept', user=self.user, due_date=timezone.now())
+            TaskReminder.objects.create(task_id=task.pk, kind=TaskReminder.OVERDUE,
+                                        due_date=task.due_date, claim='c')
+            
+            self.user.delete()
+        
+        for model in (Task, TaskTombstone, TaskReminder):
+            self.assertFalse(model.objects.exists(), model.__name__)
+        self.assertFalse(TaskStats.objects.filter(owner=task.user_id).exists())
+
+
+@override_settings(DATABASE_REPLICAS={'default': ['default_replica']})
+class ReplicaRoutingTestCase(TestCase):
+    """Test cases for replica reads and read-your-writes stickiness."""
+    
+    # Resolved in setUpClass, once the replica alias exists
+    databases = '__all__'
+    
+    @classmethod
+    def setUpClass(cls):
+        """Add a replica alias sharing the test database's connection."""
+        connections.settings['default_replica'] = connections.settings['default']
+        connections['default_replica'] = connections['default']
+        super().setUpClass()
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Drop the replica alias again, leaving the shared connection open."""
+        super().tearDownClass()
+        del connections['default_replica']
+        del connections.settings['default_replica']
+    
+    def setUp(self):
+        """Create a task to read back."""
+        self.task = Task.objects.create(title='Replicated')
+    
+    def listed_from(self, response) -> set:
+        """Databases the listed tasks were loaded from."""
+        return {task._state.db for task in response.context['tasks']}
+    
+    def test_list_pages_read_from_replica(self):
+        """Test that list and search pages read from a replica"""
+        self.assertEqual(self.listed_from(self.client.get(reverse('task_list'))), {'default_replica'})
+        response = self.client.get(reverse('task_search'), {'q': 'replicated'})
+        self.assertEqual(self.listed_from(response), {'default_replica'})
+        self.assertNotIn(STICKY_COOKIE, self.client.cookies)
+    
+    def test_writes_stick_to_primary(self):
+        """Test that a write keeps the client's reads on the primary for a while"""
+        response = self.client.post(reverse('task_create'), {'title': 'Fresh'})
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], 10)
+        
+        response = self.client.get(reverse('task_list'))
+        self.assertEqual(self.listed_from(response), {'default'})
+        self.assertContains(response, 'Fresh')
+    
+    def test_get_toggle_sticks_to_primary(self):
+        """Test that a toggle link counts as a write"""
+        response = self.client.get(reverse('task_toggle_complete', kwargs={'pk': self.task.pk}))
+        self.assertIn(STICKY_COOKIE, response.cookies)
+    
+    def test_other_views_read_from_primary(self):
+        """Test that views not marked for replica reads use the primary"""
+        response = self.client.get(reverse('task_update', kwargs={'pk': self.task.pk}))
+        self.assertEqual(response.context['task']._state.db, 'default')
+    
+    def test_replica_objects_are_saved_to_primary(self):
+        """Test that saving an object read from a replica writes to the primary"""
+        task = Task.objects.using('default_replica').get(pk=self.task.pk)
+        task.title = 'Renamed'
+        task.save()
+        self.assertEqual(task._state.db, 'default')
+        
+        self.assertFalse(router.allow_migrate('default_replica', 'myapp'))
+        self.assertFalse(router.allow_migrate('default_replica', 'auth'))
+
+
+class TaskAdminTestCase(TestCase):
+    """Test cases for the task admin changelist and its bulk actions."""
+    
+    def setUp(self):
+        """Log in a superuser and create a mix of tasks."""
+        self.admin = User.objects.create_superuser('admin', password='pw')
+        self.client.force_login(self.admin)
+        self.tasks = [
+            Task.objects.create(title=f'Admin task {i}', completed=i % 3 == 0, priority='high' if i % 2 else 'low')
+            for i in range(12)
+        ]
+        self.url = reverse('admin:myapp_task_changelist')
+    
+    def test_changelist_never_counts_whole_table(self):
+        """Test that the changelist uses a capped count and a bounded number of queries"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 12)
+        counts = [q['sql'] for q in ctx.captured_queries if 'COUNT(' in q['sql'].upper()]
+        self.assertEqual(len(counts), 1)
+        self.assertIn('LIMIT', counts[0].upper())
+        self.assertLess(len(ctx.captured_queries), 10)
+    
+    def test_cursor_pages(self):
+        """Test that next/previous cursors walk the list without OFFSET"""
+        with self.settings(ADMIN_COUNT_CAP=100):
+            with mock.patch('myapp.admin.TaskAdmin.list_per_page', 5):
+                first = self.client.get(self.url).context['cl']
+                second = self.client.get(self.url, {CURSOR_VAR: first.next_cursor}).context['cl']
+                back = self.client.get(self.url, {CURSOR_VAR: second.prev_cursor}).context['cl']
+        
+        expected = sorted(self.tasks, key=lambda t: (t.updated_at, t.pk), reverse=True)
+        self.assertEqual(list(first.result_list), expected[:5])
+        self.assertEqual(list(second.result_list), expected[5:10])
+        self.assertEqual(list(back.result_list), expected[:5])
+        self.assertEqual(self.client.get(self.url, {CURSOR_VAR: 'x'}).status_code, 302)
+    
+    def test_filters(self):
+        """Test that the indexed filters narrow the list"""
+        cl = self.client.get(self.url, {'completed__exact': '1'}).context['cl']
+        self.assertEqual(cl.result_count, 4)
+        cl = self.client.get(self.url, {'priority__exact': 'high', 'completed__exact': '0'}).context['cl']
+        self.assertTrue(all(t.priority == 'high' and not t.completed for t in cl.result_list))
+    
+    def test_estimated_count_beyond_cap(self):
+        """Test that counts past the cap are flagged as estimates"""
+        self.assertEqual(estimated_count(Task.objects.all(), cap=20), (12, True))
+        count, exact = estimated_count(Task.objects.all(), cap=5)
+        self.assertFalse(exact)
+        self.assertGreaterEqual(count, 5)
+        with self.settings(TASK_STATS_COUNTERS=True):
+            rebuild_task_stats()
+            self.assertEqual(estimated_count(Task.objects.all(), cap=5), (12, True))
+    
+    @override_settings(TASK_STATS_COUNTERS=True)
+    def test_bulk_complete_is_one_update(self):
+        """Test that marking tasks completed is a single UPDATE that keeps the counters right"""
+        rebuild_task_stats()
+        ids = [str(t.pk) for t in self.tasks[:6]]
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(self.url, {'action': 'mark_completed', '_selected_action': ids})
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "myapp_task"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Task.objects.filter(pk__in=ids, completed=False).count(), 0)
+        self.assertEqual(Task.objects.get(pk=self.tasks[1].pk).version, self.tasks[1].version + 1)
+        self.assertEqual(get_task_stats(), aggregate_stats())
+    
+    @override_settings(TASK_STATS_COUNTERS=True)
+    def test_bulk_complete_counts_locked_rows(self):
+        """Test that a task completed just before the rows are locked is not counted twice"""
+        rebuild_task_stats()
+        ids = [str(t.pk) for t in self.tasks[:6]]
+        select_for_update = TaskQuerySet.select_for_update
+        
+        def complete_then_lock(queryset, *args, **kwargs):
+            if not self.tasks[1].completed:
+                self.tasks[1].completed = True
+                self.tasks[1].save()
+            return select_for_update(queryset, *args, **kwargs)
+        
+        with mock.patch.object(TaskQuerySet, 'select_for_update', complete_then_lock):
+            self.client.post(self.url, {'action': 'mark_completed', '_selected_action': ids})
+        self.assertEqual(Task.objects.filter(pk__in=ids, completed=False).count(), 0)
+        self.assertEqual(Task.objects.get(pk=self.tasks[1].pk).version, self.tasks[1].version)
+        self.assertEqual(get_task_stats(), aggregate_stats())
+    
+    @override_settings(TASK_STATS_COUNTERS=True)
+    def test_bulk_delete_is_one_delete(self):
+        """Test that deleting tasks is a single DELETE that leaves tombstones"""
+        rebuild_task_stats()
+        ids = [str(t.pk) for t in self.tasks[:4]]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, {'action': 'delete_selected_fast', '_selected_action': ids})
+        self.assertEqual(response.status_code, 302)
+        deletes = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('DELETE FROM "myapp_task"')]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(Task.objects.count(), 8)
+        self.assertEqual(TaskTombstone.objects.count(), 4)
+        self.assertEqual(get_task_stats(), aggregate_stats())
+        choices = self.client.get(self.url).context['action_form'].fields['action'].choices
+        self.assertNotIn('delete_selected', [name for name, _ in choices])
+    
+    def test_change_page(self):
+        """Test that a task can be edited from the admin"""
+        task = self.tasks[0]
+        url = reverse('admin:myapp_task_change', args=[task.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+@override_settings(ROOT_URLCONF='myproject.api_urls')
+class ApiProfileTestCase(TestCase):
+    """Test cases for the lean API-only settings profile and URLconf."""
+    
+    def setUp(self):
+        """Create a task to list."""
+        self.task = Task.objects.create(title='Lean task')
+    
+    def test_profile_drops_unused_apps_and_middleware(self):
+        """Test that the API profile leaves out the admin, messages and static files"""
+        profile = importlib.import_module('myproject.settings_api')
+        for app in ('django.contrib.admin', 'django.contrib.messages', 'django.contrib.staticfiles'):
+            self.assertNotIn(app, profile.INSTALLED_APPS)
+        self.assertNotIn('django.contrib.messages.middleware.MessageMiddleware', profile.MIDDLEWARE)
+        self.assertNotIn('myapp.staticfiles.StaticFilesMiddleware', profile.MIDDLEWARE)
+        self.assertIn('django.contrib.auth.middleware.AuthenticationMiddleware', profile.MIDDLEWARE)
+        self.assertEqual(profile.TEMPLATES[0]['OPTIONS']['loaders'][0][0], 'django.template.loaders.cached.Loader')
+    
+    def test_only_api_is_routed(self):
+        """Test that the API works and the HTML pages are not routed"""
+        response = self.client.get('/api/tasks/')
+        self.assertEqual(response.json()['results'][0]['title'], 'Lean task')
+        
+        response = self.client.get('/tasks/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'error': 'Not found'})
+    
+    def test_errors_are_json(self):
+        """Test that error responses are JSON instead of rendered pages"""
+        response = self.client.get(f'/api/tasks/{self.task.pk + 1000}')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        
+        request = RequestFactory().post('/api/tasks/batch')
+        self.assertEqual(api.csrf_failure_json(request, 'no token').status_code, 403)
+        self.assertEqual(api.server_error_json(request).status_code, 500)
+
+
+@override_settings(TASK_LIST_PAGE_SIZE=2)
+class TaskPrioritySortTestCase(TestCase):
+    """
+    Test cases for the integer priority column and task_list sorting and filters.
+    """
+    
+    def setUp(self) -> None:
+        """Create tasks across priorities, due dates and completion."""
+        today = timezone.now()
+        self.urgent = Task.objects.create(title='Urgent', priority='high', due_date=today)
+        self.later = Task.objects.create(title='Later', priority='high', due_date=today + timedelta(days=3))
+        self.undated = Task.objects.create(title='Undated', priority='high')
+        self.done = Task.objects.create(title='Done', priority='high', due_date=today, completed=True)
+        self.low = Task.objects.create(title='Low', priority='low', due_date=today - timedelta(days=1))
+        self.medium = Task.objects.create(title='Medium')
+    
+    def walk(self, params: Dict[str, str]) -> list:
+        """Follow next cursors from the first page and return every listed task."""
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(reverse('task_list'), {**params, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            seen.extend(response.context['tasks'])
+            cursor = response.context['next_cursor']
+            if not cursor:
+                return seen
+    
+    def test_priority_stored_as_integer(self) -> None:
+        """Priorities are stored as small integers but read back as names."""
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT priority FROM myapp_task WHERE id = %s', [self.urgent.pk])
+            self.assertEqual(cursor.fetchone()[0], 3)
+        task = Task.objects.get(pk=self.urgent.pk)
+        self.assertEqual(task.priority, 'high')
+        self.assertEqual(task.get_priority_display(), 'High')
+        self.assertEqual(Task.objects.filter(priority='high').count(), 4)
+    
+    def test_order_by_priority_is_by_urgency(self) -> None:
+        """Ordering by the column ranks high above medium above low."""
+        priorities = list(Task.objects.order_by('-priority', 'id').values_list('priority', flat=True))
+        self.assertEqual(priorities, ['high'] * 4 + ['medium', 'low'])
+    
+    def test_sort_and_filter(self) -> None:
+        """Pending high-priority tasks are listed soonest due first, undated last."""
+        params = {'sort': 'priority,due_date', 'priority': 'high', 'completed': '0'}
+        self.assertEqual(self.walk(params), [self.urgent, self.later, self.undated])
+        
+        response = self.client.get(reverse('task_list'), params)
+        self.assertContains(response, 'sort=priority%2Cdue_date&amp;priority=high&amp;completed=0&amp;cursor=')
+    
+    def test_undated_tasks_last_in_both_directions(self) -> None:
+        """Tasks without a due date stay last when paging forward and back."""
+        seen = self.walk({'sort': 'due_date'})
+        self.assertEqual(seen[:2], [self.low, self.urgent])
+        self.assertEqual(seen[-2:], [self.undated, self.medium])
+        
+        first = self.client.get(reverse('task_list'), {'sort': 'due_date'})
+        second = self.client.get(reverse('task_list'), {'sort': 'due_date', 'cursor': first.context['next_cursor']})
+        third = self.client.get(reverse('task_list'), {'sort': 'due_date', 'cursor': second.context['next_cursor']})
+        back = self.client.get(reverse('task_list'), {'sort': 'due_date', 'cursor': third.context['prev_cursor']})
+        self.assertEqual(list(back.context['tasks']), list(second.context['tasks']))
+    
+    def test_invalid_parameters_return_400(self) -> None:
+        """Unknown sort or priority values are rejected."""
+        for params in ({'sort': 'title'}, {'priority': 'urgent'}, {'completed': 'maybe'}):
+            response = self.client.get(reverse('task_list'), params)
+            self.assertEqual(response.status_code, 400, params)
+    
+    def test_batch_api_still_uses_names(self) -> None:
+        """The batch API accepts priority names and rejects unknown ones."""
+        response = self.client.post(reverse('api_task_batch'), data={'operations': [
+            {'op': 'create', 'data': {'title': 'New', 'priority': 'low'}},
+            {'op': 'create', 'data': {'title': 'Bad', 'priority': 'urgent'}},
+        ]}, content_type='application/json')
+        results = response.json()['results']
+        self.assertEqual([r['status'] for r in results], ['ok', 'error'])
+        self.assertEqual(Task.objects.get(pk=results[0]['id']).priority, 'low')
+
+
+class TaskRecurrenceTestCase(TestCase):
+    """Test cases for recurring tasks and their lazily expanded occurrences."""
+    
+    def setUp(self):
+        """Create a daily task and a one-off task."""
+        self.start = timezone.make_aware(datetime(2026, 1, 31, 9, 0))
+        self.daily = Task.objects.create(title='Stand-up', due_date=self.start, recurrence='daily')
+        self.once = Task.objects.create(title='Once', due_date=self.start)
+    
+    def test_rule_parsing(self):
+        """Test that aliases and RRULE-like strings parse and bad rules are rejected"""
+        self.assertEqual(str(Rule.parse('weekly')), 'FREQ=WEEKLY')
+        self.assertEqual(
+            str(Rule.parse('RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=TH,MO;UNTIL=2027-06-30')),
+            'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH;UNTIL=20270630',
+        )
+        for rule in ('hourly', 'FREQ=DAILY;COUNT=3', 'FREQ=DAILY;BYDAY=MO', 'FREQ=WEEKLY;INTERVAL=0'):
+            with self.assertRaises(ValueError, msg=rule):
+                Rule.parse(rule)
+        task = Task(title='Bad', recurrence='fortnightly')
+        with self.assertRaises(ValidationError):
+            task.full_clean()
+    
+    def test_next_occurrences(self):
+        """Test that monthly rules keep their day and weekly rules follow BYDAY and UNTIL"""
+        monthly = Rule.parse('monthly').pinned(self.start)
+        dates, moment = [], self.start
+        for _ in range(3):
+            moment = monthly.next_after(moment)
+            dates.append(moment.date().isoformat())
+        self.assertEqual(dates, ['2026-02-28', '2026-03-31', '2026-04-30'])
+        
+        weekly = Rule.parse('FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH;UNTIL=20260216')
+        monday = timezone.make_aware(datetime(2026, 2, 2, 9, 0))
+        self.assertEqual(weekly.next_after(monday).date().isoformat(), '2026-02-05')
+        self.assertEqual(weekly.next_after(weekly.next_after(monday)).date().isoformat(), '2026-02-16')
+        self.assertIsNone(weekly.next_after(timezone.make_aware(datetime(2026, 2, 16, 9, 0))))
+        
+        # Skipping ahead lands on the same dates as stepping
+        far = timezone.make_aware(datetime(2030, 5, 1))
+        self.assertEqual(
+            [d.date().isoformat() for d in monthly.between(self.start, far, far + timedelta(days=62))],
+            ['2030-05-31', '2030-06-30'],
+        )
+    
+    def test_toggle_creates_next_occurrence(self):
+        """Test that completing a recurring task creates only the next occurrence"""
+        url = reverse('task_toggle_complete', kwargs={'pk': self.daily.pk})
+        self.client.get(url)
+        
+        self.daily.refresh_from_db()
+        self.assertTrue(self.daily.completed)
+        self.assertEqual(self.daily.recurrence, '')
+        following = Task.objects.get(title='Stand-up', completed=False)
+        self.assertEqual(following.due_date, self.start + timedelta(days=1))
+        self.assertEqual(following.recurrence, 'FREQ=DAILY')
+        
+        # Undoing and completing again repeats nothing
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(Task.objects.filter(title='Stand-up').count(), 2)
+    
+    @override_settings(TASK_STATS_COUNTERS=True)
+    def test_other_completion_paths(self):
+        """Test that the edit form and the batch API advance series too"""
+        rebuild_task_stats()
+        self.client.post(reverse('task_update', kwargs={'pk': self.daily.pk}), {
+            'title': 'Stand-up', 'priority': 'medium', 'completed': 'on', 'due_date': '2026-01-31T09:00',
+            'recurrence': 'daily', 'version': self.daily.version,
+        })
+        following = Task.objects.get(title='Stand-up', completed=False)
+        self.assertEqual(following.due_date, self.start + timedelta(days=1))
+        
+        response = self.client.post(reverse('api_task_batch'), data=[{'op': 'toggle', 'id': following.pk}],
+                                    content_type='application/json')
+        latest = Task.objects.get(title='Stand-up', completed=False)
+        self.assertEqual(latest.due_date, self.start + timedelta(days=2))
+        self.assertEqual(response.json()['created_occurrences'], [latest.to_dict()])
+        self.assertEqual(get_task_stats(), aggregate_stats())
+    
+    def test_agenda_expands_without_storing(self):
+        """Test that date-range reads list future occurrences without writing them"""
+        response = self.client.get(reverse('api_task_agenda'), {'start': '2026-01-31', 'end': '2026-02-03'})
+        data = response.json()
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(item['title'], item['due_date'][:10], item['virtual']) for item in data['results']],
+            [('Stand-up', '2026-01-31', False), ('Once', '2026-01-31', False),
+             ('Stand-up', '2026-02-01', True), ('Stand-up', '2026-02-02', True),
+             ('Stand-up', '2026-02-03', True)],
+        )
+        self.assertFalse(data['truncated'])
+        self.assertEqual(Task.objects.count(), 2)
+    
+    def test_agenda_expands_undated_series(self):
+        """Test that a recurring task without a due date repeats from its creation"""
+        chore = Task.objects.create(title='Chore', recurrence='weekly')
+        Task.objects.filter(pk=chore.pk).update(created_at=self.start)
+        
+        data = self.client.get(reverse('api_task_agenda'), {'start': '2026-02-01', 'end': '2026-02-14'}).json()
+        
+        self.assertEqual(
+            [item['due_date'][:10] for item in data['results'] if item['title'] == 'Chore'],
+            ['2026-02-07', '2026-02-14'],
+        )
+        self.assertTrue(all(item['virtual'] for item in data['results'] if item['title'] == 'Chore'))
+    
+    def test_agenda_limits(self):
+        """Test that long ranges are truncated and invalid ranges rejected"""
+        with self.settings(TASK_AGENDA_LIMIT=5):
+            data = self.client.get(
+                reverse('api_task_agenda'), {'start': '2027-01-01', 'end': '2027-12-31'}
+            ).json()
+        self.assertEqual(len(data['results']), 5)
+        self.assertTrue(data['truncated'])
+        self.assertEqual(data['results'][0]['due_date'][:10], '2027-01-01')
+        
+        for params in ({'start': 'soon', 'end': '2026-02-01'}, {'start': '2026-02-01', 'end': '2026-01-01'},
+                       {'start': '2026-01-01', 'end': '2028-01-01'}):
+            response = self.client.get(reverse('api_task_agenda'), params)
+            self.assertEqual(response.status_code, 400, params)
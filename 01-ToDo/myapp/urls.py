@@ -4,6 +4,9 @@ from . import views
 urlpatterns = [
     path('', views.task_list, name='task_list'),
     path('create/', views.task_create, name='task_create'),
+    path('overdue/', views.task_overdue, name='task_overdue'),
+    path('search/', views.task_search, name='task_search'),
+    path('archive/', views.task_archive, name='task_archive'),
     path('<int:pk>/update/', views.task_update, name='task_update'),
     path('<int:pk>/delete/', views.task_delete, name='task_delete'),
     path('<int:pk>/toggle/', views.task_toggle_complete, name='task_toggle_complete'),
@@ -1,34 +1,240 @@
+from typing import Mapping, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpRequest, HttpResponse
-from .models import Task
+from django.http import Http404, HttpRequest, HttpResponse, HttpResponseBadRequest
+from .batch import apply_field_data, parse_version
+from . import recurrence
+from .conditional import task_condition, task_stats
+from .export import filter_tasks
+from .models import ArchivedTask, Task, TaskQuerySet, VersionConflict, owner_id
+from .pagination import DEFAULT_ORDERING, InvalidCursor, paginate
+from .replicas import pin_primary, replica_reads
+from .search import decode_search_cursor, search_tasks
+from .stats import adjust_toggled
+
+# Archive pages: most recently finished first
+ARCHIVE_ORDERING = ('-updated_at', '-id')
+
+# task_list ?sort= values.  Each is served by a (user, ...) index, also
+# under the ?completed= and ?priority= filters (see Task.Meta.indexes).
+TASK_LIST_SORTS = {
+    'created': DEFAULT_ORDERING,
+    'due_date': ('due_date', 'id'),
+    'priority': ('-priority', 'due_date', 'id'),
+    'priority,due_date': ('-priority', 'due_date', 'id'),
+}
+
+# task_list parameters carried over to the pagination links
+TASK_LIST_PARAMS = ('sort', 'priority', 'completed')
+
+CONFLICT_MESSAGE = 'This task was changed by someone else. Review the current values and save again.'
+
+
+def get_page_size() -> int:
+    """Number of tasks shown per list page."""
+    return getattr(settings, 'TASK_LIST_PAGE_SIZE', 50)
+
+
+def get_row_cache_timeout() -> int:
+    """Lifetime of cached task_list row fragments, in seconds."""
+    return getattr(settings, 'TASK_ROW_CACHE_TIMEOUT', 300)
+
+
+def task_list_query(params: Mapping[str, str], tasks: TaskQuerySet) -> Tuple[TaskQuerySet, Sequence[str], str]:
+    """
+    Apply task_list's ``sort``, ``priority`` and ``completed`` parameters.
+    
+    Returns the filtered tasks, their ordering and the query string that
+    keeps the parameters in pagination links.
+    
+    Raises:
+        ValueError: If a parameter has an unknown value
+    """
+    sort = params.get('sort') or 'created'
+    if sort not in TASK_LIST_SORTS:
+        raise ValueError(f'Invalid sort {sort!r}; use one of {", ".join(TASK_LIST_SORTS)}')
+    filters = {name: params[name] for name in ('priority', 'completed') if params.get(name)}
+    kept = {name: params[name] for name in TASK_LIST_PARAMS if params.get(name)}
+    return filter_tasks(filters, tasks), TASK_LIST_SORTS[sort], urlencode(kept)
 
 
+def user_tasks(request: HttpRequest) -> TaskQuerySet:
+    """
+    The requesting user's tasks, on their shard.
+    
+    Anonymous visitors share the tasks that have no owner.
+    """
+    return Task.objects.for_user(request.user)
+
+
+def toggle_task(pk: int, version: Optional[int] = None, user_id: Optional[int] = None) -> int:
+    """
+    Flip the completion status of ``user_id``'s task ``pk`` with a single ``UPDATE``.
+    
+    With ``version`` the task is only toggled while it is still at that
+    version.  Returns the number of tasks changed (0 or 1).
+    
+    Completing a recurring task also creates its next occurrence (see
+    ``myapp.recurrence``).  Other tasks are toggled blind, so only
+    recurring ones pay for reading the rule.
+    """
+    owned = Task.objects.owned_by(user_id)
+    tasks = owned.filter(pk=pk)
+    if version is not None:
+        tasks = tasks.filter(version=version)
+    with transaction.atomic(using=tasks.db):
+        updated = tasks.exclude(completed=False, recurrence__gt='').toggle_completed()
+        if not updated:
+            recurring = list(tasks.recurring().select_for_update())
+            if recurring:
+                updated = tasks.toggle_completed()
+                recurrence.advance(owned, recurring)
+        if updated:
+            adjust_toggled(pk, user_id)
+    return updated
+
+
+@replica_reads
+@task_condition
 def home(request: HttpRequest) -> HttpResponse:
     """
     Home page view showing task statistics.
     """
-    tasks = Task.objects.all()
+    stats = task_stats(request)
     context = {
-        'total_tasks': tasks.count(),
-        'completed_tasks': tasks.filter(completed=True).count(),
-        'pending_tasks': tasks.filter(completed=False).count(),
+        'total_tasks': stats['total'],
+        'completed_tasks': stats['completed'],
+        'pending_tasks': stats['pending'],
     }
     return render(request, 'home.html', context)
 
 
+@replica_reads
+@task_condition
 def task_list(request: HttpRequest) -> HttpResponse:
     """
-    Display a list of all tasks.
+    Display one page of the user's tasks, newest first.
+    
+    ``?sort=priority,due_date`` (or ``priority``) lists the most urgent
+    first, soonest due within a priority; ``?sort=due_date`` soonest due
+    first.  ``?priority=high`` and ``?completed=0``/``1`` filter.  Tasks
+    without a due date come last.
+    
+    Uses keyset pagination on the sort columns via the ``cursor`` query
+    parameter, so deep pages cost the same as the first one.  Each
+    row is fragment-cached on ``(pk, updated_at)`` in the ``task_rows``
+    cache, so unchanged rows skip template evaluation.
     """
-    tasks = Task.objects.all().order_by('-created_at')
+    try:
+        tasks, ordering, list_query = task_list_query(request.GET, user_tasks(request))
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    try:
+        page = paginate(tasks.annotate_overdue(), request.GET.get('cursor'), get_page_size(), ordering)
+    except InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor')
+    
+    stats = task_stats(request)
     context = {
-        'tasks': tasks,
-        'total_tasks': tasks.count(),
-        'completed_tasks': tasks.filter(completed=True).count(),
+        'tasks': page.items,
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+        'total_tasks': stats['total'],
+        'completed_tasks': stats['completed'],
+        'pending_tasks': stats['pending'],
+        'row_cache_timeout': get_row_cache_timeout(),
+        'list_query': list_query,
+        'sort': request.GET.get('sort', ''),
+        'priority': request.GET.get('priority', ''),
+        'completed': request.GET.get('completed', ''),
     }
     return render(request, 'myapp/task_list.html', context)
 
 
+@replica_reads
+@task_condition
+def task_overdue(request: HttpRequest) -> HttpResponse:
+    """
+    Display the user's open tasks whose due date has passed, most overdue first.
+    
+    Filtering happens in SQL (``Task.objects.overdue()``) and pages walk the
+    partial ``due_date`` index with a ``(due_date, id)`` keyset cursor.
+    """
+    tasks = user_tasks(request).overdue().annotate_overdue()
+    try:
+        page = paginate(
+            tasks, request.GET.get('cursor'), get_page_size(), ordering=('due_date', 'id')
+        )
+    except InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor')
+    
+    context = {
+        'tasks': page.items,
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+        'row_cache_timeout': get_row_cache_timeout(),
+    }
+    return render(request, 'myapp/task_overdue.html', context)
+
+
+@replica_reads
+@task_condition
+def task_search(request: HttpRequest) -> HttpResponse:
+    """
+    Display the user's tasks matching the ``q`` query parameter, best match first.
+    
+    Served by the full-text index (see ``myapp.search``), never by a scan
+    of the task table.
+    """
+    query = request.GET.get('q', '').strip()
+    try:
+        offset = decode_search_cursor(request.GET.get('cursor'))
+    except InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor')
+    
+    page = search_tasks(
+        query, get_page_size(), offset, user_tasks(request).annotate_overdue(),
+        user_id=owner_id(request.user),
+    )
+    context = {
+        'q': query,
+        'truncated': page.truncated,
+        'tasks': page.items,
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+        'row_cache_timeout': get_row_cache_timeout(),
+    }
+    return render(request, 'myapp/task_search.html', context)
+
+
+@replica_reads
+def task_archive(request: HttpRequest) -> HttpResponse:
+    """
+    Browse the user's archived tasks, most recently finished first.
+    
+    Reads only the archive table, with the same keyset pagination as the
+    task list.
+    """
+    try:
+        page = paginate(
+            ArchivedTask.objects.for_user(request.user), request.GET.get('cursor'), get_page_size(),
+            ordering=ARCHIVE_ORDERING,
+        )
+    except InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor')
+    
+    context = {
+        'tasks': page.items,
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+    }
+    return render(request, 'myapp/task_archive.html', context)
+
+
 def task_create(request: HttpRequest) -> HttpResponse:
     """
     Create a new task.
@@ -38,13 +244,22 @@ def task_create(request: HttpRequest) -> HttpResponse:
         description = request.POST.get('description', '')
         priority = request.POST.get('priority', 'medium')
         due_date = request.POST.get('due_date', None)
+        repeat = request.POST.get('recurrence', '').strip()
+        try:
+            recurrence.validate_recurrence(repeat)
+        except ValidationError as exc:
+            return render(request, 'myapp/task_form.html', {'errors': exc.messages}, status=400)
         
-        Task.objects.create(
-            title=title,
-            description=description,
-            priority=priority,
-            due_date=due_date if due_date else None
-        )
+        tasks = user_tasks(request)
+        with transaction.atomic(using=tasks.db):
+            tasks.create(
+                title=title,
+                description=description,
+                priority=priority,
+                due_date=due_date if due_date else None,
+                recurrence=repeat,
+                user_id=owner_id(request.user)
+            )
         return redirect('task_list')
     
     return render(request, 'myapp/task_form.html')
@@ -53,17 +268,50 @@ def task_create(request: HttpRequest) -> HttpResponse:
 def task_update(request: HttpRequest, pk: int) -> HttpResponse:
     """
     Update an existing task.
+    
+    Only the fields that changed are written.  The form carries the version
+    of the task it was rendered from; if the task has been modified since,
+    nothing is written and the form is shown again with the current values
+    and status 409.  Completing a recurring task creates its next occurrence.
     """
-    task = get_object_or_404(Task, pk=pk)
+    task = get_object_or_404(user_tasks(request), pk=pk)
     
     if request.method == 'POST':
-        task.title = request.POST.get('title')
-        task.description = request.POST.get('description', '')
-        task.priority = request.POST.get('priority', 'medium')
-        task.completed = request.POST.get('completed') == 'on'
-        due_date = request.POST.get('due_date', None)
-        task.due_date = due_date if due_date else None
-        task.save()
+        data = {
+            'title': request.POST.get('title'),
+            'description': request.POST.get('description', ''),
+            'priority': request.POST.get('priority', 'medium'),
+            'completed': request.POST.get('completed') == 'on',
+            'due_date': request.POST.get('due_date') or None,
+            'recurrence': request.POST.get('recurrence', '').strip(),
+        }
+        if task.description is None and not data['description']:
+            # An empty textarea is not an edit of a missing description
+            del data['description']
+        before = {name: getattr(task, name) for name in data}
+        try:
+            version = parse_version(request.POST.get('version'))
+            apply_field_data(task, data)
+        except (ValueError, ValidationError) as exc:
+            messages = exc.messages if isinstance(exc, ValidationError) else ['Invalid version']
+            context = {'task': task, 'errors': messages}
+            return render(request, 'myapp/task_form.html', context, status=400)
+        
+        # The form shows due dates to the second; an untouched one keeps its fraction
+        if task.due_date and before['due_date'] and task.due_date == before['due_date'].replace(microsecond=0):
+            task.due_date = before['due_date']
+        
+        changed = [name for name in data if getattr(task, name) != before[name]]
+        if changed:
+            try:
+                with transaction.atomic(using=task._state.db):
+                    task.save(update_fields=changed, expected_version=version)
+                    if 'completed' in changed and task.completed:
+                        recurrence.advance(user_tasks(request), [task])
+            except VersionConflict:
+                current = get_object_or_404(user_tasks(request), pk=pk)
+                context = {'task': current, 'errors': [CONFLICT_MESSAGE]}
+                return render(request, 'myapp/task_form.html', context, status=409)
         return redirect('task_list')
     
     context = {'task': task}
@@ -74,10 +322,11 @@ def task_delete(request: HttpRequest, pk: int) -> HttpResponse:
     """
     Delete a task.
     """
-    task = get_object_or_404(Task, pk=pk)
+    task = get_object_or_404(user_tasks(request), pk=pk)
     
     if request.method == 'POST':
-        task.delete()
+        with transaction.atomic(using=task._state.db):
+            task.delete()
         return redirect('task_list')
     
     context = {'task': task}
@@ -88,7 +337,8 @@ def task_toggle_complete(request: HttpRequest, pk: int) -> HttpResponse:
     """
     Toggle the completion status of a task.
     """
-    task = get_object_or_404(Task, pk=pk)
-    task.completed = not task.completed
-    task.save()
+    if not toggle_task(pk, user_id=owner_id(request.user)):
+        raise Http404('No Task matches the given query.')
+    # Toggles also arrive as GET links
+    pin_primary(request)
     return redirect('task_list')
@@ -0,0 +1,16 @@
+"""
+URL configuration used by the API-only workers (``myproject.settings_api``).
+
+Routes the JSON API and nothing else, so the admin is never loaded.
+Errors are answered with JSON instead of rendered error pages.
+"""
+from django.urls import include, path
+
+urlpatterns = [
+    path('api/tasks/', include('myapp.api_urls')),  # JSON API
+]
+
+handler400 = 'myapp.api.bad_request_json'
+handler403 = 'myapp.api.permission_denied_json'
+handler404 = 'myapp.api.page_not_found_json'
+handler500 = 'myapp.api.server_error_json'
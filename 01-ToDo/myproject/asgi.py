@@ -2,6 +2,8 @@
 ASGI config for myproject project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+By default it loads ``myproject.settings_asgi``, which routes the list pages
+and JSON endpoints to the async views in ``myapp.async_views``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -11,6 +13,6 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings_asgi')
 
 application = get_asgi_application()
@@ -0,0 +1,18 @@
+"""
+URL configuration used under ASGI.
+
+Routes the read-heavy pages and JSON endpoints to the async views in
+``myapp.async_views``; everything else falls through to the regular
+``myproject.urls`` patterns.
+"""
+from django.urls import path
+from myapp import async_views
+from myproject.urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('', async_views.home, name='home'),
+    path('tasks/', async_views.task_list, name='task_list'),
+    path('api/tasks/', async_views.task_list_json, name='api_task_list'),
+    path('api/tasks/<int:pk>', async_views.task_detail_json, name='api_task_detail'),
+    path('api/tasks/<int:pk>/toggle', async_views.task_toggle_json, name='api_task_toggle'),
+] + sync_urlpatterns
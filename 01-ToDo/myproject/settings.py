@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import copy
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -40,10 +44,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack
+    'myapp.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Collected static files, before anything that reads or writes bodies
+    'myapp.staticfiles.StaticFilesMiddleware',
+    # Above every middleware that touches the response body
+    'myapp.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
+    # Sets the cookie that keeps a client on the primary after it writes
+    'myapp.replicas.StickyPrimaryMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -53,7 +65,8 @@ ROOT_URLCONF = 'myproject.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that reports render time to RequestMetricsMiddleware
+        'BACKEND': 'myapp.instrumentation.TimedDjangoTemplates',
         # DIRS: Custom template directories (project-level)
         'DIRS': [
             BASE_DIR / 'templates',  # <-- Added this line to register templates directory
@@ -77,12 +90,155 @@ WSGI_APPLICATION = 'myproject.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# Select a profile with DATABASE_PROFILE:
+#   sqlite   (default) WAL-mode SQLite with persistent connections
+#   postgres PostgreSQL configured from POSTGRES_* variables; uses Django's
+#            connection pool (requires psycopg[pool]) unless DATABASE_POOL=0,
+#            in which case connections are persistent and health-checked
+
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'sqlite')
+
+# Run on every new SQLite connection. WAL lets readers proceed while a writer
+# commits; synchronous=NORMAL is durable in WAL mode except on power loss.
+SQLITE_INIT_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=5000',       # Wait up to 5s for a lock instead of failing
+    'PRAGMA mmap_size=134217728',     # Memory-map up to 128 MiB of the file
+    'PRAGMA cache_size=-65536',       # 64 MiB page cache per connection
+    'PRAGMA temp_store=MEMORY',
+]
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+if DATABASE_PROFILE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'init_command': ';'.join(SQLITE_INIT_PRAGMAS),
+                # Take the write lock at BEGIN, so concurrent writers queue on
+                # busy_timeout instead of failing with "database is locked"
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+elif DATABASE_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'todo'),
+            'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    if os.environ.get('DATABASE_POOL', '1') == '1':
+        # Pooled connections already outlive requests; Django requires
+        # CONN_MAX_AGE = 0 when pooling
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.environ.get('DATABASE_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.environ.get('DATABASE_POOL_MAX_SIZE', 10)),
+                'timeout': 10,
+            },
+        }
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = 600
+else:
+    raise ImproperlyConfigured(
+        f"Unknown DATABASE_PROFILE {DATABASE_PROFILE!r}; use 'sqlite' or 'postgres'."
+    )
+
+# Task sharding (see myapp/sharding.py)
+# Tasks and their derived rows are spread over TASK_SHARDS by owner; users,
+# sessions and the admin stay on "default", which is also the first shard.
+# Extra shards copy the default connection settings with their own database
+# (db.shard1.sqlite3, ... or <POSTGRES_DB>_shard1, ...). Only ever append
+# shards; pin heavy users to one with TASK_SHARD_PINS = {user_id: alias}.
+# Run "manage.py migrate --database=<alias>" for a new shard, then
+# "manage.py rebalance_shards".
+
+TASK_SHARD_COUNT = int(os.environ.get('TASK_SHARD_COUNT', 1))
+
+TASK_SHARDS = ['default']
+for _index in range(1, TASK_SHARD_COUNT):
+    _alias = f'shard{_index}'
+    DATABASES[_alias] = copy.deepcopy(DATABASES['default'])
+    if DATABASE_PROFILE == 'sqlite':
+        DATABASES[_alias]['NAME'] = BASE_DIR / f'db.{_alias}.sqlite3'
+    else:
+        DATABASES[_alias]['NAME'] = f"{DATABASES['default']['NAME']}_{_alias}"
+    TASK_SHARDS.append(_alias)
+
+TASK_SHARD_PINS = {}
+
+# Read replicas (see myapp/replicas.py)
+# DATABASE_REPLICAS maps a primary alias to its replicas; list, search and
+# dashboard pages read from them, and a client that just wrote reads from
+# the primary for REPLICA_STICKY_SECONDS. SQLITE_REPLICA_STANDIN=1 adds a
+# read-only connection to each SQLite file as a local stand-in, which fails
+# loudly on a misrouted write. On Postgres, list replica hosts of the
+# default database in POSTGRES_REPLICA_HOSTS (comma-separated).
+
+DATABASE_REPLICAS = {}
+
+if DATABASE_PROFILE == 'sqlite' and os.environ.get('SQLITE_REPLICA_STANDIN') == '1':
+    for _alias in TASK_SHARDS:
+        _replica = f'{_alias}_replica'
+        DATABASES[_replica] = copy.deepcopy(DATABASES[_alias])
+        DATABASES[_replica]['NAME'] = f"file:{DATABASES[_alias]['NAME']}?mode=ro"
+        # BEGIN IMMEDIATE needs write access
+        DATABASES[_replica]['OPTIONS'].pop('transaction_mode', None)
+        DATABASES[_replica]['TEST'] = {'MIRROR': _alias}
+        DATABASE_REPLICAS[_alias] = [_replica]
+elif DATABASE_PROFILE == 'postgres':
+    for _index, _host in enumerate(filter(None, os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(',')), 1):
+        _replica = f'replica{_index}'
+        DATABASES[_replica] = copy.deepcopy(DATABASES['default'])
+        DATABASES[_replica]['HOST'] = _host.strip()
+        DATABASES[_replica]['TEST'] = {'MIRROR': 'default'}
+        DATABASE_REPLICAS.setdefault('default', []).append(_replica)
+
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+
+DATABASE_ROUTERS = ['myapp.sharding.UserShardRouter', 'myapp.replicas.PrimaryReplicaRouter']
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# "task_rows" holds rendered task_list rows keyed by (pk, updated_at), so an
+# edit invalidates its row automatically. Set TASK_ROW_CACHE=file to share
+# the fragments between worker processes on one host. Both backends evict
+# least-recently-used rows once MAX_ENTRIES is reached.
+
+TASK_ROW_CACHE_TIMEOUT = 60 * 60 * 24
+
+if os.environ.get('TASK_ROW_CACHE', 'locmem') == 'file':
+    TASK_ROW_CACHE_BACKEND = {
+        'BACKEND': 'myapp.cache.LRUFileBasedCache',
+        'LOCATION': os.environ.get('TASK_ROW_CACHE_DIR', BASE_DIR / '.cache' / 'task_rows'),
+    }
+else:
+    TASK_ROW_CACHE_BACKEND = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'task-rows',
     }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'task_rows': {
+        **TASK_ROW_CACHE_BACKEND,
+        'TIMEOUT': TASK_ROW_CACHE_TIMEOUT,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('TASK_ROW_CACHE_MAX_ENTRIES', 10000)),
+        },
+    },
 }
 
 
@@ -122,6 +278,116 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+STATICFILES_DIRS = [BASE_DIR / 'static']
+
+# `python manage.py collectstatic` writes hashed, precompressed copies here;
+# myapp.staticfiles.StaticFilesMiddleware serves them
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        # Hashed names need a collectstatic run, so only outside DEBUG
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'myapp.staticfiles.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
+
+# Cache lifetime of hashed static files, in seconds (they never change
+# under the same name)
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+
+# Task list pagination
+# Number of tasks per page for the cursor-paginated list views and JSON API
+
+TASK_LIST_PAGE_SIZE = 50
+
+# Task statistics
+# When True, dashboard counts are read from the denormalized TaskStats row
+# (O(1)) instead of an aggregate over the task table. Run
+# `python manage.py rebuild_task_stats` after enabling it on existing data.
+
+TASK_STATS_COUNTERS = False
+
+# Batch API
+# Upper bound on operations accepted by /api/tasks/batch in one request
+
+TASK_BATCH_MAX_OPERATIONS = 1000
+
+# Full-text search
+# Set to N to rank only the newest N tasks matching a search, which bounds the
+# cost of common words on large tables; older matches are then left out and
+# results say "truncated". None ranks every match.
+
+TASK_SEARCH_RANK_WINDOW = None
+
+# Change feed
+# /api/tasks/changes stays this many seconds behind the clock so that writes
+# still committing are not skipped; clients may ask for up to
+# TASK_CHANGES_MAX_PAGE_SIZE changes per request. Delete tombstones are kept
+# for TASK_TOMBSTONE_RETENTION_DAYS (`python manage.py purge_tombstones`);
+# clients that have not synced for longer must resync from scratch.
+
+TASK_CHANGES_SETTLE_SECONDS = 2
+TASK_CHANGES_MAX_PAGE_SIZE = 1000
+TASK_TOMBSTONE_RETENTION_DAYS = 30
+
+# Archival
+# `python manage.py archive_tasks` moves tasks completed more than this many
+# days ago to the ArchivedTask table (browse it at /tasks/archive/).
+
+TASK_ARCHIVE_AFTER_DAYS = 90
+
+# Reminders
+# `python manage.py run_reminders` sends a reminder this many minutes before
+# a task is due and another once it is overdue, through the backend class
+# below (myapp.reminders.ConsoleBackend or myapp.reminders.FileBackend, which
+# appends JSON lines to TASK_REMINDER_FILE).
+
+TASK_REMINDER_LEAD_MINUTES = 60
+TASK_REMINDER_BACKEND = os.environ.get('TASK_REMINDER_BACKEND', 'myapp.reminders.ConsoleBackend')
+TASK_REMINDER_FILE = os.environ.get('TASK_REMINDER_FILE', BASE_DIR / 'reminders.jsonl')
+
+# Request metrics
+# Share of requests measured by RequestMetricsMiddleware (query count, DB,
+# template and view time in a Server-Timing header and on the
+# "myapp.metrics" logger). Set REQUEST_METRICS_LOG_LEVEL=INFO to log every
+# measured request; at WARNING only duplicated (N+1-style) queries are logged.
+# Outside DEBUG only 1% of requests are measured and the header, which shows
+# query counts to any client, is off.
+
+REQUEST_METRICS_SAMPLE_RATE = float(
+    os.environ.get('REQUEST_METRICS_SAMPLE_RATE', 1.0 if DEBUG else 0.01)
+)
+
+REQUEST_METRICS_SERVER_TIMING = DEBUG
+
+REQUEST_METRICS_DUPLICATE_THRESHOLD = 3
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'myapp.metrics': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_METRICS_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+        'myapp.reminders': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
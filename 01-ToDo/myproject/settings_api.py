@@ -0,0 +1,63 @@
+"""
+Lean Django settings for workers that only serve the JSON API.
+
+Start them with ``DJANGO_SETTINGS_MODULE=myproject.settings_api`` (e.g.
+``gunicorn myproject.wsgi``).  Compared to ``myproject.settings``:
+
+* only auth, contenttypes, sessions and myapp are installed: no admin
+  (whose ``ready()`` imports every ``admin.py``), messages or staticfiles;
+* the middleware the API does not use (static files, messages,
+  clickjacking protection for HTML pages) is dropped; session
+  authentication, CSRF and compression stay;
+* only ``/api/tasks/`` is routed (``myproject.api_urls``), and errors are
+  answered with JSON instead of rendered error pages;
+* nothing renders a template, so the template engine is only built if
+  something asks for one, with a filesystem-only cached loader.
+
+Run migrations with the full settings, which know every app's tables.
+``python bench/startup.py`` compares the start-up cost of both profiles.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    # API clients authenticate with the session cookie of the web login
+    'django.contrib.sessions',
+    'myapp',
+]
+
+MIDDLEWARE = [
+    'myapp.instrumentation.RequestMetricsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'myapp.compression.CompressionMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'myapp.replicas.StickyPrimaryMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+]
+
+ROOT_URLCONF = 'myproject.api_urls'
+
+CSRF_FAILURE_VIEW = 'myapp.api.csrf_failure_json'
+
+TEMPLATES = [
+    {
+        'BACKEND': 'myapp.instrumentation.TimedDjangoTemplates',
+        'DIRS': [BASE_DIR / 'templates'],
+        'OPTIONS': {
+            # No app template directories to scan; parsed templates are kept
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                ]),
+            ],
+            'context_processors': [
+                'django.template.context_processors.request',
+            ],
+        },
+    },
+]
@@ -0,0 +1,10 @@
+"""
+Django settings for serving the project under ASGI.
+
+Identical to ``myproject.settings`` except that requests are routed to the
+async views (see ``myproject.asgi_urls``).
+"""
+
+from .settings import *  # noqa: F401,F403
+
+ROOT_URLCONF = 'myproject.asgi_urls'
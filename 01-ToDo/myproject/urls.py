@@ -22,4 +22,5 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', views.home, name='home'),  # Home page
     path('tasks/', include('myapp.urls')),  # All task-related URLs
+    path('api/tasks/', include('myapp.api_urls')),  # JSON API
 ]